@@ -5,10 +5,16 @@ import os
 import re
 import json
 import hashlib
+import gzip
 import threading
 import base64
 import uuid
-from datetime import datetime
+import copy
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
 from dotenv import load_dotenv
@@ -16,9 +22,10 @@ load_dotenv()  # Load .env file for local development
 
 import functools
 import requests
-from flask import Flask, render_template, request, jsonify, Response, send_from_directory
+from flask import Flask, render_template, request, jsonify, Response, send_from_directory, stream_with_context, has_request_context
 from flask_cors import CORS
 from google.cloud import firestore, storage
+from google.api_core import exceptions as gcp_exceptions
 from weasyprint import HTML
 import vertexai
 from vertexai.generative_models import GenerativeModel, Part, Tool, grounding
@@ -152,6 +159,10 @@ COLLECTIONS = {
     'messages':      f'{COLLECTION_PREFIX}doc_messages',
     'golden_scripts': f'{COLLECTION_PREFIX}doc_golden_scripts',
     'beat_sheets': f'{COLLECTION_PREFIX}doc_beat_sheets',
+    'migrations': f'{COLLECTION_PREFIX}doc_migrations',
+    'project_stats': f'{COLLECTION_PREFIX}doc_project_stats',
+    'ai_cache': f'{COLLECTION_PREFIX}doc_ai_cache',
+    'ai_metrics': f'{COLLECTION_PREFIX}doc_ai_metrics',
 }
 
 DEFAULT_UNIVERSAL_RULES = """DOCUMENTARY CRAFT RULES — ALL SERIES (Thomas's Layer)
@@ -536,6 +547,167 @@ AGENT_TYPES = {
 }
 
 
+# ============== Document Cache ==============
+
+# In-process read-through cache for single-document reads, keyed by
+# (collection, doc_id). Writes made through the helpers below keep it
+# coherent; the TTL bounds staleness from writes made elsewhere.
+DOC_CACHE_TTL = float(os.environ.get("DOC_CACHE_TTL", "30"))
+DOC_CACHE_MAX_ENTRIES = int(os.environ.get("DOC_CACHE_MAX_ENTRIES", "2000"))
+DOC_CACHE_MAX_BYTES = int(os.environ.get("DOC_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class DocCache:
+    """Thread-safe LRU + TTL cache of Firestore documents, bounded by entry count and approximate size."""
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, data)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, collection_name, doc_id):
+        """Return a copy of the cached document, or None on miss/expiry."""
+        return self.get_with_expiry(collection_name, doc_id)[0]
+
+    def get_with_expiry(self, collection_name, doc_id):
+        """Return (copy of the cached document, its expiry), or (None, None) on miss/expiry."""
+        key = (collection_name, doc_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            expires_at, size, data = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(data), expires_at
+
+    def put(self, collection_name, doc_id, data, expires_at=None):
+        """Store a copy of a document, evicting least-recently-used entries past the bounds.
+
+        Pass `expires_at` to keep an existing entry's expiry rather than starting a fresh TTL."""
+        if not self.enabled or data is None:
+            return
+        try:
+            size = len(json.dumps(data, default=str))
+        except (TypeError, ValueError):
+            return
+        if size > self.max_bytes:
+            return
+        key = (collection_name, doc_id)
+        data = copy.deepcopy(data)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (expires_at or time.monotonic() + self.ttl, size, data)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, collection_name, doc_id):
+        """Forget a single document."""
+        with self._lock:
+            self._drop((collection_name, doc_id))
+
+    def invalidate_collection(self, collection_name):
+        """Forget every cached document from one collection."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == collection_name]:
+                self._drop(key)
+
+    def clear(self):
+        """Drop all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxEntries': self.max_entries,
+                'maxBytes': self.max_bytes,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+doc_cache = DocCache(DOC_CACHE_TTL, DOC_CACHE_MAX_ENTRIES, DOC_CACHE_MAX_BYTES)
+
+
+# ============== List Projections ==============
+
+# Default `?view=summary` field sets: everything a list/card view renders,
+# without the large text blobs (episode research, golden scriptText,
+# style reference pillars/beat_sheet, etc.)
+SUMMARY_FIELDS = {
+    'episodes': ['title', 'code', 'order', 'episodeNumber', 'projectId', 'seriesId',
+                 'status', 'synopsis', 'workflow.currentPhase', 'createdAt', 'updatedAt'],
+    'scripts': ['title', 'projectId', 'segment_number', 'series', 'version', 'status',
+                'source_file', 'stats', 'createdAt', 'updatedAt'],
+    'research': ['title', 'projectId', 'episodeId', 'query', 'status', 'createdAt', 'updatedAt'],
+    'research_documents': ['title', 'topic', 'projectId', 'episodeId', 'seriesId', 'documentType',
+                           'source', 'confidenceLevel', 'createdAt', 'updatedAt'],
+    'script_versions': ['episodeId', 'versionNumber', 'versionType', 'status', 'createdBy',
+                        'createdAt', 'updatedAt'],
+    'golden_scripts': ['projectId', 'seriesId', 'seriesName', 'producerName', 'filename',
+                       'mimeType', 'wordCount', 'analysisStatus', 'createdAt', 'updatedAt'],
+    'style_references': ['projectId', 'seriesId', 'name', 'source_type', 'youtube_url',
+                         'thumbnail_url', 'duration_seconds', 'analysis_status',
+                         'createdAt', 'updatedAt'],
+}
+
+_FIELD_PATH_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+
+def list_projection(collection_name, *required):
+    """Field projection requested via ?fields=a,b or ?view=summary, or None for full docs.
+
+    `required` fields (e.g. sort keys the route needs) are always included."""
+    fields_arg = request.args.get('fields', '').strip()
+    if fields_arg:
+        fields = [f.strip() for f in fields_arg.split(',') if _FIELD_PATH_RE.match(f.strip())]
+    elif request.args.get('view') == 'summary':
+        fields = list(SUMMARY_FIELDS.get(collection_name, []))
+    else:
+        return None
+    if not fields:
+        return None
+    for f in required:
+        if f not in fields:
+            fields.append(f)
+    return fields
+
+
 # ============== Helper Functions ==============
 
 def doc_to_dict(doc):
@@ -547,46 +719,520 @@ def doc_to_dict(doc):
     return None
 
 
-def get_all_docs(collection_name, project_id=None):
-    """Get all documents from a collection, optionally filtered by project."""
+def _project(query, fields):
+    """Apply a Firestore select() projection when fields are given."""
+    return query.select(fields) if fields else query
+
+
+def _scoped_queries(collection_name, project_id=None):
+    """Base queries that together cover a collection, optionally scoped to a project."""
     collection = db.collection(COLLECTIONS[collection_name])
-    if project_id:
-        # Try camelCase first, then snake_case, merge & deduplicate
-        camel_docs = {doc.id: doc_to_dict(doc) for doc in collection.where('projectId', '==', project_id).stream()}
-        snake_docs = {doc.id: doc_to_dict(doc) for doc in collection.where('project_id', '==', project_id).stream()}
-        merged = {**snake_docs, **camel_docs}
-        return list(merged.values())
-    else:
-        docs = collection.stream()
-    return [doc_to_dict(doc) for doc in docs]
+    if not project_id:
+        return [collection]
+    if is_project_scope_migrated(collection_name):
+        # Every doc carries projectId once the scope migration has run
+        return [collection.where('projectId', '==', project_id)]
+    # camelCase first, then snake_case; callers merge & deduplicate
+    return [collection.where('projectId', '==', project_id),
+            collection.where('project_id', '==', project_id)]
+
+
+def get_all_docs(collection_name, project_id=None, fields=None):
+    """Get all documents from a collection, optionally filtered by project.
+
+    Pass `fields` to fetch only those fields (Firestore select projection)."""
+    queries = _scoped_queries(collection_name, project_id)
+    if len(queries) == 1:
+        return [doc_to_dict(doc) for doc in _project(queries[0], fields).stream()]
+    camel_docs = {doc.id: doc_to_dict(doc) for doc in _project(queries[0], fields).stream()}
+    snake_docs = {doc.id: doc_to_dict(doc) for doc in _project(queries[1], fields).stream()}
+    merged = {**snake_docs, **camel_docs}
+    return list(merged.values())
+
+
+# ============== Pagination ==============
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_page_token(order_value, doc_id):
+    """Opaque cursor for the last item of a page."""
+    raw = json.dumps([order_value, doc_id], default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_page_token(token):
+    """Inverse of encode_page_token. Raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        order_value, doc_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid pageToken")
+    if not isinstance(doc_id, str):
+        raise ValueError("Invalid pageToken")
+    return order_value, doc_id
+
+
+def fetch_page(queries, limit, cursor=None, order_field='createdAt', descending=False,
+               fields=None, with_total=False):
+    """Fetch one page from one or more queries sharing an order key.
+
+    Results are ordered by (order_field, document id) so the cursor is stable,
+    merged across queries and deduplicated by id. Returns the list envelope:
+    {"items", "nextPageToken", "totalCount", "totalCountExact"}."""
+    direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+    if fields and order_field not in fields:
+        fields = list(fields) + [order_field]
+
+    merged = {}
+    for base in queries:
+        query = _project(base, fields) \
+            .order_by(order_field, direction=direction) \
+            .order_by('__name__', direction=direction)
+        if cursor:
+            query = query.start_after({order_field: cursor[0], '__name__': cursor[1]})
+        for doc in query.limit(limit + 1).stream():
+            merged.setdefault(doc.id, doc_to_dict(doc))
+
+    ordered = sorted(merged.values(), key=lambda d: (str(d.get(order_field, '')), d['id']),
+                     reverse=descending)
+    items = ordered[:limit]
+    next_token = None
+    if len(ordered) > limit and items:
+        next_token = encode_page_token(items[-1].get(order_field), items[-1]['id'])
+
+    total = None
+    if with_total:
+        try:
+            total = sum(q.count().get()[0][0].value for q in queries)
+        except Exception as e:
+            print(f"[PAGINATION] count() failed: {e}")
+
+    return {
+        'items': items,
+        'nextPageToken': next_token,
+        'totalCount': total,
+        'totalCountExact': total is not None and len(queries) == 1,
+    }
+
+
+def page_request():
+    """Paging params from ?limit=&pageToken=, or None when the client wants the full list.
+
+    Raises ValueError on a malformed limit or token."""
+    limit_arg = request.args.get('limit', '').strip()
+    token = request.args.get('pageToken', '').strip()
+    if not limit_arg and not token:
+        return None
+    try:
+        limit = int(limit_arg) if limit_arg else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return {
+        'limit': max(1, min(limit, MAX_PAGE_SIZE)),
+        'cursor': decode_page_token(token) if token else None,
+    }
+
+
+def paged_list_response(collection_name, project_id=None, queries=None, order_field='createdAt',
+                        descending=False, fields=None, exclude=None):
+    """Paged JSON envelope when the request asks for one, else None (caller returns the full list).
+
+    The first page also carries a count() based totalCount hint. Items matching
+    `exclude` are dropped after the cursor is taken, so a page may come back short."""
+    try:
+        page = page_request()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if page is None:
+        return None
+    if queries is None:
+        queries = _scoped_queries(collection_name, project_id)
+    result = fetch_page(queries, page['limit'], cursor=page['cursor'], order_field=order_field,
+                        descending=descending, fields=fields, with_total=page['cursor'] is None)
+    if exclude:
+        result['items'] = [item for item in result['items'] if not exclude(item)]
+    return jsonify(result)
+
+
+def paged_sorted_response(items, sort_key):
+    """Paged JSON envelope over an already-loaded list ordered by (sort_key(item), id), or None when unpaged.
+
+    For small collections whose list order can't be a single Firestore order_by
+    (e.g. a field with a fallback), so pages follow the same order as the full list."""
+    try:
+        page = page_request()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if page is None:
+        return None
+    keyed = sorted((((sort_key(item), item['id']), item) for item in items), key=lambda k: k[0])
+    if page['cursor'] is not None:
+        cursor = tuple(page['cursor'])
+        try:
+            keyed = [k for k in keyed if k[0] > cursor]
+        except TypeError:
+            return jsonify({"error": "Invalid pageToken"}), 400
+    items = [item for _, item in keyed[:page['limit']]]
+    next_token = None
+    if len(keyed) > page['limit']:
+        next_token = encode_page_token(*keyed[page['limit'] - 1][0])
+    return jsonify({
+        'items': items,
+        'nextPageToken': next_token,
+        'totalCount': len(keyed) if page['cursor'] is None else None,
+        'totalCountExact': page['cursor'] is None,
+    })
 
 
 def get_doc(collection_name, doc_id):
-    """Get a single document by ID."""
+    """Get a single document by ID (served from doc_cache when fresh)."""
+    cached = doc_cache.get(collection_name, doc_id)
+    if cached is not None:
+        return cached
     doc = db.collection(COLLECTIONS[collection_name]).document(doc_id).get()
-    return doc_to_dict(doc)
+    result = doc_to_dict(doc)
+    doc_cache.put(collection_name, doc_id, result)
+    return result
 
 
-def create_doc(collection_name, data):
-    """Create a new document."""
+def create_doc(collection_name, data, transaction=None):
+    """Create a new document (inside `transaction` when given; the caller commits and caches it)."""
+    normalize_project_scope(data)
     data['createdAt'] = datetime.utcnow().isoformat()
     data['updatedAt'] = datetime.utcnow().isoformat()
     doc_ref = db.collection(COLLECTIONS[collection_name]).document()
-    doc_ref.set(data)
+    if transaction is not None:
+        transaction.set(doc_ref, data)
+    else:
+        doc_ref.set(data)
     data['id'] = doc_ref.id
+    if transaction is None:
+        # A transactional create may still fail or retry; the caller caches after commit
+        doc_cache.put(collection_name, doc_ref.id, data)
     return data
 
 
-def update_doc(collection_name, doc_id, data):
-    """Update an existing document."""
+def update_doc(collection_name, doc_id, data, return_doc=True, prior=None):
+    """Update an existing document and return the merged result.
+
+    The result is the update applied to `prior` (or the cached copy), so the
+    usual get-then-update route costs one write and no second read. Falls back
+    to a fresh read when no prior state is known or the update holds server-side
+    transforms. Pass return_doc=False when the result is not needed.
+
+    A merge built on the cached copy keeps that entry's expiry, so frequently
+    updated docs still get re-read from Firestore once per TTL."""
     data['updatedAt'] = datetime.utcnow().isoformat()
-    db.collection(COLLECTIONS[collection_name]).document(doc_id).update(data)
-    return get_doc(collection_name, doc_id)
+    expires_at = None
+    if prior is None:
+        prior, expires_at = doc_cache.get_with_expiry(collection_name, doc_id)
+    try:
+        db.collection(COLLECTIONS[collection_name]).document(doc_id).update(data)
+    finally:
+        # After the write, so a concurrent get_doc can't re-cache the old version
+        doc_cache.invalidate(collection_name, doc_id)
+
+    merged = merge_update(prior, data) if prior is not None else None
+    if merged is not None:
+        merged['id'] = doc_id
+        doc_cache.put(collection_name, doc_id, merged, expires_at=expires_at)
+    if not return_doc:
+        return None
+    return merged if merged is not None else get_doc(collection_name, doc_id)
+
+
+def _is_plain_value(value):
+    if isinstance(value, dict):
+        return all(_is_plain_value(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain_value(v) for v in value)
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def merge_update(doc, updates):
+    """Apply an update() payload (dotted field paths allowed) to a copy of `doc`.
+
+    Returns None when the result can't be known locally: transforms such as
+    Increment/ArrayUnion/SERVER_TIMESTAMP, or quoted field paths."""
+    merged = copy.deepcopy(doc)
+    for field_path, value in updates.items():
+        if '`' in field_path:
+            return None
+        delete = value is firestore.DELETE_FIELD
+        if not delete and not _is_plain_value(value):
+            return None
+        *parents, leaf = field_path.split('.')
+        node = merged
+        for key in parents:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                if delete:
+                    break
+                child = node[key] = {}
+            node = child
+        else:
+            if delete:
+                node.pop(leaf, None)
+            else:
+                node[leaf] = copy.deepcopy(value)
+    return merged
 
 
 def delete_doc(collection_name, doc_id):
     """Delete a document."""
-    db.collection(COLLECTIONS[collection_name]).document(doc_id).delete()
+    try:
+        db.collection(COLLECTIONS[collection_name]).document(doc_id).delete()
+    finally:
+        doc_cache.invalidate(collection_name, doc_id)
+    return True
+
+
+# ============== Bulk Writes ==============
+
+# Seed and import routes write dozens to hundreds of documents. BulkWrite queues
+# the writes and commits them as WriteBatches of at most BULK_WRITE_CHUNK ops
+# (Firestore's per-batch limit), so anything under that size lands atomically.
+# Document ids are allocated client-side, which makes a retried chunk idempotent
+# unless it holds Increment transforms: those chunks are not retried after an
+# ambiguous error, since the commit may have landed. If a chunk still fails,
+# documents created by earlier chunks are deleted again so a failed import
+# doesn't leave a half-seeded project behind; earlier set/update/delete ops are
+# not reverted.
+BULK_WRITE_CHUNK = 500
+BULK_WRITE_RETRIES = int(os.environ.get('BULK_WRITE_RETRIES', '3'))
+BULK_WRITE_BACKOFF = float(os.environ.get('BULK_WRITE_BACKOFF', '0.5'))
+BULK_WRITE_TRANSIENT = (
+    gcp_exceptions.Aborted,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.InternalServerError,
+    gcp_exceptions.ResourceExhausted,
+    gcp_exceptions.ServiceUnavailable,
+)
+# Transient errors after which the commit may nonetheless have been applied
+BULK_WRITE_AMBIGUOUS = (gcp_exceptions.DeadlineExceeded, gcp_exceptions.InternalServerError)
+
+
+class BulkWriteError(Exception):
+    """A bulk write chunk failed after retries; documents created by earlier chunks were deleted."""
+
+
+def _has_increment(value):
+    if isinstance(value, dict):
+        return any(_has_increment(v) for v in value.values())
+    return isinstance(value, firestore.Increment)
+
+
+class BulkWrite:
+    """Queue of Firestore writes committed in chunked, retried WriteBatches."""
+
+    def __init__(self):
+        self._ops = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def create(self, collection_name, data, doc_id=None):
+        """Queue a new document stamped like create_doc. Returns it with its id."""
+        normalize_project_scope(data)
+        data['createdAt'] = datetime.utcnow().isoformat()
+        data['updatedAt'] = datetime.utcnow().isoformat()
+        doc_id = doc_id or db.collection(COLLECTIONS[collection_name]).document().id
+        self._ops.append(('create', collection_name, doc_id, data))
+        return {**data, 'id': doc_id}
+
+    def set(self, collection_name, doc_id, data, merge=False):
+        self._ops.append(('merge' if merge else 'set', collection_name, doc_id, data))
+
+    def update(self, collection_name, doc_id, data):
+        self._ops.append(('update', collection_name, doc_id, data))
+
+    def delete(self, collection_name, doc_id):
+        self._ops.append(('delete', collection_name, doc_id, None))
+
+    @staticmethod
+    def _commit_chunk(chunk):
+        # Re-applying an Increment that already landed would double-count it
+        retry_ambiguous = not any(_has_increment(data) for _, _, _, data in chunk)
+        for attempt in range(BULK_WRITE_RETRIES + 1):
+            batch = db.batch()
+            for action, collection_name, doc_id, data in chunk:
+                ref = db.collection(COLLECTIONS[collection_name]).document(doc_id)
+                if action in ('create', 'set'):
+                    batch.set(ref, data)
+                elif action == 'merge':
+                    batch.set(ref, data, merge=True)
+                elif action == 'update':
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            try:
+                batch.commit()
+                return
+            except BULK_WRITE_TRANSIENT as e:
+                if attempt == BULK_WRITE_RETRIES or (not retry_ambiguous and isinstance(e, BULK_WRITE_AMBIGUOUS)):
+                    raise
+                delay = BULK_WRITE_BACKOFF * (2 ** attempt)
+                print(f"[BULK] Chunk of {len(chunk)} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    @staticmethod
+    def _rollback(created):
+        """Delete documents created by already-committed chunks (other op types are left as written)."""
+        for i in range(0, len(created), BULK_WRITE_CHUNK):
+            batch = db.batch()
+            for collection_name, doc_id in created[i:i + BULK_WRITE_CHUNK]:
+                batch.delete(db.collection(COLLECTIONS[collection_name]).document(doc_id))
+            try:
+                batch.commit()
+            except Exception as e:
+                print(f"[BULK] Rollback incomplete: {e}")
+
+    def commit(self):
+        """Commit all queued writes. Returns the created document ids in queue order."""
+        ops, self._ops = self._ops, []
+        created = []
+        for i in range(0, len(ops), BULK_WRITE_CHUNK):
+            chunk = ops[i:i + BULK_WRITE_CHUNK]
+            try:
+                self._commit_chunk(chunk)
+            except Exception as e:
+                if created:
+                    print(f"[BULK] Rolling back {len(created)} created documents")
+                    self._rollback(created)
+                raise BulkWriteError(f"Bulk write failed after {i} of {len(ops)} ops: {e}") from e
+            created.extend((c, d) for action, c, d, _ in chunk if action == 'create')
+
+        for action, collection_name, doc_id, data in ops:
+            if action == 'create':
+                doc_cache.put(collection_name, doc_id, {**data, 'id': doc_id})
+            else:
+                doc_cache.invalidate(collection_name, doc_id)
+        return [doc_id for _, doc_id in created]
+
+
+def bulk_create_docs(collection_name, items):
+    """Create many documents in batched commits. Returns them with their ids."""
+    bulk = BulkWrite()
+    docs = [bulk.create(collection_name, data) for data in items]
+    bulk.commit()
+    return docs
+
+
+# ============== Project Scope Migration ==============
+
+# Older routes (planner, script import, YouTube catalog) scope documents with
+# snake_case `project_id` while the CRUD routes use `projectId`. New writes are
+# normalized to always carry `projectId`; the migration job backfills existing
+# documents and marks each collection so get_all_docs can use a single query.
+PROJECT_SCOPE_MIGRATION_ID = 'project_scope'
+PROJECT_SCOPE_REFRESH_SECONDS = 300
+
+_project_scope_state = {'migrated': set(), 'loadedAt': 0.0}
+_project_scope_lock = threading.Lock()
+_project_scope_job = {'status': 'idle'}
+
+
+def normalize_project_scope(data):
+    """Copy a legacy `project_id` onto the canonical `projectId` field (keeps both)."""
+    legacy = data.get('project_id')
+    if legacy and not data.get('projectId'):
+        data['projectId'] = legacy
+    return data
+
+
+def _load_project_scope_state():
+    """Read the set of migrated collections from the migrations collection."""
+    migrated = set()
+    try:
+        snap = db.collection(COLLECTIONS['migrations']).document(PROJECT_SCOPE_MIGRATION_ID).get()
+        data = snap.to_dict() if snap.exists else None
+        if isinstance(data, dict):
+            migrated = {name for name, info in (data.get('collections') or {}).items()
+                        if isinstance(info, dict) and info.get('status') == 'complete'}
+    except Exception as e:
+        print(f"[MIGRATION] Could not load project scope state: {e}")
+    return migrated
+
+
+def is_project_scope_migrated(collection_name):
+    """Whether every document in the collection is known to carry projectId."""
+    now = time.monotonic()
+    with _project_scope_lock:
+        stale = now - _project_scope_state['loadedAt'] > PROJECT_SCOPE_REFRESH_SECONDS
+    if stale:
+        migrated = _load_project_scope_state()
+        with _project_scope_lock:
+            _project_scope_state['migrated'] = migrated
+            _project_scope_state['loadedAt'] = now
+    with _project_scope_lock:
+        return collection_name in _project_scope_state['migrated']
+
+
+def _migrate_collection_project_scope(collection_name):
+    """Backfill projectId on every doc that only has project_id. Returns docs updated."""
+    collection = db.collection(COLLECTIONS[collection_name])
+    updated = 0
+    batch = db.batch()
+    batch_count = 0
+    for doc in collection.where('project_id', '>', '').stream():
+        data = doc.to_dict() or {}
+        if data.get('projectId'):
+            continue
+        batch.update(doc.reference, {'projectId': data['project_id']})
+        doc_cache.invalidate(collection_name, doc.id)
+        batch_count += 1
+        updated += 1
+        if batch_count >= 500:
+            batch.commit()
+            batch = db.batch()
+            batch_count = 0
+    if batch_count > 0:
+        batch.commit()
+    return updated
+
+
+def _run_project_scope_migration(collection_names):
+    """Migrate each collection in turn, recording progress in the migrations doc."""
+    state_ref = db.collection(COLLECTIONS['migrations']).document(PROJECT_SCOPE_MIGRATION_ID)
+    for name in collection_names:
+        if name == 'migrations':
+            continue
+        _project_scope_job['current'] = name
+        try:
+            updated = _migrate_collection_project_scope(name)
+            state_ref.set({'collections': {name: {
+                'status': 'complete',
+                'updated': updated,
+                'completedAt': datetime.utcnow().isoformat(),
+            }}}, merge=True)
+            _project_scope_job['results'][name] = {'status': 'complete', 'updated': updated}
+            print(f"[MIGRATION] {name}: backfilled projectId on {updated} docs")
+        except Exception as e:
+            _project_scope_job['results'][name] = {'status': 'failed', 'error': str(e)}
+            print(f"[MIGRATION] {name} failed: {e}")
+    _project_scope_job['current'] = None
+    _project_scope_job['status'] = 'complete'
+    _project_scope_job['completedAt'] = datetime.utcnow().isoformat()
+    with _project_scope_lock:
+        _project_scope_state['loadedAt'] = 0.0  # force reload on next read
+
+
+def start_project_scope_migration(collection_names=None):
+    """Kick off the migration in a daemon thread unless one is already running."""
+    if _project_scope_job.get('status') == 'running':
+        return False
+    names = list(collection_names or COLLECTIONS.keys())
+    _project_scope_job.clear()
+    _project_scope_job.update({
+        'status': 'running',
+        'collections': names,
+        'current': None,
+        'results': {},
+        'startedAt': datetime.utcnow().isoformat(),
+    })
+    threading.Thread(target=_run_project_scope_migration, args=(names,), daemon=True).start()
     return True
 
 
@@ -613,15 +1259,17 @@ def initialize_episode_workflow(episode_id):
 
 def update_episode_phase(episode_id, phase, status, notes=None):
     """Update an episode's workflow phase status."""
-    episode = get_doc('episodes', episode_id)
-    if not episode:
-        return None
+    def advance(episode):
+        workflow = episode.get('workflow', initialize_episode_workflow(episode_id))
+        if phase not in workflow['phases']:
+            return None
+        return {'workflow': _apply_phase_status(workflow, phase, status, notes)}
 
-    workflow = episode.get('workflow', initialize_episode_workflow(episode_id))
+    return update_episode_doc(episode_id, advance)
 
-    if phase not in workflow['phases']:
-        return None
 
+def _apply_phase_status(workflow, phase, status, notes=None):
+    """Set a phase status on a workflow dict, advancing to the next phase on approval."""
     workflow['phases'][phase]['status'] = status
 
     if status == 'in_progress' and not workflow['phases'][phase]['startedAt']:
@@ -643,7 +1291,7 @@ def update_episode_phase(episode_id, phase, status, notes=None):
             'timestamp': datetime.utcnow().isoformat()
         })
 
-    return update_doc('episodes', episode_id, {'workflow': workflow})
+    return workflow
 
 
 def get_episode_workflow_status(episode_id):
@@ -651,31 +1299,95 @@ def get_episode_workflow_status(episode_id):
     episode = get_doc('episodes', episode_id)
     if not episode:
         return None
+    return summarize_episode_workflow(episode)
+
 
-    workflow = episode.get('workflow', {})
+# ============== Workflow Aggregation ==============
+
+def summarize_episode_workflow(episode):
+    """Workflow status for an already-loaded episode dict (no Firestore reads)."""
+    workflow = episode.get('workflow') or {}
     current_phase = workflow.get('currentPhase', 'research')
+    phases = workflow.get('phases') or {}
 
     # Calculate overall progress
-    completed_phases = sum(
-        1 for p in workflow.get('phases', {}).values()
-        if p.get('status') == 'approved'
-    )
+    completed_phases = sum(1 for p in phases.values() if p.get('status') == 'approved')
     total_phases = len(EPISODE_PHASES)
 
     return {
-        'episodeId': episode_id,
+        'episodeId': episode.get('id'),
         'currentPhase': current_phase,
         'currentPhaseName': EPISODE_PHASES.get(current_phase, {}).get('name', 'Unknown'),
         'progress': (completed_phases / total_phases) * 100,
         'completedPhases': completed_phases,
         'totalPhases': total_phases,
-        'phases': workflow.get('phases', {}),
+        'phases': phases,
         'phaseDefinitions': EPISODE_PHASES
     }
 
 
+def is_episode_complete(episode):
+    """An episode is complete once its assembly phase is approved."""
+    workflow = episode.get('workflow') or {}
+    return (workflow.get('currentPhase') == 'assembly'
+            and (workflow.get('phases') or {}).get('assembly', {}).get('status') == 'approved')
+
+
+def aggregate_project_workflow(episodes, series_list=()):
+    """Single pass over loaded episodes: per-episode status, phase counts,
+    per-series completion and review bottlenecks."""
+    phase_stats = {phase: {'pending': 0, 'in_progress': 0, 'review': 0, 'approved': 0}
+                   for phase in EPISODE_PHASES.keys()}
+    episodes_by_series = {
+        series['id']: {
+            'seriesName': series.get('title', 'Unknown'),
+            'totalEpisodes': 0,
+            'completedEpisodes': 0,
+        }
+        for series in series_list
+    }
+    overview = []
+
+    for episode in episodes:
+        status = summarize_episode_workflow(episode)
+        overview.append({
+            'episodeId': episode['id'],
+            'episodeTitle': episode.get('title', 'Untitled'),
+            'seriesId': episode.get('seriesId'),
+            **status
+        })
+
+        for phase_key, phase_data in status['phases'].items():
+            counts = phase_stats.get(phase_key)
+            phase_status = phase_data.get('status', 'pending')
+            if counts is not None and phase_status in counts:
+                counts[phase_status] += 1
+
+        series_entry = episodes_by_series.get(episode.get('seriesId'))
+        if series_entry is not None:
+            series_entry['totalEpisodes'] += 1
+            if is_episode_complete(episode):
+                series_entry['completedEpisodes'] += 1
+
+    return {
+        'overview': overview,
+        'phaseStats': phase_stats,
+        'episodesBySeries': episodes_by_series,
+        'bottlenecks': [
+            {'phase': phase, 'count': stats['review']}
+            for phase, stats in phase_stats.items()
+            if stats['review'] > 0
+        ]
+    }
+
+
 def create_episode_with_buckets(data):
     """Create a new episode with initialized workflow and empty buckets."""
+    return create_episode_doc(init_episode_buckets(data))
+
+
+def init_episode_buckets(data):
+    """Fill in the initial workflow, buckets and brief for a new episode."""
     # Initialize workflow
     data['workflow'] = initialize_episode_workflow(None)
 
@@ -714,13 +1426,13 @@ def create_episode_with_buckets(data):
         'uniqueAngle': ''
     })
 
-    return create_doc('episodes', data)
+    return data
 
 
-def get_docs_by_episode(collection_name, episode_id):
+def get_docs_by_episode(collection_name, episode_id, fields=None):
     """Get all documents from a collection filtered by episode."""
     collection = db.collection(COLLECTIONS[collection_name])
-    docs = collection.where('episodeId', '==', episode_id).stream()
+    docs = _project(collection.where('episodeId', '==', episode_id), fields).stream()
     return [doc_to_dict(doc) for doc in docs]
 
 
@@ -748,7 +1460,7 @@ def create_agent_task(episode_id, agent_type, task_type, input_data):
     return create_doc('agent_tasks', task_data)
 
 
-def update_agent_task(task_id, status, output_data=None, error=None):
+def update_agent_task(task_id, status, output_data=None, error=None, return_doc=True):
     """Update an agent task status."""
     update_data = {'status': status}
 
@@ -762,55 +1474,1201 @@ def update_agent_task(task_id, status, output_data=None, error=None):
     if error:
         update_data['error'] = error
 
-    return update_doc('agent_tasks', task_id, update_data)
+    return update_doc('agent_tasks', task_id, update_data, return_doc=return_doc)
+
+
+# Specialist agents in the script swarm are independent, so they run
+# concurrently on one shared, bounded pool (shared so that simultaneous swarm
+# requests can't multiply the number of in-flight Vertex AI calls).
+SWARM_MAX_WORKERS = int(os.environ.get('SWARM_MAX_WORKERS', '6'))
+SWARM_AGENT_TIMEOUT = float(os.environ.get('SWARM_AGENT_TIMEOUT', '180'))
+SWARM_CONTEXT_TOKENS = int(os.environ.get('SWARM_CONTEXT_TOKENS', '4000'))  # per specialist
+_swarm_executor = ThreadPoolExecutor(max_workers=SWARM_MAX_WORKERS, thread_name_prefix='swarm')
+
+
+def run_swarm_specialists(specialists, timeout=None):
+    """Run specialist agent calls concurrently and collect {agent_type: response}.
+
+    `specialists` is a list of (task, prompt, system_prompt, model_name). Each
+    call records its own agent_tasks status. An agent still running after
+    `timeout` seconds is marked failed and left out, so one slow specialist
+    can't hold up the others or the script writer. Abandoned agents that have
+    not reached the model yet skip the call, so they free their pool slot."""
+    timeout = SWARM_AGENT_TIMEOUT if timeout is None else timeout
+    timed_out = f"Timed out after {timeout:.0f}s"
+    lock = threading.Lock()
+    abandoned, finished = set(), set()
+
+    def run(task, prompt, system_prompt, model_name):
+        if task['id'] in abandoned:
+            return None
+        update_agent_task(task['id'], 'in_progress', return_doc=False)
+        if task['id'] in abandoned:
+            # Abandoned while the status write was in flight; it may have landed after 'failed'.
+            update_agent_task(task['id'], 'failed', error=timed_out, return_doc=False)
+            return None
+        try:
+            response = generate_ai_response(prompt, system_prompt, model_name=model_name)
+            status, output, error = 'completed', {'analysis': response}, None
+        except Exception as e:
+            response = f"Error: {str(e)}"
+            status, output, error = 'failed', None, str(e)
+        with lock:
+            late = task['id'] in abandoned
+            finished.add(task['id'])
+        if late:
+            print(f"[SWARM] {task['agentType']} finished after its timeout; result dropped")
+        else:
+            update_agent_task(task['id'], status, output, error=error, return_doc=False)
+        return response
+
+    run = ai_lane(current_ai_lane(), current_ai_route())(run)  # pool threads inherit the caller's lane
+    futures = {_swarm_executor.submit(run, *spec): spec[0] for spec in specialists}
+    done, _ = wait(futures, timeout=timeout)
+
+    results = {}
+    for future, task in futures.items():
+        agent_type = task['agentType']
+        if future not in done:
+            future.cancel()
+            with lock:
+                if task['id'] not in finished:
+                    abandoned.add(task['id'])
+            if task['id'] in abandoned:
+                update_agent_task(task['id'], 'failed', error=timed_out, return_doc=False)
+                print(f"[SWARM] {agent_type} timed out after {timeout:.0f}s")
+                results[agent_type] = f"Not available ({AGENT_TYPES[agent_type]['name']} timed out)"
+                continue
+        try:
+            results[agent_type] = future.result()
+        except Exception as e:
+            results[agent_type] = f"Error: {str(e)}"
+    return results
 
 
 def get_project_dashboard_stats(project_id):
-    """Get dashboard statistics for a project."""
-    # Get all series for project
-    series_list = get_all_docs('series', project_id)
+    """Get dashboard statistics for a project from its materialized stats doc.
 
-    # Get all episodes for project
-    all_episodes = get_all_docs('episodes', project_id)
+    The doc is built on first read (and by the rebuild endpoint); afterwards the
+    episode write helpers keep it current, so this is a single document read."""
+    stats = None
+    try:
+        snap = _project_stats_ref(project_id).get()
+        stats = snap.to_dict() if snap.exists else None
+    except Exception as e:
+        print(f"[STATS] Could not read stats for {project_id}: {e}")
+    if not isinstance(stats, dict):
+        stats = rebuild_project_stats(project_id)
 
-    # Calculate phase statistics
-    phase_stats = {phase: {'pending': 0, 'in_progress': 0, 'review': 0, 'approved': 0}
+    phase_stats = {phase: {key: (stats.get('phaseStats') or {}).get(phase, {}).get(key, 0)
+                           for key in PHASE_STAT_KEYS}
                    for phase in EPISODE_PHASES.keys()}
-
-    for episode in all_episodes:
-        workflow = episode.get('workflow', {})
-        current_phase = workflow.get('currentPhase', 'research')
-        phases = workflow.get('phases', {})
-
-        for phase_key, phase_data in phases.items():
-            status = phase_data.get('status', 'pending')
-            if status in phase_stats[phase_key]:
-                phase_stats[phase_key][status] += 1
-
-    # Episodes by series
-    episodes_by_series = {}
-    for series in series_list:
-        series_episodes = [e for e in all_episodes if e.get('seriesId') == series['id']]
-        episodes_by_series[series['id']] = {
-            'seriesName': series.get('title', 'Unknown'),
-            'totalEpisodes': len(series_episodes),
-            'completedEpisodes': sum(1 for e in series_episodes
-                                     if e.get('workflow', {}).get('currentPhase') == 'assembly'
-                                     and e.get('workflow', {}).get('phases', {}).get('assembly', {}).get('status') == 'approved')
+    episodes_by_series = {
+        series_id: {
+            'seriesName': entry['seriesName'],
+            'totalEpisodes': entry.get('totalEpisodes', 0),
+            'completedEpisodes': entry.get('completedEpisodes', 0),
         }
+        for series_id, entry in (stats.get('series') or {}).items()
+        if isinstance(entry, dict) and 'seriesName' in entry
+    }
 
     return {
         'projectId': project_id,
-        'totalSeries': len(series_list),
-        'totalEpisodes': len(all_episodes),
+        'totalSeries': len(episodes_by_series),
+        'totalEpisodes': stats.get('totalEpisodes', 0),
         'phaseStats': phase_stats,
         'episodesBySeries': episodes_by_series,
         'bottlenecks': [
-            {'phase': phase, 'count': stats['review']}
-            for phase, stats in phase_stats.items()
-            if stats['review'] > 0
-        ]
+            {'phase': phase, 'count': counts['review']}
+            for phase, counts in phase_stats.items()
+            if counts['review'] > 0
+        ],
+        'statsUpdatedAt': stats.get('updatedAt'),
+    }
+
+
+# ============== Project Stats (materialized dashboard counters) ==============
+
+# One doc per project in COLLECTIONS['project_stats']:
+#   totalEpisodes, phaseStats.<phase>.<status>,
+#   series.<seriesId>.{seriesName, totalEpisodes, completedEpisodes}
+# Episode writes go through create/update/delete_episode_doc, which apply the
+# counter delta in the same transaction. Counters are only touched once the doc
+# exists; it is (re)built from a full scan on first dashboard read or via
+# POST /api/projects/<id>/dashboard/rebuild.
+PHASE_STAT_KEYS = ('pending', 'in_progress', 'review', 'approved')
+
+
+def _project_stats_ref(project_id):
+    return db.collection(COLLECTIONS['project_stats']).document(project_id)
+
+
+def _episode_project_id(episode):
+    return (episode or {}).get('projectId') or (episode or {}).get('project_id')
+
+
+def _episode_stat_counts(episode):
+    """Counter paths one episode contributes to its project's stats doc."""
+    counts = {}
+    if not episode:
+        return counts
+    counts[('totalEpisodes',)] = 1
+    for phase_key, phase_data in ((episode.get('workflow') or {}).get('phases') or {}).items():
+        status = (phase_data or {}).get('status', 'pending')
+        if phase_key in EPISODE_PHASES and status in PHASE_STAT_KEYS:
+            counts[('phaseStats', phase_key, status)] = 1
+    series_id = episode.get('seriesId')
+    if series_id:
+        counts[('series', series_id, 'totalEpisodes')] = 1
+        if is_episode_complete(episode):
+            counts[('series', series_id, 'completedEpisodes')] = 1
+    return counts
+
+
+def project_stats_increments(before, after):
+    """Nested Increment map for set(merge=True) moving an episode from `before` to `after`."""
+    delta = {}
+    for path, n in _episode_stat_counts(after).items():
+        delta[path] = delta.get(path, 0) + n
+    for path, n in _episode_stat_counts(before).items():
+        delta[path] = delta.get(path, 0) - n
+    return _nest_increments(delta)
+
+
+def project_stats_bulk_increments(episodes):
+    """Combined Increment map for adding many new episodes to one project."""
+    delta = {}
+    for episode in episodes:
+        for path, n in _episode_stat_counts(episode).items():
+            delta[path] = delta.get(path, 0) + n
+    return _nest_increments(delta)
+
+
+def _nest_increments(delta):
+    nested = {}
+    for path, n in delta.items():
+        if not n:
+            continue
+        node = nested
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = firestore.Increment(n)
+    return nested
+
+
+def _stage_stats_change(transaction, before, after):
+    """Read the stats doc(s) an episode change touches. Returns a callback that
+    stages the counter writes; Firestore needs every read before any write."""
+    staged = []
+    for project_id in {_episode_project_id(before), _episode_project_id(after)} - {None}:
+        if project_id == _episode_project_id(before) == _episode_project_id(after):
+            increments = project_stats_increments(before, after)
+        elif project_id == _episode_project_id(after):
+            increments = project_stats_increments(None, after)
+        else:
+            increments = project_stats_increments(before, None)
+        if not increments:
+            continue
+        stats_ref = _project_stats_ref(project_id)
+        if stats_ref.get(transaction=transaction).exists:
+            staged.append((stats_ref, increments))
+
+    def write():
+        now = datetime.utcnow().isoformat()
+        for stats_ref, increments in staged:
+            transaction.set(stats_ref, {**increments, 'updatedAt': now}, merge=True)
+    return write
+
+
+def create_episode_doc(data):
+    """Create an episode and bump its project's stats in one transaction."""
+    @firestore.transactional
+    def _create(transaction):
+        write_stats = _stage_stats_change(transaction, None, normalize_project_scope(data))
+        episode = create_doc('episodes', dict(data), transaction=transaction)
+        write_stats()
+        return episode
+
+    episode = _create(db.transaction())
+    doc_cache.put('episodes', episode['id'], episode)
+    return episode
+
+
+def create_episode_docs(items):
+    """Create many episodes with one bulk write, folding their stats into the same commit.
+
+    The counters only move when the stats doc already exists (as with
+    create_episode_doc); a missing doc is built from a full scan on first read."""
+    bulk = BulkWrite()
+    episodes = [bulk.create('episodes', data) for data in items]
+    by_project = {}
+    for episode in episodes:
+        by_project.setdefault(_episode_project_id(episode), []).append(episode)
+    now = datetime.utcnow().isoformat()
+    for project_id, project_episodes in by_project.items():
+        if project_id and _project_stats_ref(project_id).get().exists:
+            increments = project_stats_bulk_increments(project_episodes)
+            bulk.set('project_stats', project_id, {**increments, 'updatedAt': now}, merge=True)
+    bulk.commit()
+    return episodes
+
+
+def update_episode_doc(episode_id, mutate):
+    """Transactional read-modify-write of an episode that keeps project stats in step.
+
+    `mutate(episode)` gets a private copy of the current doc and returns the
+    fields to update (dotted field paths allowed), or None to abort. Returns the
+    merged document, or None if the episode doesn't exist. Raises ValueError for
+    updates that can't be merged locally (transforms, quoted field paths)."""
+    episode_ref = db.collection(COLLECTIONS['episodes']).document(episode_id)
+
+    @firestore.transactional
+    def _update(transaction):
+        before = doc_to_dict(episode_ref.get(transaction=transaction))
+        if not before:
+            return None
+        updates = mutate(copy.deepcopy(before))
+        if updates is None:
+            return None
+        updates['updatedAt'] = datetime.utcnow().isoformat()
+        after = merge_update(before, updates)
+        if after is None:
+            raise ValueError("Episode updates must be plain values")
+        write_stats = _stage_stats_change(transaction, before, after)
+        transaction.update(episode_ref, updates)
+        write_stats()
+        return after
+
+    doc_cache.invalidate('episodes', episode_id)
+    result = _update(db.transaction())
+    doc_cache.invalidate('episodes', episode_id)
+    return result
+
+
+def delete_episode_doc(episode_id):
+    """Delete an episode and remove its contribution from project stats."""
+    episode_ref = db.collection(COLLECTIONS['episodes']).document(episode_id)
+
+    @firestore.transactional
+    def _delete(transaction):
+        before = doc_to_dict(episode_ref.get(transaction=transaction))
+        write_stats = _stage_stats_change(transaction, before, None)
+        transaction.delete(episode_ref)
+        write_stats()
+
+    try:
+        _delete(db.transaction())
+    finally:
+        doc_cache.invalidate('episodes', episode_id)
+    return True
+
+
+def update_series_stats(project_id, series_id, series_name=None, remove=False):
+    """Register, rename or drop a series entry in an existing stats doc."""
+    if not project_id or not series_id:
+        return
+    field = f'series.{series_id}'
+    update = {field: firestore.DELETE_FIELD} if remove else {f'{field}.seriesName': series_name or 'Unknown'}
+    update['updatedAt'] = datetime.utcnow().isoformat()
+    try:
+        _project_stats_ref(project_id).update(update)
+    except Exception as e:
+        # Stats doc not built yet — the first dashboard read will include this series
+        print(f"[STATS] Skipped series update for {project_id}: {e}")
+
+
+def rebuild_project_stats(project_id):
+    """Recompute a project's stats doc from a full scan (drift repair / first build)."""
+    series_list = get_all_docs('series', project_id)
+    episodes = get_all_docs('episodes', project_id)
+    aggregate = aggregate_project_workflow(episodes, series_list)
+    now = datetime.utcnow().isoformat()
+    stats = {
+        'projectId': project_id,
+        'totalEpisodes': len(episodes),
+        'phaseStats': aggregate['phaseStats'],
+        'series': aggregate['episodesBySeries'],
+        'rebuiltAt': now,
+        'updatedAt': now,
     }
+    try:
+        _project_stats_ref(project_id).set(stats)
+    except Exception as e:
+        print(f"[STATS] Could not persist stats for {project_id}: {e}")
+    return stats
+
+
+# ============== Project Cascade Delete ==============
+
+# Deleting a project removes every document it owns — scoped by projectId /
+# project_id, or by one of its episode or series ids — plus its Cloud Storage
+# objects. It runs as a background job: the project doc is marked with a
+# `deletion` status first and removed last, so an interrupted job can simply
+# be started again with another DELETE.
+PROJECT_DELETE_SHARED_COLLECTIONS = {'projects', 'project_stats', 'users', 'universal_config', 'migrations', 'ai_cache', 'ai_metrics'}
+PROJECT_DELETE_BLOB_WORKERS = int(os.environ.get('PROJECT_DELETE_BLOB_WORKERS', '16'))
+PROJECT_GCS_PREFIXES = (
+    '{project_id}/',              # downloaded source documents
+    'assets/{project_id}/',
+    'social-media/{project_id}/',
+    'style-refs/{project_id}/',
+    'golden-scripts/{project_id}/',
+)
+EPISODE_GCS_PREFIXES = ('research/{episode_id}/', 'archive/{episode_id}/')
+FIRESTORE_IN_LIMIT = 30
+
+_project_delete_jobs = {}
+_project_delete_lock = threading.Lock()
+
+
+def _project_owned_ids(collection_name, project_id, episode_ids=(), series_ids=()):
+    """Ids of documents in a collection that belong to the project (ids only, no payloads)."""
+    collection = db.collection(COLLECTIONS[collection_name])
+    queries = [collection.where('projectId', '==', project_id),
+               collection.where('project_id', '==', project_id)]
+    for field, ids in (('episodeId', list(episode_ids)), ('seriesId', list(series_ids))):
+        for i in range(0, len(ids), FIRESTORE_IN_LIMIT):
+            queries.append(collection.where(field, 'in', ids[i:i + FIRESTORE_IN_LIMIT]))
+    found = []
+    seen = set()
+    for query in queries:
+        for doc in query.select([]).stream():
+            if doc.id not in seen:
+                seen.add(doc.id)
+                found.append(doc.id)
+    return found
+
+
+def _delete_project_blobs(project_id, episode_ids, job):
+    """Delete every blob under the project's (and its episodes') prefixes in parallel."""
+    bucket = storage_client.bucket(STORAGE_BUCKET)
+    prefixes = [p.format(project_id=project_id) for p in PROJECT_GCS_PREFIXES]
+    prefixes += [p.format(episode_id=e) for e in episode_ids for p in EPISODE_GCS_PREFIXES]
+
+    def delete_blob(name):
+        try:
+            bucket.blob(name).delete()
+            return True
+        except gcp_exceptions.NotFound:
+            return True
+        except Exception as e:
+            print(f"[DELETE] Could not delete gs://{STORAGE_BUCKET}/{name}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=PROJECT_DELETE_BLOB_WORKERS) as pool:
+        for prefix in prefixes:
+            names = [b.name for b in bucket.list_blobs(prefix=prefix, fields='items(name),nextPageToken')]
+            for ok in pool.map(delete_blob, names):
+                job['blobsDeleted' if ok else 'blobErrors'] += 1
+
+
+def _run_project_delete(project_id):
+    job = _project_delete_jobs[project_id]
+    try:
+        episode_ids = _project_owned_ids('episodes', project_id)
+        series_ids = _project_owned_ids('series', project_id)
+        job['phase'] = 'storage'
+        _delete_project_blobs(project_id, episode_ids, job)
+        if job['blobErrors']:
+            raise RuntimeError(f"{job['blobErrors']} storage objects could not be deleted")
+
+        job['phase'] = 'documents'
+        # Episodes and series go last so a rerun can still find their children
+        owned = [n for n in COLLECTIONS if n not in PROJECT_DELETE_SHARED_COLLECTIONS | {'episodes', 'series'}]
+        for collection_name in owned + ['episodes', 'series']:
+            job['current'] = collection_name
+            doc_ids = _project_owned_ids(collection_name, project_id, episode_ids, series_ids)
+            if collection_name == 'series_config':
+                doc_ids = list(dict.fromkeys(doc_ids + series_ids))
+            bulk = BulkWrite()
+            for doc_id in doc_ids:
+                bulk.delete(collection_name, doc_id)
+            bulk.commit()
+            job['collections'][collection_name] = len(doc_ids)
+            job['documentsDeleted'] += len(doc_ids)
+
+        bulk = BulkWrite()
+        bulk.delete('project_stats', project_id)
+        bulk.delete('projects', project_id)
+        bulk.commit()
+        job['documentsDeleted'] += 1
+
+        invalidate_story_card_cache(project_id)
+        for series_id in series_ids:
+            config_service.invalidate('series_config', series_id)
+        job['current'] = None
+        job['status'] = 'complete'
+        print(f"[DELETE] Project {project_id}: {job['documentsDeleted']} documents, {job['blobsDeleted']} blobs")
+    except Exception as e:
+        print(f"[DELETE] Project {project_id} failed: {e}")
+        job['status'] = 'failed'
+        job['error'] = str(e)
+        try:
+            db.collection(COLLECTIONS['projects']).document(project_id).update(
+                {'deletion': {'status': 'failed', 'error': str(e)}})
+            doc_cache.invalidate('projects', project_id)
+        except Exception:
+            pass
+    finally:
+        job['completedAt'] = datetime.utcnow().isoformat()
+
+
+def start_project_delete(project_id):
+    """Start (or return the already running) cascade delete job for a project."""
+    with _project_delete_lock:
+        job = _project_delete_jobs.get(project_id)
+        if job and job['status'] == 'running':
+            return job
+        job = {
+            'projectId': project_id,
+            'status': 'running',
+            'phase': 'starting',
+            'current': None,
+            'collections': {},
+            'documentsDeleted': 0,
+            'blobsDeleted': 0,
+            'blobErrors': 0,
+            'startedAt': datetime.utcnow().isoformat(),
+        }
+        _project_delete_jobs[project_id] = job
+    db.collection(COLLECTIONS['projects']).document(project_id).update(
+        {'deletion': {'status': 'running', 'startedAt': job['startedAt']}})
+    doc_cache.invalidate('projects', project_id)
+    threading.Thread(target=_run_project_delete, args=(project_id,), daemon=True).start()
+    return job
+
+
+# ============== Config Service ==============
+
+CONFIG_CACHE_TTL = float(os.environ.get("CONFIG_CACHE_TTL", "300"))
+CONFIG_LISTENERS = os.environ.get("CONFIG_LISTENERS", "0" if APP_ENV == "test" else "1") == "1"
+CONFIG_MAX_LISTENERS = 50
+
+
+class ConfigService:
+    """In-memory view of universal_config/global and series_config/<id>.
+
+    The first read of a doc attaches a Firestore on_snapshot listener so the
+    copy stays live; without an active listener entries are re-read after
+    CONFIG_CACHE_TTL seconds. The config write routes invalidate directly."""
+
+    def __init__(self, ttl, use_listeners):
+        self.ttl = ttl
+        self.use_listeners = use_listeners
+        self._entries = {}   # (collection_name, doc_id) -> (loaded_at, data or None)
+        self._watches = {}   # (collection_name, doc_id) -> Watch
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _is_live(self, key):
+        watch = self._watches.get(key)
+        return watch is not None and getattr(watch, 'is_active', False)
+
+    def get(self, collection_name, doc_id):
+        """Config document as a dict, or None if it does not exist."""
+        key = (collection_name, doc_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (self._is_live(key) or time.monotonic() - entry[0] < self.ttl):
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+
+        doc_ref = db.collection(COLLECTIONS[collection_name]).document(doc_id)
+        snap = doc_ref.get()
+        data = snap.to_dict() if snap.exists else None
+        with self._lock:
+            self._entries[key] = (time.monotonic(), data)
+        self._watch(key, doc_ref)
+        return copy.deepcopy(data)
+
+    def _watch(self, key, doc_ref):
+        if not self.use_listeners:
+            return
+        with self._lock:
+            if self._is_live(key) or len(self._watches) >= CONFIG_MAX_LISTENERS and key not in self._watches:
+                return
+
+        def on_change(docs, changes, read_time):
+            snap = docs[0] if docs else None
+            data = snap.to_dict() if snap is not None and snap.exists else None
+            with self._lock:
+                self._entries[key] = (time.monotonic(), data)
+
+        try:
+            watch = doc_ref.on_snapshot(on_change)
+            with self._lock:
+                self._watches[key] = watch
+        except Exception as e:
+            print(f"[CONFIG] Listener for {key[0]}/{key[1]} unavailable, using TTL: {e}")
+
+    def invalidate(self, collection_name, doc_id=None):
+        """Forget one config doc (or a whole collection) so the next read hits Firestore."""
+        with self._lock:
+            for key in [k for k in self._entries
+                        if k[0] == collection_name and (doc_id is None or k[1] == doc_id)]:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'liveListeners': sum(1 for k in self._watches if self._is_live(k)),
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    # --- Typed accessors ---
+
+    def universal_config(self):
+        return self.get('universal_config', 'global') or {}
+
+    def universal_rules(self):
+        """Thomas's craft rules, falling back to DEFAULT_UNIVERSAL_RULES."""
+        return self.universal_config().get('rules', DEFAULT_UNIVERSAL_RULES)
+
+    def series_config(self, series_id):
+        return (self.get('series_config', series_id) or {}) if series_id else {}
+
+    def script_format(self, series_id):
+        """Workflow format settings used by the script generators."""
+        workflow = self.series_config(series_id).get('workflow', {})
+        return {
+            'scriptFormat': workflow.get('scriptFormat', '2-column'),
+            'scriptColumns': workflow.get('scriptColumns', ['visuals', 'script']),
+            'factCheckMode': workflow.get('factCheckMode', 'at_generation'),
+        }
+
+    def commentary_format(self, series_id):
+        return self.series_config(series_id).get('scriptStyle', {}).get('commentaryFormat', 'CAPS')
+
+    def style_dna_directives(self, series_id):
+        """Style DNA `script_directives` for a series ({} when none saved)."""
+        return (self.series_config(series_id).get('styleDna') or {}).get('script_directives') or {}
+
+    def beat_sheet(self, series_id):
+        return self.series_config(series_id).get('beat_sheet', '')
+
+
+config_service = ConfigService(CONFIG_CACHE_TTL, CONFIG_LISTENERS)
+
+
+# ============== Model Registry ==============
+
+# GenerativeModel and Tool instances are built once per process and shared by
+# all request threads. Per-model constructor defaults (generation_config,
+# safety_settings, ...) are configured in MODEL_DEFAULTS.
+GROUNDED_MODEL_NAME = os.environ.get("MODEL_GROUNDED", "gemini-3.1-pro-preview")
+FAST_MODEL_NAME = os.environ.get("MODEL_FAST", "gemini-2.0-flash-001")
+MODEL_DEFAULTS = {}
+
+AI_TOOL_BUILDERS = {
+    'google_search': lambda: Tool._from_gapic(raw_tool=GapicTool(google_search=GapicTool.GoogleSearch())),
+}
+
+
+class ModelRegistry:
+    """Process-wide cache of GenerativeModel and Tool instances."""
+
+    def __init__(self):
+        self._models = {}
+        self._tools = {}
+        self._lock = threading.Lock()
+
+    def model(self, model_name=None):
+        """The shared GenerativeModel for a model name (the default model when omitted)."""
+        if not model_name or model_name == MODEL_NAME:
+            return model
+        instance = self._models.get(model_name)
+        if instance is None:
+            with self._lock:
+                instance = self._models.get(model_name)
+                if instance is None:
+                    instance = GenerativeModel(model_name, **MODEL_DEFAULTS.get(model_name, {}))
+                    self._models[model_name] = instance
+        return instance
+
+    def tool(self, name):
+        """The shared Tool registered under `name` in AI_TOOL_BUILDERS."""
+        instance = self._tools.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._tools.get(name)
+                if instance is None:
+                    instance = self._tools[name] = AI_TOOL_BUILDERS[name]()
+        return instance
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._tools.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'defaultModel': MODEL_NAME, 'models': sorted(self._models), 'tools': sorted(self._tools)}
+
+
+model_registry = ModelRegistry()
+
+
+def get_model(model_name=None):
+    """Shared GenerativeModel for `model_name` (default model when None)."""
+    return model_registry.model(model_name)
+
+
+def get_tool(name):
+    """Shared Vertex AI Tool, e.g. get_tool('google_search')."""
+    return model_registry.tool(name)
+
+
+# ============== AI Gateway ==============
+
+# Every Vertex AI call goes through ai_gateway, which keeps one governor per
+# model: a token bucket caps the request rate, an AIMD limit caps concurrency
+# (halved on 429s, trimmed when latency exceeds the target, grown by one slot
+# per window of healthy calls) and transient failures are retried with full
+# jitter until the call's deadline. The latency target is set per model and
+# grows with the call's max_output_tokens, so long script-writer calls are not
+# mistaken for congestion; streams hold a slot but do not feed the signal.
+#
+# Calls are scheduled in two lanes. Request threads run in the interactive
+# lane; background batch work opts into the batch lane with @ai_lane('batch').
+# Batch calls only take a slot when no interactive call is waiting, may hold at
+# most AI_BATCH_SHARE of a model's concurrency limit, and leave part of the
+# token bucket in reserve for interactive calls.
+AI_GATEWAY_RPS = float(os.environ.get("AI_GATEWAY_RPS", "5"))
+AI_GATEWAY_BURST = float(os.environ.get("AI_GATEWAY_BURST", "10"))
+AI_GATEWAY_MIN_CONCURRENCY = int(os.environ.get("AI_GATEWAY_MIN_CONCURRENCY", "1"))
+AI_GATEWAY_MAX_CONCURRENCY = int(os.environ.get("AI_GATEWAY_MAX_CONCURRENCY", "16"))
+AI_GATEWAY_INITIAL_CONCURRENCY = int(os.environ.get("AI_GATEWAY_INITIAL_CONCURRENCY", "4"))
+AI_GATEWAY_LATENCY_TARGET = float(os.environ.get("AI_GATEWAY_LATENCY_TARGET", "30"))
+AI_GATEWAY_LATENCY_TARGETS = {
+    GROUNDED_MODEL_NAME: 60.0,
+    **{name: float(seconds) for name, seconds in json.loads(os.environ.get("AI_GATEWAY_LATENCY_TARGETS", "{}")).items()},
+}
+AI_GATEWAY_SECONDS_PER_1K_OUTPUT_TOKENS = float(os.environ.get("AI_GATEWAY_SECONDS_PER_1K_OUTPUT_TOKENS", "10"))
+AI_CALL_DEADLINE = float(os.environ.get("AI_CALL_DEADLINE", "600"))
+AI_RETRY_ATTEMPTS = int(os.environ.get("AI_RETRY_ATTEMPTS", "4"))
+AI_RETRY_BASE = float(os.environ.get("AI_RETRY_BASE", "1.0"))
+AI_RETRY_CAP = float(os.environ.get("AI_RETRY_CAP", "30"))
+AI_LANES = ('interactive', 'batch')
+AI_BATCH_SHARE = float(os.environ.get("AI_BATCH_SHARE", "0.5"))
+AI_RATE_LIMITED = (gcp_exceptions.ResourceExhausted, gcp_exceptions.TooManyRequests)
+AI_TRANSIENT = AI_RATE_LIMITED + (
+    gcp_exceptions.ServiceUnavailable,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.InternalServerError,
+)
+
+
+class AIGatewayTimeout(RuntimeError):
+    """No rate or concurrency capacity became available before the call's deadline."""
+
+
+_ai_lane_local = threading.local()
+
+
+def current_ai_lane():
+    return getattr(_ai_lane_local, 'lane', None) or 'interactive'
+
+
+def current_ai_route():
+    """Flask endpoint of the current request, or the background job's name (for telemetry)."""
+    if has_request_context():
+        return request.endpoint or request.path
+    return getattr(_ai_lane_local, 'route', None) or 'background'
+
+
+def ai_lane(lane, route=None):
+    """Decorator: model calls made while fn runs are scheduled in `lane`.
+
+    Outside a request they are attributed to `route` (default: fn's name) in AI telemetry."""
+    def decorator(fn):
+        name = route or fn.__qualname__.replace('.<locals>', '')
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            previous = (getattr(_ai_lane_local, 'lane', None), getattr(_ai_lane_local, 'route', None))
+            _ai_lane_local.lane, _ai_lane_local.route = lane, name
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _ai_lane_local.lane, _ai_lane_local.route = previous
+        return wrapper
+    return decorator
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline, reserve=0):
+        """Take one token, sleeping as needed; False if none is available before `deadline`.
+
+        `reserve` tokens are left in the bucket for other callers."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1 + reserve:
+                    self._tokens -= 1
+                    return True
+                delay = (1 + reserve - self._tokens) / self.rate
+            if now + delay > deadline:
+                return False
+            time.sleep(delay)
+
+
+class ModelGovernor:
+    """Rate limit, AIMD concurrency limit and lane scheduling for one model."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.bucket = TokenBucket(AI_GATEWAY_RPS, AI_GATEWAY_BURST)
+        self.limit = float(AI_GATEWAY_INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._stats = {'calls': 0, 'retries': 0, 'rateLimited': 0, 'failures': 0, 'timeouts': 0}
+        self.lanes = {lane: {'queued': 0, 'inFlight': 0, 'started': 0, 'waitSeconds': 0.0, 'maxWaitSeconds': 0.0}
+                      for lane in AI_LANES}
+
+    def _has_room(self, lane):
+        if self.in_flight >= int(self.limit):
+            return False
+        if lane == 'batch':
+            return (self.lanes['interactive']['queued'] == 0 and
+                    self.lanes['batch']['inFlight'] < max(1, int(self.limit * AI_BATCH_SHARE)))
+        return True
+
+    def acquire(self, deadline, lane='interactive'):
+        queued_at = time.monotonic()
+        stats = self.lanes[lane]
+        reserve = self.bucket.burst * (1 - AI_BATCH_SHARE) if lane == 'batch' else 0
+        with self._cond:
+            stats['queued'] += 1
+        try:
+            if not self.bucket.acquire(deadline, reserve):
+                return False
+            with self._cond:
+                while not self._has_room(lane):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                waited = time.monotonic() - queued_at
+                self.in_flight += 1
+                stats['inFlight'] += 1
+                stats['started'] += 1
+                stats['waitSeconds'] += waited
+                stats['maxWaitSeconds'] = max(stats['maxWaitSeconds'], waited)
+                return True
+        finally:
+            with self._cond:
+                stats['queued'] -= 1
+                self._cond.notify_all()  # batch callers may proceed once interactive ones are served
+
+    def latency_target(self, max_output_tokens=None):
+        """Seconds a healthy call should take: the model's base target plus time to write its output."""
+        base = AI_GATEWAY_LATENCY_TARGETS.get(self.model_name, AI_GATEWAY_LATENCY_TARGET)
+        return base + AI_GATEWAY_SECONDS_PER_1K_OUTPUT_TOKENS * (max_output_tokens or 0) / 1000
+
+    def release(self, latency=None, rate_limited=False, lane='interactive', max_output_tokens=None):
+        """Free a slot and adapt the limit: halve on 429, trim on slow calls, else grow.
+
+        Pass latency=None for calls that should not feed the latency signal (streams, errors)."""
+        with self._cond:
+            self.in_flight -= 1
+            self.lanes[lane]['inFlight'] -= 1
+            if rate_limited:
+                self.limit = max(AI_GATEWAY_MIN_CONCURRENCY, self.limit / 2)
+            elif latency is not None and latency > self.latency_target(max_output_tokens):
+                self.limit = max(AI_GATEWAY_MIN_CONCURRENCY, self.limit * 0.9)
+            elif latency is not None:
+                self.limit = min(AI_GATEWAY_MAX_CONCURRENCY, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def count(self, stat):
+        with self._cond:
+            self._stats[stat] += 1
+
+    def stats(self):
+        with self._cond:
+            lanes = {lane: {'queued': s['queued'], 'inFlight': s['inFlight'], 'started': s['started'],
+                            'avgWaitMs': round(1000 * s['waitSeconds'] / s['started']) if s['started'] else 0,
+                            'maxWaitMs': round(1000 * s['maxWaitSeconds'])}
+                     for lane, s in self.lanes.items()}
+            return {**self._stats, 'limit': round(self.limit, 2), 'inFlight': self.in_flight,
+                    'tokens': round(self.bucket._tokens, 2), 'lanes': lanes}
+
+
+class AIGateway:
+    """Routes model calls through per-model governors with retries and deadlines."""
+
+    def __init__(self):
+        self._governors = {}
+        self._lock = threading.Lock()
+
+    def governor(self, model_name=None):
+        name = model_name or MODEL_NAME
+        with self._lock:
+            if name not in self._governors:
+                self._governors[name] = ModelGovernor(name)
+            return self._governors[name]
+
+    def acquire(self, model_name=None, deadline=None, lane=None):
+        """Reserve rate and concurrency capacity in `lane` (default: the current thread's lane).
+
+        Pair with governor.release(..., lane=lane)."""
+        governor = self.governor(model_name)
+        deadline = deadline or time.monotonic() + AI_CALL_DEADLINE
+        if not governor.acquire(deadline, lane or current_ai_lane()):
+            governor.count('timeouts')
+            raise AIGatewayTimeout(f"No capacity for {governor.model_name} before the call deadline")
+        return governor
+
+    def call(self, model_name, fn, deadline=None, max_output_tokens=None):
+        """Run fn() under the model's limits, retrying transient errors with jittered backoff.
+
+        max_output_tokens scales the latency the call may take before it counts as slow."""
+        started = time.monotonic()
+        deadline = deadline or started + AI_CALL_DEADLINE
+        lane, route = current_ai_lane(), current_ai_route()
+        attempt = 0
+        try:
+            for attempt in range(AI_RETRY_ATTEMPTS):
+                governor = self.acquire(model_name, deadline, lane)
+                governor.count('calls')
+                attempt_started = time.monotonic()
+                try:
+                    result = fn()
+                except AI_TRANSIENT as e:
+                    rate_limited = isinstance(e, AI_RATE_LIMITED)
+                    governor.release(rate_limited=rate_limited, lane=lane)
+                    if rate_limited:
+                        governor.count('rateLimited')
+                    delay = random.uniform(0, min(AI_RETRY_CAP, AI_RETRY_BASE * (2 ** attempt)))
+                    if attempt == AI_RETRY_ATTEMPTS - 1 or time.monotonic() + delay >= deadline:
+                        governor.count('failures')
+                        raise
+                    governor.count('retries')
+                    print(f"[AI-GATEWAY] {governor.model_name} call failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                    time.sleep(delay)
+                except Exception:
+                    governor.release(lane=lane)
+                    governor.count('failures')
+                    raise
+                else:
+                    governor.release(latency=time.monotonic() - attempt_started, lane=lane,
+                                     max_output_tokens=max_output_tokens)
+                    ai_telemetry.record_call(model_name, route, time.monotonic() - started, result, retries=attempt)
+                    return result
+        except Exception:
+            ai_telemetry.record_call(model_name, route, time.monotonic() - started, retries=attempt, error=True)
+            raise
+
+    def stats(self):
+        with self._lock:
+            governors = list(self._governors.values())
+        return {g.model_name: g.stats() for g in governors}
+
+
+ai_gateway = AIGateway()
+
+
+# ============== AI Telemetry ==============
+
+# Every model call records its model, calling route, token usage (from the
+# response's usage_metadata), latency, retries and errors; cached endpoints
+# also record cache hits and misses. Counters are aggregated in memory per
+# (route, model) with a latency histogram, served at /api/admin/ai-metrics,
+# and flushed periodically as hourly Firestore increments so every instance
+# adds into the same documents.
+AI_TELEMETRY_FLUSH_SECONDS = float(os.environ.get(
+    "AI_TELEMETRY_FLUSH_SECONDS", "0" if APP_ENV == 'test' else "60"))
+AI_LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 5000, 10000, 30000, 60000, 120000)
+# USD per million (input, output) tokens at list price; override with AI_MODEL_PRICES='{"model": [in, out]}'.
+# Models missing here are reported with estimatedCostUsd None and unpriced True.
+AI_MODEL_PRICES = {
+    'gemini-2.0-flash': (0.10, 0.40),
+    'gemini-2.0-flash-001': (0.10, 0.40),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-pro': (1.25, 10.00),
+    'gemini-3.1-pro-preview': (2.00, 12.00),
+    **{name: tuple(prices) for name, prices in json.loads(os.environ.get("AI_MODEL_PRICES", "{}")).items()},
+}
+_AI_METRIC_COUNTERS = ('calls', 'errors', 'retries', 'promptTokens', 'outputTokens',
+                       'cacheHits', 'cacheMisses', 'latencyMsSum')
+
+
+def _latency_bucket(latency_ms):
+    for bound in AI_LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return f"le{bound}"
+    return "inf"
+
+
+def _new_ai_metric():
+    return {**{name: 0 for name in _AI_METRIC_COUNTERS}, 'latencyMsMax': 0,
+            'latencyBuckets': {**{f"le{b}": 0 for b in AI_LATENCY_BUCKETS_MS}, 'inf': 0}}
+
+
+def _merge_ai_metric(target, delta):
+    for name in _AI_METRIC_COUNTERS:
+        target[name] += delta.get(name, 0)
+    target['latencyMsMax'] = max(target['latencyMsMax'], delta.get('latencyMsMax', 0))
+    for bucket, count in delta.get('latencyBuckets', {}).items():
+        target['latencyBuckets'][bucket] = target['latencyBuckets'].get(bucket, 0) + count
+
+
+def _usage_tokens(response):
+    """(prompt, output) token counts from a response's usage_metadata, 0 when absent."""
+    usage = getattr(response, 'usage_metadata', None)
+    prompt = getattr(usage, 'prompt_token_count', 0)
+    output = getattr(usage, 'candidates_token_count', 0)
+    return (prompt if isinstance(prompt, int) else 0), (output if isinstance(output, int) else 0)
+
+
+def _ai_metric_sort_key(summary):
+    # Most expensive first; unpriced routes lead so they can't hide at the bottom
+    return (summary['unpriced'], summary['estimatedCostUsd'] or 0,
+            summary['latencyMs']['avg'] * summary['calls'])
+
+
+def summarize_ai_metric(route, model_name, metric):
+    """Per-route report: totals, estimated cost, cache hit rate and latency percentiles from the histogram."""
+    calls = metric['calls']
+    prices = AI_MODEL_PRICES.get(model_name)
+
+    def percentile(q):
+        seen = 0
+        for bound in AI_LATENCY_BUCKETS_MS:
+            seen += metric['latencyBuckets'].get(f"le{bound}", 0)
+            if calls and seen >= q * calls:
+                return bound
+        return metric['latencyMsMax']
+
+    lookups = metric['cacheHits'] + metric['cacheMisses']
+    return {
+        'route': route,
+        'model': model_name,
+        **{name: metric[name] for name in _AI_METRIC_COUNTERS if name != 'latencyMsSum'},
+        'estimatedCostUsd': round((metric['promptTokens'] * prices[0] + metric['outputTokens'] * prices[1]) / 1e6, 4)
+                            if prices else None,
+        'unpriced': prices is None,
+        'cacheHitRate': round(metric['cacheHits'] / lookups, 4) if lookups else None,
+        'latencyMs': {
+            'avg': round(metric['latencyMsSum'] / calls) if calls else 0,
+            'p50': percentile(0.5) if calls else 0,
+            'p95': percentile(0.95) if calls else 0,
+            'max': metric['latencyMsMax'],
+        },
+        'latencyBuckets': metric['latencyBuckets'],
+    }
+
+
+class AITelemetry:
+    """In-process aggregation of model call metrics with periodic Firestore flushes."""
+
+    def __init__(self):
+        self._totals = {}   # (route, model) -> metric since process start
+        self._pending = {}  # (hour, route, model) -> metric not yet flushed
+        self._lock = threading.Lock()
+        self.since = datetime.utcnow().isoformat()
+
+    def _add(self, route, model_name, delta):
+        hour = datetime.utcnow().strftime('%Y-%m-%dT%H')
+        with self._lock:
+            for table, key in ((self._totals, (route, model_name)), (self._pending, (hour, route, model_name))):
+                if key not in table:
+                    table[key] = _new_ai_metric()
+                _merge_ai_metric(table[key], delta)
+
+    def record_call(self, model_name, route, latency, response=None, retries=0, error=False):
+        prompt_tokens, output_tokens = _usage_tokens(response)
+        latency_ms = int(latency * 1000)
+        self._add(route, model_name or MODEL_NAME, {
+            'calls': 1, 'errors': int(error), 'retries': retries,
+            'promptTokens': prompt_tokens, 'outputTokens': output_tokens,
+            'latencyMsSum': latency_ms, 'latencyMsMax': latency_ms,
+            'latencyBuckets': {_latency_bucket(latency_ms): 1},
+        })
+
+    def record_cache(self, model_name, route, hit):
+        self._add(route, model_name or MODEL_NAME, {'cacheHits' if hit else 'cacheMisses': 1})
+
+    def snapshot(self):
+        with self._lock:
+            totals = copy.deepcopy(self._totals)
+        routes = [summarize_ai_metric(route, model_name, metric) for (route, model_name), metric in totals.items()]
+        routes.sort(key=_ai_metric_sort_key, reverse=True)
+        return {'since': self.since, 'routes': routes}
+
+    def flush(self):
+        """Write pending deltas to Firestore as increments, one batch per chunk.
+
+        A chunk that definitely failed is re-queued; one that failed ambiguously
+        (it may have landed) is dropped, since re-applying its increments would
+        double-count. Returns the number of metric docs written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        items = list(pending.items())
+        flushed = 0
+        for i in range(0, len(items), BULK_WRITE_CHUNK):
+            chunk = items[i:i + BULK_WRITE_CHUNK]
+            writer = BulkWrite()
+            for (hour, route, model_name), metric in chunk:
+                doc_id = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{hour}_{route}_{model_name}")
+                writer.set('ai_metrics', doc_id, {
+                    'hour': hour,
+                    'route': route,
+                    'model': model_name,
+                    **{name: firestore.Increment(metric[name]) for name in _AI_METRIC_COUNTERS},
+                    'latencyMsMax': firestore.Maximum(metric['latencyMsMax']),
+                    'latencyBuckets': {b: firestore.Increment(n) for b, n in metric['latencyBuckets'].items() if n},
+                    'updatedAt': datetime.utcnow().isoformat(),
+                }, merge=True)
+            try:
+                writer.commit()
+                flushed += len(chunk)
+            except Exception as e:
+                if isinstance(e.__cause__, BULK_WRITE_AMBIGUOUS):
+                    print(f"[AI-METRICS] Flush of {len(chunk)} metric docs may have landed ({e}); not re-queued")
+                    continue
+                print(f"[AI-METRICS] Flush of {len(chunk)} metric docs failed: {e}")
+                with self._lock:
+                    for key, metric in chunk:
+                        if key not in self._pending:
+                            self._pending[key] = _new_ai_metric()
+                        _merge_ai_metric(self._pending[key], metric)
+        return flushed
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+            self._pending.clear()
+            self.since = datetime.utcnow().isoformat()
+
+
+ai_telemetry = AITelemetry()
+
+
+def ai_metrics_from_firestore(hours):
+    """Per-route summaries from the flushed hourly docs of all instances over the last `hours`."""
+    cutoff = (datetime.utcnow() - timedelta(hours=hours)).strftime('%Y-%m-%dT%H')
+    totals = {}
+    for doc in db.collection(COLLECTIONS['ai_metrics']).where('hour', '>=', cutoff).stream():
+        data = doc.to_dict()
+        key = (data.get('route'), data.get('model'))
+        if key not in totals:
+            totals[key] = _new_ai_metric()
+        _merge_ai_metric(totals[key], data)
+    routes = [summarize_ai_metric(route, model_name, metric) for (route, model_name), metric in totals.items()]
+    routes.sort(key=_ai_metric_sort_key, reverse=True)
+    return {'since': cutoff, 'routes': routes}
+
+
+def _flush_ai_telemetry_forever():
+    while True:
+        time.sleep(AI_TELEMETRY_FLUSH_SECONDS)
+        ai_telemetry.flush()
+
+
+# ============== Request Coalescing ==============
+
+# Identical AI requests that arrive while one is already in flight (several
+# people opening the same episode) wait for that call and share its response
+# instead of each spending a Vertex AI request. Nothing is kept once the call
+# finishes; repeat requests later are the AI Response Cache's job.
+AI_COALESCE_WAIT = float(os.environ.get("AI_COALESCE_WAIT", "600"))
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self, wait_timeout=AI_COALESCE_WAIT):
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'shared': 0, 'waitTimeouts': 0}
+
+    def do(self, key, fn):
+        """Return fn(), or the result of the identical call already running under `key`.
+
+        A follower that waits longer than wait_timeout runs fn() itself."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                self._stats['calls'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not leader:
+            if call['done'].wait(self.wait_timeout):
+                if call['error'] is not None:
+                    raise call['error']
+                return call['result']
+            with self._lock:
+                self._stats['waitTimeouts'] += 1
+            return fn()
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['done'].set()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'inFlight': len(self._calls)}
+
+
+ai_single_flight = SingleFlight()
+
+
+def _fingerprint_default(value):
+    """JSON fallback for request fingerprints: SDK objects by content, bytes by digest."""
+    if isinstance(value, (bytes, bytearray)):
+        return hashlib.sha256(value).hexdigest()
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    return repr(value)
+
+
+def ai_request_key(contents, model_name=None, **kwargs):
+    """sha256 fingerprint of a generate_content request (model, contents, config, tools)."""
+    material = json.dumps({
+        'model': model_name or MODEL_NAME,
+        'contents': contents,
+        'kwargs': kwargs,
+    }, sort_keys=True, default=_fingerprint_default)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def coalesced_generate_content(contents, model_name=None, **kwargs):
+    """get_model(model_name).generate_content(contents, **kwargs) through the AI gateway,
+    shared with identical in-flight calls."""
+    key = ai_request_key(contents, model_name, **kwargs)
+    max_output_tokens = (kwargs.get('generation_config') or {}).get('max_output_tokens')
+    return ai_single_flight.do(key, lambda: ai_gateway.call(
+        model_name, lambda: get_model(model_name).generate_content(contents, **kwargs),
+        max_output_tokens=max_output_tokens))
 
 
 # ============== AI Functions ==============
@@ -829,25 +2687,659 @@ def clean_ai_response(text):
     return cleaned.strip()
 
 
-def generate_ai_response(prompt, system_prompt="", model_name=None, generation_config=None):
-    """Generate AI response using Vertex AI. Pass model_name to use a specific model for this call.
-    Raises RuntimeError on failure instead of returning an error string."""
-    try:
-        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
-        active_model = GenerativeModel(model_name) if model_name else model
-        config = generation_config or {}
-        response = active_model.generate_content(full_prompt, generation_config=config)
-        return response.text
-    except Exception as e:
-        raise RuntimeError(f"AI generation failed: {str(e)}") from e
+def generate_ai_response(prompt, system_prompt="", model_name=None, generation_config=None):
+    """Generate AI response using Vertex AI. Pass model_name to use a specific model for this call.
+    Raises RuntimeError on failure instead of returning an error string."""
+    try:
+        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        config = generation_config or {}
+        response = coalesced_generate_content(full_prompt, model_name, generation_config=config)
+        return response.text
+    except Exception as e:
+        raise RuntimeError(f"AI generation failed: {str(e)}") from e
+
+
+def stream_ai_response(prompt, system_prompt="", model_name=None, generation_config=None):
+    """Streaming counterpart of generate_ai_response: yields text as Vertex AI produces it."""
+    full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+    active_model = get_model(model_name)
+    # Streams hold a gateway slot until they finish but are not retried: text
+    # already relayed to the client cannot be taken back. Their duration is set
+    # by the client and the output length, so they stay out of the latency signal.
+    lane, route = current_ai_lane(), current_ai_route()
+    governor = ai_gateway.acquire(model_name, lane=lane)
+    governor.count('calls')
+    started = time.monotonic()
+    last_chunk = None
+    rate_limited = failed = False
+    try:
+        for chunk in active_model.generate_content(full_prompt, generation_config=generation_config or {}, stream=True):
+            last_chunk = chunk  # usage_metadata is complete on the final chunk
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # chunk without text parts (finish reason / safety ratings only)
+            if text:
+                yield text
+    except Exception as e:
+        failed, rate_limited = True, isinstance(e, AI_RATE_LIMITED)
+        governor.count('rateLimited' if rate_limited else 'failures')
+        raise RuntimeError(f"AI generation failed: {str(e)}") from e
+    finally:
+        governor.release(rate_limited=rate_limited, lane=lane)
+        ai_telemetry.record_call(model_name, route, time.monotonic() - started, last_chunk, error=failed)
+
+
+def wants_stream():
+    """True when the caller asked for Server-Sent Events (?stream=1 or "stream": true)."""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    data = request.get_json(silent=True)
+    return isinstance(data, dict) and data.get('stream') is True
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(chunks, on_complete=None):
+    """Relay text chunks to the client as Server-Sent Events.
+
+    Emits a `chunk` event ({"text": ...}) per piece of text, then `done` with
+    whatever on_complete(full_text) returns — typically the id of the document
+    it persisted — or `error` if generation fails part-way."""
+    def generate():
+        parts = []
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield sse_event('chunk', {'text': text})
+            result = on_complete(''.join(parts)) if on_complete else None
+            yield sse_event('done', result or {})
+        except Exception as e:
+            print(f"[SSE] Stream failed after {len(parts)} chunks: {e}")
+            yield sse_event('error', {'error': str(e)})
+
+    return event_stream_response(generate())
+
+
+def event_stream_response(events):
+    """text/event-stream Response for a generator of sse_event() strings (unbuffered by proxies)."""
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def generate_grounded_research(prompt, system_prompt=""):
+    """Placeholder - AI research functionality disabled in this build."""
+    return {
+        'text': 'AI Research functionality is not available in this build.',
+        'sources': []
+    }
+
+
+# ============== AI Response Cache ==============
+
+# Content-addressed cache for deterministic analysis endpoints. The key hashes
+# the model, system prompt, prompt, generation config and the endpoint's prompt
+# template version (bump AI_PROMPT_VERSIONS when post-processing changes).
+# Tier 1 is an in-process LRU; tier 2 is a Firestore collection shared across
+# instances (`expiresAt` is a timestamp, so a Firestore TTL policy can purge it).
+AI_CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", str(7 * 24 * 3600)))
+AI_CACHE_MEMORY_TTL = float(os.environ.get("AI_CACHE_MEMORY_TTL", "3600"))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "500"))
+AI_CACHE_MAX_BYTES = int(os.environ.get("AI_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+AI_CACHE_MAX_DOC_BYTES = 900 * 1024  # stay under Firestore's 1 MiB document limit
+AI_PROMPT_VERSIONS = {
+    'analyze_clip': 1,
+    'index_source': 1,
+    'analyze_document': 1,
+    'find_experts': 1,
+    'series_structure': 1,
+    'interview_plan': 1,
+    'generate_broll': 1,
+}
+
+ai_memory_cache = DocCache(AI_CACHE_MEMORY_TTL, AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_BYTES)
+_ai_cache_stats = {'memoryHits': 0, 'firestoreHits': 0, 'misses': 0, 'bypassed': 0, 'errors': 0}
+_ai_cache_stats_lock = threading.Lock()
+
+
+def _count_ai_cache(name):
+    with _ai_cache_stats_lock:
+        _ai_cache_stats[name] += 1
+
+
+def ai_cache_key(prompt, system_prompt="", model_name=None, generation_config=None, template=None):
+    """sha256 over everything that determines a model response."""
+    material = json.dumps({
+        'model': model_name or MODEL_NAME,
+        'system': system_prompt or '',
+        'prompt': prompt,
+        'config': generation_config or {},
+        'template': f"{template}:v{AI_PROMPT_VERSIONS.get(template, 0)}" if template else None,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def wants_no_cache():
+    """True when the caller asked to bypass the AI cache (?noCache=1 or "noCache": true)."""
+    if request.args.get('noCache', '').lower() in ('1', 'true'):
+        return True
+    data = request.get_json(silent=True)
+    return isinstance(data, dict) and data.get('noCache') is True
+
+
+def cached_ai_response(prompt, system_prompt="", model_name=None, generation_config=None,
+                       template=None, no_cache=False):
+    """generate_ai_response behind the two-tier response cache.
+
+    no_cache skips the lookup but still stores the fresh response."""
+    key = ai_cache_key(prompt, system_prompt, model_name, generation_config, template)
+    ref = db.collection(COLLECTIONS['ai_cache']).document(key)
+
+    if no_cache:
+        _count_ai_cache('bypassed')
+    else:
+        entry = ai_memory_cache.get('ai', key)
+        if entry is not None:
+            _count_ai_cache('memoryHits')
+            ai_telemetry.record_cache(model_name, current_ai_route(), hit=True)
+            return entry['text']
+        try:
+            snap = ref.get()
+            data = snap.to_dict() if snap.exists else None
+            expires_at = (data or {}).get('expiresAt')
+            if data and expires_at and expires_at.replace(tzinfo=None) > datetime.utcnow():
+                _count_ai_cache('firestoreHits')
+                ai_telemetry.record_cache(model_name, current_ai_route(), hit=True)
+                ai_memory_cache.put('ai', key, {'text': data['text']})
+                return data['text']
+        except Exception as e:
+            _count_ai_cache('errors')
+            print(f"[AI-CACHE] Lookup failed: {e}")
+        _count_ai_cache('misses')
+        ai_telemetry.record_cache(model_name, current_ai_route(), hit=False)
+
+    text = generate_ai_response(prompt, system_prompt, model_name=model_name, generation_config=generation_config)
+    ai_memory_cache.put('ai', key, {'text': text})
+    if len(text.encode('utf-8')) <= AI_CACHE_MAX_DOC_BYTES:
+        try:
+            ref.set({
+                'text': text,
+                'model': model_name or MODEL_NAME,
+                'template': template,
+                'createdAt': datetime.utcnow().isoformat(),
+                'expiresAt': datetime.utcnow() + timedelta(seconds=AI_CACHE_TTL),
+            })
+        except Exception as e:
+            _count_ai_cache('errors')
+            print(f"[AI-CACHE] Store failed: {e}")
+    return text
+
+
+def ai_cache_stats():
+    with _ai_cache_stats_lock:
+        counts = dict(_ai_cache_stats)
+    lookups = counts['memoryHits'] + counts['firestoreHits'] + counts['misses']
+    hits = lookups - counts['misses']
+    return {
+        **counts,
+        'hitRate': round(hits / lookups, 4) if lookups else 0.0,
+        'ttlSeconds': AI_CACHE_TTL,
+        'memory': ai_memory_cache.stats(),
+    }
+
+
+# ============== Structured Output ==============
+
+# generate_json() asks the model for JSON matching a schema (Vertex AI
+# controlled generation: response_mime_type + response_schema), then parses,
+# repairs and validates the reply locally. Elements that fail validation are
+# re-prompted on their own and spliced back; only if the whole document is
+# unusable is the full request sent again. Schemas use the Vertex AI Schema
+# dialect (type names in upper case) and are declared next to each endpoint.
+JSON_MAX_FRAGMENT_REPROMPTS = int(os.environ.get("JSON_MAX_FRAGMENT_REPROMPTS", "3"))
+_JSON_TYPES = {
+    'OBJECT': dict, 'ARRAY': list, 'STRING': str, 'BOOLEAN': bool,
+    'INTEGER': int, 'NUMBER': (int, float),
+}
+_NO_DEFAULT = object()
+
+
+class JSONGenerationError(RuntimeError):
+    """The model's reply could not be turned into JSON matching the schema."""
+
+    def __init__(self, message, text=''):
+        super().__init__(message)
+        self.text = text
+
+
+def repair_json(text):
+    """Parse JSON from model output, fixing what a truncated or sloppy reply typically gets wrong.
+
+    Handles code fences and prose around the value, trailing commas and output
+    cut off mid-string or mid-container (the last incomplete element is
+    dropped). Raises ValueError if nothing parseable remains."""
+    cleaned = clean_ai_response(text)
+    starts = [i for i in (cleaned.find('{'), cleaned.find('[')) if i >= 0]
+    if not starts:
+        raise ValueError("No JSON value in response")
+    cleaned = cleaned[min(starts):]
+
+    stack, in_string, escaped = [], False, False
+    last_comma = None  # (index, open containers) at the last element boundary
+    candidates = []
+    for i, ch in enumerate(cleaned):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                candidates.append(cleaned[:i + 1])  # complete value; ignore anything after it
+                break
+        elif ch == ',':
+            last_comma = (i, list(stack))
+    else:
+        # Truncated: close the open string and containers, or fall back to the last complete element
+        tail = (cleaned + ('"' if in_string else '')).rstrip().rstrip(',')
+        if tail.endswith(':'):
+            tail += ' null'
+        candidates.append(tail + ''.join(reversed(stack)))
+        if last_comma:
+            candidates.append(cleaned[:last_comma[0]] + ''.join(reversed(last_comma[1])))
+
+    for candidate in candidates:
+        try:
+            return json.loads(re.sub(r',\s*([}\]])', r'\1', candidate))
+        except ValueError:
+            continue
+    raise ValueError("Could not repair JSON response")
+
+
+def parse_json_text(text):
+    """json.loads on the reply, falling back to repair_json."""
+    try:
+        return json.loads(clean_ai_response(text))
+    except ValueError:
+        return repair_json(text)
+
+
+def _json_path(path):
+    return '$' + ''.join(f"[{p}]" if isinstance(p, int) else f".{p}" for p in path)
+
+
+def validate_json(value, schema, path=()):
+    """List of (path, problem) where `value` does not match `schema`; empty when valid."""
+    kind = (schema.get('type') or '').upper()
+    if value is None:
+        return [] if schema.get('nullable') or not kind else [(path, f"expected {kind.lower()}, got null")]
+    expected = _JSON_TYPES.get(kind)
+    if expected and (not isinstance(value, expected) or (kind in ('INTEGER', 'NUMBER') and isinstance(value, bool))):
+        return [(path, f"expected {kind.lower()}, got {type(value).__name__}")]
+    if 'enum' in schema and value not in schema['enum']:
+        return [(path, f"{value!r} is not one of {schema['enum']}")]
+
+    errors = []
+    if kind == 'OBJECT':
+        errors += [(path, f"missing required field '{key}'") for key in schema.get('required', []) if key not in value]
+        for key, subschema in schema.get('properties', {}).items():
+            if key in value:
+                errors += validate_json(value[key], subschema, path + (key,))
+    elif kind == 'ARRAY' and 'items' in schema:
+        for i, item in enumerate(value):
+            errors += validate_json(item, schema['items'], path + (i,))
+    return errors
+
+
+def _schema_at(schema, path):
+    for part in path:
+        schema = schema['items'] if isinstance(part, int) else schema['properties'][part]
+    return schema
+
+
+def _value_at(value, path):
+    for part in path:
+        value = value[part]
+    return value
+
+
+def _fragment_path(path):
+    """The array element enclosing an invalid value — the unit that gets re-prompted ('()' is the root)."""
+    indexes = [i for i, part in enumerate(path) if isinstance(part, int)]
+    return path[:indexes[-1] + 1] if indexes else ()
+
+
+def generate_json(prompt, schema, system_prompt="", model_name=None, generation_config=None,
+                  tools=None, template=None, no_cache=False, default=_NO_DEFAULT, reprompt=True):
+    """Generate a JSON value matching `schema`.
+
+    `prompt` may be a string or a list of content parts (e.g. a video Part and
+    instructions). String prompts without tools go through generate_ai_response
+    (or cached_ai_response when `template` is given); other requests call the
+    model directly. Grounding tools can't be combined with controlled
+    generation, so with `tools` the schema is only enforced locally.
+
+    Invalid array elements are re-prompted individually; any still invalid are
+    dropped. If the document as a whole is unusable the request is repeated
+    once. After that, `default` is returned if given, else JSONGenerationError
+    is raised (its `.text` holds the last raw reply). reprompt=False skips the
+    model round-trips and relies on local repair only."""
+    def generate(contents, target_schema, fresh=False):
+        config = dict(generation_config or {})
+        if not tools:
+            config.update(response_mime_type='application/json', response_schema=target_schema)
+        if isinstance(contents, str) and not tools:
+            if template and contents is prompt:
+                return cached_ai_response(contents, system_prompt, model_name, config,
+                                          template=template, no_cache=no_cache or fresh)
+            return generate_ai_response(contents, system_prompt, model_name=model_name, generation_config=config)
+        if system_prompt:
+            contents = [system_prompt, *contents] if isinstance(contents, list) else f"{system_prompt}\n\n{contents}"
+        kwargs = {'generation_config': config}
+        if tools:
+            kwargs['tools'] = tools
+        return coalesced_generate_content(contents, model_name, **kwargs).text
+
+    def with_note(note):
+        return [*prompt, note] if isinstance(prompt, list) else f"{prompt}\n\n{note}"
+
+    def attempt(fresh=False):
+        text = generate(prompt, schema, fresh)
+        try:
+            value = parse_json_text(text)
+        except ValueError:
+            return text, None, [((), "response is not valid JSON")]
+        return text, value, validate_json(value, schema)
+
+    text, value, errors = attempt()
+    if errors and value is not None and reprompt:
+        value, errors = _reprompt_fragments(value, errors, schema, generate, with_note)
+    if errors and reprompt:
+        print(f"[JSON] Response failed validation ({_json_path(errors[0][0])}: {errors[0][1]}); retrying request")
+        text, value, errors = attempt(fresh=True)
+        if errors and value is not None:
+            value, errors = _reprompt_fragments(value, errors, schema, generate, with_note)
+    if not errors:
+        return value
+    message = f"Model returned invalid JSON at {_json_path(errors[0][0])}: {errors[0][1]}"
+    if default is not _NO_DEFAULT:
+        print(f"[JSON] {message}; using default")
+        return copy.deepcopy(default)
+    raise JSONGenerationError(message, text)
+
+
+def _reprompt_fragments(value, errors, schema, generate, with_note):
+    """Re-prompt each invalid array element on its own, splice fixes back, drop what stays invalid."""
+    fragments = {}
+    for path, problem in errors:
+        fragments.setdefault(_fragment_path(path), []).append(f"{_json_path(path)}: {problem}")
+    if () in fragments or len(fragments) > JSON_MAX_FRAGMENT_REPROMPTS:
+        return value, errors  # the document itself is wrong; not worth patching piecemeal
+
+    for path, problems in fragments.items():
+        fragment_schema = _schema_at(schema, path)
+        note = (f"Your previous JSON reply had an invalid element at {_json_path(path)}:\n"
+                f"{json.dumps(_value_at(value, path))}\n"
+                f"Problems: {'; '.join(problems)}\n"
+                f"Return ONLY the corrected JSON for that one element.")
+        try:
+            fixed = parse_json_text(generate(with_note(note), fragment_schema))
+        except Exception as e:
+            print(f"[JSON] Re-prompt for {_json_path(path)} failed: {e}")
+            continue
+        if not validate_json(fixed, fragment_schema):
+            _value_at(value, path[:-1])[path[-1]] = fixed
+
+    # Drop elements that are still invalid (highest index first so earlier paths stay valid)
+    for path in sorted({_fragment_path(p) for p, _ in validate_json(value, schema)} - {()}, reverse=True):
+        print(f"[JSON] Dropping invalid element {_json_path(path)}")
+        del _value_at(value, path[:-1])[path[-1]]
+    return value, validate_json(value, schema)
+
+
+# ============== Model Routing ==============
+
+# Endpoints name a routing policy: the model tiers to try, cheapest first.
+# Each tier's output is checked by the endpoint's validators (schema, length,
+# required sections); a rejected output or a failed call escalates to the next
+# tier, and the last tier's output is used as-is. Policies can be overridden
+# with MODEL_ROUTING='{"extract_stories": ["pro"]}' (a tier may also be a model name).
+MODEL_TIERS = {
+    'fast': FAST_MODEL_NAME,
+    'pro': os.environ.get("MODEL_PRO", "gemini-2.5-pro"),
+    'grounded': GROUNDED_MODEL_NAME,
+}
+ROUTING_POLICIES = {
+    'extract_stories': ['fast', 'pro'],
+    'deep_research_fast_track': ['fast', 'grounded'],
+    'generate_beat_sheet': ['fast', 'grounded'],
+    **json.loads(os.environ.get("MODEL_ROUTING", "{}")),
+}
+
+_routing_stats = {}
+_routing_stats_lock = threading.Lock()
+
+
+def routing_models(policy):
+    """Model names for a policy's tiers, cheapest first."""
+    return [MODEL_TIERS.get(tier, tier) for tier in ROUTING_POLICIES.get(policy) or [MODEL_NAME]]
+
+
+def min_words(count):
+    """Validator: reject text shorter than `count` words."""
+    def check(text):
+        words = len(text.split())
+        return [] if words >= count else [f"only {words} words (need {count})"]
+    return check
+
+
+def required_sections(*sections):
+    """Validator: reject text missing any of the given section headings (case-insensitive)."""
+    def check(text):
+        lowered = text.lower()
+        missing = [section for section in sections if section.lower() not in lowered]
+        return [f"missing sections: {', '.join(missing)}"] if missing else []
+    return check
+
+
+def _record_routing(policy, model_name, outcome):
+    with _routing_stats_lock:
+        counts = _routing_stats.setdefault(policy, {'accepted': {}, 'escalated': {}})[outcome]
+        counts[model_name] = counts.get(model_name, 0) + 1
+
+
+def model_routing_stats():
+    with _routing_stats_lock:
+        return {'tiers': MODEL_TIERS, 'policies': ROUTING_POLICIES, 'outcomes': copy.deepcopy(_routing_stats)}
+
+
+def _routed(policy, generate, validators):
+    """Run generate(model_name, final) per tier until validators accept the result."""
+    models = routing_models(policy)
+    for i, model_name in enumerate(models):
+        final = i == len(models) - 1
+        try:
+            result = generate(model_name, final)
+        except Exception as e:
+            if final:
+                raise
+            problems = [f"call failed: {e}"]
+        else:
+            problems = [problem for validator in validators for problem in validator(result)]
+            if not problems or final:
+                _record_routing(policy, model_name, 'accepted')
+                return result
+        _record_routing(policy, model_name, 'escalated')
+        print(f"[ROUTING] {policy}: {model_name} rejected ({'; '.join(problems)}); escalating to {models[i + 1]}")
+
+
+def routed_generate(policy, prompt, system_prompt="", validators=(), **kwargs):
+    """Text from the cheapest tier of `policy` whose output passes every validator.
+
+    kwargs (generation_config, tools, ...) go to generate_content."""
+    contents = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+    return _routed(policy, lambda model_name, final: coalesced_generate_content(contents, model_name, **kwargs).text,
+                   validators)
+
+
+def routed_generate_json(policy, prompt, schema, validators=(), default=_NO_DEFAULT, **kwargs):
+    """generate_json across the tiers of `policy`.
+
+    Cheaper tiers only get local repair: a schema failure escalates straight to
+    the next tier instead of re-prompting. The last tier gets generate_json's
+    full repair, and `default` applies only there."""
+    def generate(model_name, final):
+        return generate_json(prompt, schema, model_name=model_name, reprompt=final,
+                             default=default if final else _NO_DEFAULT, **kwargs)
+    return _routed(policy, generate, validators)
+
+
+# ============== Context Packing ==============
+
+# Prompt context (briefs, research, transcripts, archive logs) is packed into
+# a per-model token budget instead of being sliced at fixed character counts.
+# Sections are filled in CONTEXT_PRIORITY order, newest first within a kind;
+# passages already included are skipped, and whatever does not fit is
+# reported as dropped.
+CONTEXT_TOKEN_BUDGETS = {
+    'default': int(os.environ.get("CONTEXT_TOKEN_BUDGET", "12000")),
+}
+CONTEXT_PRIORITY = ('brief', 'research', 'transcript', 'archive')
+CONTEXT_MIN_DEDUPE_CHARS = 40  # shorter passages (headings, separators) may repeat
+TOKEN_COUNT_CACHE_SIZE = 4096
+
+_token_counts = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+def context_budget(model_name=None):
+    """Context token budget for a model (CONTEXT_TOKEN_BUDGETS['default'] if not listed)."""
+    return CONTEXT_TOKEN_BUDGETS.get(model_name or MODEL_NAME, CONTEXT_TOKEN_BUDGETS['default'])
+
+
+@functools.lru_cache(maxsize=8)
+def _local_tokenizer(model_name):
+    """Vertex AI's local tokenizer for the model, or None (needs the sentencepiece extra)."""
+    try:
+        from vertexai.preview.tokenization import get_tokenizer_for_model
+        return get_tokenizer_for_model(model_name)
+    except Exception:
+        return None
+
+
+def estimate_tokens(text):
+    """Cheap approximation: ~4 characters per token for English prose."""
+    return (len(text) + 3) // 4
+
+
+def count_tokens(text, model_name=None):
+    """Token count from the model's local tokenizer when available, memoized by content."""
+    if not text:
+        return 0
+    model_name = model_name or MODEL_NAME
+    key = (model_name, hashlib.sha1(text.encode('utf-8')).hexdigest())
+    with _token_counts_lock:
+        if key in _token_counts:
+            _token_counts.move_to_end(key)
+            return _token_counts[key]
+    tokenizer = _local_tokenizer(model_name)
+    try:
+        tokens = tokenizer.count_tokens(text).total_tokens if tokenizer else estimate_tokens(text)
+    except Exception:
+        tokens = estimate_tokens(text)
+    with _token_counts_lock:
+        _token_counts[key] = tokens
+        while len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return tokens
+
+
+def _truncate_to_tokens(text, max_tokens, model_name=None):
+    """Longest prefix of text within max_tokens, cut back to a line break where possible."""
+    tokens = count_tokens(text, model_name)
+    if tokens <= max_tokens:
+        return text
+    cut = text[:int(len(text) * max_tokens / tokens)]
+    while cut and count_tokens(cut, model_name) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    newline = cut.rfind('\n')
+    return cut[:newline] if newline > len(cut) // 2 else cut
+
+
+def pack_context(sections, model_name=None, budget=None):
+    """Fill a token budget with context sections by priority.
+
+    Each section is a dict with `text` and optional `kind` (see CONTEXT_PRIORITY),
+    `title` (rendered as a `--- title ---` header) and `date` (ISO string; newer
+    sections of the same kind go first). Returns {'text', 'tokens', 'budget',
+    'sections', 'dropped'}: `sections` are the packed sections (with their
+    `text` trimmed to what fit) and `dropped` lists what was cut and why."""
+    budget = context_budget(model_name) if budget is None else budget
+    rank = {kind: i for i, kind in enumerate(CONTEXT_PRIORITY)}
+    ordered = sorted(sections, key=lambda s: s.get('date') or '', reverse=True)
+    ordered.sort(key=lambda s: rank.get(s.get('kind'), len(rank)))
+
+    remaining = budget
+    seen = set()
+    packed, dropped = [], []
+    for section in ordered:
+        title = section.get('title')
+        header = f"--- {title} ---\n" if title else ""
+        header_tokens = count_tokens(header, model_name)
+        kept, duplicates, truncated = [], 0, False
+        for passage in (section.get('text') or '').split('\n\n'):
+            normalized = ' '.join(passage.lower().split())
+            if not normalized:
+                continue
+            if len(normalized) >= CONTEXT_MIN_DEDUPE_CHARS:
+                if normalized in seen:
+                    duplicates += 1
+                    continue
+            cost = count_tokens(passage, model_name) + (0 if kept else header_tokens)
+            if cost > remaining:
+                room = remaining - (0 if kept else header_tokens)
+                if room > 50:
+                    kept.append(_truncate_to_tokens(passage, room, model_name))
+                    remaining = 0
+                truncated = True
+                break
+            seen.add(normalized)
+            kept.append(passage)
+            remaining -= cost
+        if kept:
+            packed.append({**section, 'text': '\n\n'.join(kept), 'header': header})
+        if truncated or duplicates:
+            dropped.append({'kind': section.get('kind'), 'title': title,
+                            'reason': 'budget' if truncated else 'duplicate',
+                            'partial': bool(kept), 'duplicatePassages': duplicates})
+
+    text = '\n\n'.join(s['header'] + s['text'] for s in packed)
+    if dropped:
+        print(f"[CONTEXT] Packed {len(packed)}/{len(sections)} sections into {budget - remaining}/{budget} tokens; "
+              f"dropped or trimmed: {', '.join(str(d['title'] or d['kind']) for d in dropped)}")
+    return {'text': text, 'tokens': budget - remaining, 'budget': budget, 'sections': packed, 'dropped': dropped}
+
 
+def packed_text(packed, kind):
+    """The packed sections of one kind, rendered like pack_context's text."""
+    return '\n\n'.join(s['header'] + s['text'] for s in packed['sections'] if s.get('kind') == kind)
 
-def generate_grounded_research(prompt, system_prompt=""):
-    """Placeholder - AI research functionality disabled in this build."""
-    return {
-        'text': 'AI Research functionality is not available in this build.',
-        'sources': []
-    }
+
+def fit_to_budget(text, model_name=None, budget=None):
+    """A single block of text trimmed to the model's context budget."""
+    return pack_context([{'kind': 'transcript', 'text': text}], model_name, budget)['text']
 
 
 # ============== Source Document Functions ==============
@@ -1068,10 +3560,18 @@ def health():
 
 # ============== Project Routes ==============
 
+def project_is_deleting(project):
+    """True while a cascade delete is running. Projects whose delete failed stay listed so it can be retried."""
+    return bool(project) and (project.get('deletion') or {}).get('status') == 'running'
+
+
 @app.route("/api/projects", methods=["GET"])
 def get_projects():
-    """Get all projects."""
-    projects = get_all_docs('projects')
+    """Get all projects (except those being deleted)."""
+    paged = paged_list_response('projects', exclude=project_is_deleting)
+    if paged:
+        return paged
+    projects = [p for p in get_all_docs('projects') if not project_is_deleting(p)]
     return jsonify(projects)
 
 
@@ -1087,6 +3587,8 @@ def create_project():
 def get_project(project_id):
     """Get a single project."""
     project = get_doc('projects', project_id)
+    if project_is_deleting(project):
+        return jsonify({"error": "Project is being deleted"}), 410
     if project:
         return jsonify(project)
     return jsonify({"error": "Project not found"}), 404
@@ -1096,31 +3598,53 @@ def get_project(project_id):
 def update_project(project_id):
     """Update a project."""
     data = request.get_json()
+    if project_is_deleting(get_doc('projects', project_id)):
+        return jsonify({"error": "Project is being deleted"}), 410
     project = update_doc('projects', project_id, data)
     return jsonify(project)
 
 
 @app.route("/api/projects/<project_id>", methods=["DELETE"])
 def delete_project(project_id):
-    """Delete a project and all related data."""
-    # Delete all related data first
-    for collection in ['episodes', 'series', 'research', 'interviews', 'shots', 'assets', 'scripts']:
-        docs = db.collection(COLLECTIONS[collection]).where('projectId', '==', project_id).stream()
-        for doc in docs:
-            doc.reference.delete()
+    """Start a background cascade delete of a project and everything it owns."""
+    if not get_doc('projects', project_id):
+        return jsonify({"error": "Project not found"}), 404
+    job = start_project_delete(project_id)
+    return jsonify({"success": True, "job": job}), 202
 
-    # Delete the project itself
-    delete_doc('projects', project_id)
-    return jsonify({"success": True})
+
+@app.route("/api/projects/<project_id>/deletion", methods=["GET"])
+def get_project_deletion(project_id):
+    """Progress of a project's cascade delete job."""
+    job = _project_delete_jobs.get(project_id)
+    if job:
+        return jsonify(job)
+    project = get_doc('projects', project_id)
+    if project and project.get('deletion'):
+        return jsonify({'projectId': project_id, **project['deletion']})
+    return jsonify({"error": "No deletion job for this project"}), 404
 
 
 # ============== Episode Routes ==============
 
+def episode_sort_key(episode):
+    """List position of an episode: `order`, falling back to `episodeNumber`."""
+    value = episode.get('order')
+    if value is None:
+        value = episode.get('episodeNumber')
+    return value if isinstance(value, (int, float)) else 0
+
+
 @app.route("/api/projects/<project_id>/episodes", methods=["GET"])
 def get_episodes(project_id):
     """Get all episodes for a project."""
-    episodes = get_all_docs('episodes', project_id)
-    episodes.sort(key=lambda e: e.get('order', e.get('episodeNumber', 0)))
+    fields = list_projection('episodes', 'order', 'episodeNumber')
+    episodes = get_all_docs('episodes', project_id, fields=fields)
+    # Paged in memory: many episodes have no `order`, so Firestore can't order them the same way
+    paged = paged_sorted_response(episodes, episode_sort_key)
+    if paged:
+        return paged
+    episodes.sort(key=lambda e: (episode_sort_key(e), e['id']))
     return jsonify(episodes)
 
 
@@ -1128,7 +3652,7 @@ def get_episodes(project_id):
 def create_episode():
     """Create a new episode."""
     data = request.get_json()
-    episode = create_doc('episodes', data)
+    episode = create_episode_doc(data)
     return jsonify(episode), 201
 
 
@@ -1136,14 +3660,19 @@ def create_episode():
 def update_episode(episode_id):
     """Update an episode."""
     data = request.get_json()
-    episode = update_doc('episodes', episode_id, data)
+    try:
+        episode = update_episode_doc(episode_id, lambda current: data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if episode is None:
+        return jsonify({"error": "Episode not found"}), 404
     return jsonify(episode)
 
 
 @app.route("/api/episodes/<episode_id>", methods=["DELETE"])
 def delete_episode(episode_id):
     """Delete an episode."""
-    delete_doc('episodes', episode_id)
+    delete_episode_doc(episode_id)
     return jsonify({"success": True})
 
 
@@ -1152,6 +3681,9 @@ def delete_episode(episode_id):
 @app.route("/api/projects/<project_id>/series", methods=["GET"])
 def get_series(project_id):
     """Get all series for a project."""
+    paged = paged_list_response('series', project_id)
+    if paged:
+        return paged
     series = get_all_docs('series', project_id)
     # Sort by order field
     series.sort(key=lambda s: s.get('order', 0))
@@ -1163,6 +3695,7 @@ def create_series():
     """Create a new series."""
     data = request.get_json()
     series = create_doc('series', data)
+    update_series_stats(series.get('projectId'), series['id'], series.get('title'))
     return jsonify(series), 201
 
 
@@ -1171,6 +3704,8 @@ def update_series(series_id):
     """Update a series."""
     data = request.get_json()
     series = update_doc('series', series_id, data)
+    if series and 'title' in data:
+        update_series_stats(series.get('projectId'), series_id, series.get('title'))
     return jsonify(series)
 
 
@@ -1181,8 +3716,12 @@ def delete_series(series_id):
     episodes = db.collection(COLLECTIONS['episodes']).where('seriesId', '==', series_id).stream()
     for ep in episodes:
         ep.reference.update({'seriesId': None, 'updatedAt': datetime.utcnow().isoformat()})
+        doc_cache.invalidate('episodes', ep.id)
 
+    series = get_doc('series', series_id)
     delete_doc('series', series_id)
+    if series:
+        update_series_stats(series.get('projectId'), series_id, remove=True)
     return jsonify({"success": True})
 
 
@@ -1191,7 +3730,11 @@ def delete_series(series_id):
 @app.route("/api/projects/<project_id>/research", methods=["GET"])
 def get_research(project_id):
     """Get all research for a project."""
-    research = get_all_docs('research', project_id)
+    fields = list_projection('research')
+    paged = paged_list_response('research', project_id, fields=fields)
+    if paged:
+        return paged
+    research = get_all_docs('research', project_id, fields=fields)
     return jsonify(research)
 
 
@@ -1260,6 +3803,9 @@ def delete_research(research_id):
 @app.route("/api/projects/<project_id>/interviews", methods=["GET"])
 def get_interviews(project_id):
     """Get all interviews for a project."""
+    paged = paged_list_response('interviews', project_id)
+    if paged:
+        return paged
     interviews = get_all_docs('interviews', project_id)
     return jsonify(interviews)
 
@@ -1292,6 +3838,9 @@ def delete_interview(interview_id):
 @app.route("/api/projects/<project_id>/shots", methods=["GET"])
 def get_shots(project_id):
     """Get all shots for a project."""
+    paged = paged_list_response('shots', project_id)
+    if paged:
+        return paged
     shots = get_all_docs('shots', project_id)
     return jsonify(shots)
 
@@ -1340,6 +3889,9 @@ def delete_shot(shot_id):
 @app.route("/api/projects/<project_id>/assets", methods=["GET"])
 def get_assets(project_id):
     """Get all assets for a project."""
+    paged = paged_list_response('assets', project_id)
+    if paged:
+        return paged
     assets = get_all_docs('assets', project_id)
     return jsonify(assets)
 
@@ -1371,6 +3923,7 @@ def delete_asset(asset_id):
             blob = bucket.blob(asset['gcsPath'])
             if blob.exists():
                 blob.delete()
+            delete_extracted_text(bucket, asset['gcsPath'])
         except Exception as e:
             print(f"Error deleting GCS file: {e}")
 
@@ -1426,6 +3979,15 @@ def upload_asset_file():
 
         print(f"Uploaded asset file: {blob_path} ({file_size} bytes)")
 
+        # Extract research document text once now instead of on every AI request
+        extracted = None
+        if is_research_document:
+            try:
+                extracted = load_document_text(blob_path, content_type, content=file_content,
+                                               generation=blob.generation)
+            except Exception as e:
+                print(f"[EXTRACT] Deferring text extraction for {blob_path}: {e}")
+
         # Create or update asset document
         asset_data = {
             "projectId": project_id,
@@ -1441,6 +4003,9 @@ def upload_asset_file():
             "isResearchDocument": is_research_document,
             "updatedAt": datetime.utcnow().isoformat()
         }
+        if extracted:
+            asset_data["pageCount"] = extracted["pageCount"]
+            asset_data["contentSha256"] = extracted["sha256"]
 
         # Add optional entity associations for research documents
         if episode_id:
@@ -1457,6 +4022,7 @@ def upload_asset_file():
                     old_blob = bucket.blob(existing['gcsPath'])
                     if old_blob.exists():
                         old_blob.delete()
+                    delete_extracted_text(bucket, existing['gcsPath'])
                 except:
                     pass
 
@@ -1709,6 +4275,7 @@ def complete_asset_chunked_upload(upload_id):
                     old_blob = bucket.blob(existing['gcsPath'])
                     if old_blob.exists():
                         old_blob.delete()
+                    delete_extracted_text(bucket, existing['gcsPath'])
                 except:
                     pass
             asset = update_doc('assets', asset_id, asset_data)
@@ -1844,6 +4411,7 @@ def clear_source_documents(project_id):
 
             # Delete Firestore document
             doc.reference.delete()
+            doc_cache.invalidate('assets', doc.id)
             deleted_count += 1
 
         return jsonify({"success": True, "deleted": deleted_count})
@@ -1926,7 +4494,11 @@ def download_all_source_documents(project_id):
 @app.route("/api/projects/<project_id>/scripts", methods=["GET"])
 def get_scripts(project_id):
     """Get all scripts for a project."""
-    scripts = get_all_docs('scripts', project_id)
+    fields = list_projection('scripts')
+    paged = paged_list_response('scripts', project_id, fields=fields)
+    if paged:
+        return paged
+    scripts = get_all_docs('scripts', project_id, fields=fields)
     return jsonify(scripts)
 
 
@@ -2193,7 +4765,10 @@ def submit_feedback():
 
 @app.route("/api/feedback", methods=["GET"])
 def get_all_feedback():
-    """Get all feedback (admin view)."""
+    """Get all feedback (admin view). Pass ?limit=/&pageToken= to page past the first 100."""
+    paged = paged_list_response('feedback', descending=True)
+    if paged:
+        return paged
     docs = db.collection(COLLECTIONS['feedback']).order_by(
         'createdAt', direction=firestore.Query.DESCENDING
     ).limit(100).stream()
@@ -2222,6 +4797,7 @@ def update_feedback_status(feedback_id):
 
         doc_ref = db.collection(COLLECTIONS['feedback']).document(feedback_id)
         doc_ref.update(update_data)
+        doc_cache.invalidate('feedback', feedback_id)
         return jsonify({"success": True})
     except Exception as e:
         print(f"[ERROR] Failed to update feedback: {e}")
@@ -2357,28 +4933,154 @@ Target Duration: {duration}
 
 Generate a comprehensive production script with scene breakdowns, shot lists, narration, and interview guides."""
 
+    def save_script(result):
+        if not project_id:
+            return {"saved": False}
+        saved_script = create_doc('scripts', {
+            'projectId': project_id,
+            'episodeId': episode_id,
+            'title': f"Script: {episode_title}",
+            'content': result,
+            'format': 'quickture',
+            'duration': duration,
+            'status': 'Draft'
+        })
+        return {"saved": True, "scriptId": saved_script['id']}
+
+    if wants_stream():
+        return sse_response(stream_ai_response(prompt, system_prompt), on_complete=save_script)
+
     result = generate_ai_response(prompt, system_prompt)
+    return jsonify({"script": result, **save_script(result)})
 
-    # Save the script
-    script_data = {
-        'projectId': project_id,
-        'episodeId': episode_id,
-        'title': f"Script: {episode_title}",
-        'content': result,
-        'format': 'quickture',
-        'duration': duration,
-        'status': 'Draft'
+
+# ============== Extracted Text Cache ==============
+
+# Text pulled out of research documents is stored next to the source blob as a
+# gzip'd JSON sidecar, stamped with the source generation it was extracted from,
+# so each upload is downloaded and parsed once rather than on every AI request.
+EXTRACTED_TEXT_SUFFIX = '.extracted.json.gz'
+EXTRACTED_TEXT_CACHE_SIZE = int(os.environ.get('EXTRACTED_TEXT_CACHE_SIZE', '64'))
+_extracted_text_cache = OrderedDict()
+_extracted_text_lock = threading.Lock()
+
+
+def extracted_text_path(gcs_path):
+    """Sidecar blob path for a document's extracted text."""
+    return f"{gcs_path}{EXTRACTED_TEXT_SUFFIX}"
+
+
+def is_text_extractable(gcs_path, mime_type=''):
+    """Whether text can be extracted from this document type."""
+    return (mime_type.startswith('text/') or gcs_path.endswith(('.txt', '.md', '.csv'))
+            or gcs_path.endswith('.pdf'))
+
+
+def extract_document_text(content, gcs_path, mime_type=''):
+    """Extract text from raw document bytes. Returns (text, page_count)."""
+    if mime_type.startswith('text/') or gcs_path.endswith(('.txt', '.md', '.csv')):
+        return content.decode('utf-8', errors='ignore'), 1
+
+    if gcs_path.endswith('.pdf'):
+        import io
+        from PyPDF2 import PdfReader
+        reader = PdfReader(io.BytesIO(content))
+        pages_text = []
+        for page in reader.pages:
+            text = page.extract_text()
+            if text:
+                pages_text.append(text)
+        return "\n\n".join(pages_text), len(reader.pages)
+
+    return None, 0
+
+
+def _remember_extracted_text(key, extracted):
+    with _extracted_text_lock:
+        _extracted_text_cache[key] = extracted
+        _extracted_text_cache.move_to_end(key)
+        while len(_extracted_text_cache) > EXTRACTED_TEXT_CACHE_SIZE:
+            _extracted_text_cache.popitem(last=False)
+    return extracted
+
+
+def _read_extracted_sidecar(bucket, gcs_path, generation):
+    """Load the sidecar if it was extracted from this generation of the source, else None."""
+    sidecar = bucket.get_blob(extracted_text_path(gcs_path))
+    if sidecar is None or (sidecar.metadata or {}).get('sourceGeneration') != str(generation):
+        return None
+    try:
+        return json.loads(gzip.decompress(sidecar.download_as_bytes()))
+    except Exception as e:
+        print(f"[EXTRACT] Ignoring unreadable sidecar for {gcs_path}: {e}")
+        return None
+
+
+def _write_extracted_sidecar(bucket, gcs_path, extracted):
+    sidecar = bucket.blob(extracted_text_path(gcs_path))
+    sidecar.metadata = {'sourceGeneration': extracted['generation'], 'sha256': extracted['sha256']}
+    sidecar.upload_from_string(gzip.compress(json.dumps(extracted).encode('utf-8')),
+                               content_type='application/gzip')
+
+
+def load_document_text(gcs_path, mime_type='', content=None, generation=None):
+    """Return {text, pageCount, sha256, generation} for a GCS document, extracting once per blob generation.
+
+    Pass content/generation when the caller already holds the bytes (e.g. right after upload).
+    Returns None for missing blobs and unsupported document types.
+    """
+    if not gcs_path or not is_text_extractable(gcs_path, mime_type):
+        return None
+
+    bucket = storage_client.bucket(STORAGE_BUCKET)
+    if generation is None:
+        source = bucket.get_blob(gcs_path)
+        if source is None:
+            return None
+        generation = source.generation
+    key = (gcs_path, str(generation))
+
+    with _extracted_text_lock:
+        if key in _extracted_text_cache:
+            _extracted_text_cache.move_to_end(key)
+            return _extracted_text_cache[key]
+
+    if content is None:
+        extracted = _read_extracted_sidecar(bucket, gcs_path, generation)
+        if extracted is not None:
+            return _remember_extracted_text(key, extracted)
+        content = bucket.blob(gcs_path, generation=generation).download_as_bytes()
+
+    try:
+        text, page_count = extract_document_text(content, gcs_path, mime_type)
+    except Exception as e:
+        # Cache the failure too so a corrupt PDF isn't re-parsed on every request.
+        print(f"[ERROR] Text extraction failed for {gcs_path}: {e}")
+        text, page_count = None, 0
+
+    extracted = {
+        "text": text,
+        "pageCount": page_count,
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "generation": str(generation),
+        "extractedAt": datetime.utcnow().isoformat(),
     }
+    try:
+        _write_extracted_sidecar(bucket, gcs_path, extracted)
+    except Exception as e:
+        print(f"[EXTRACT] Could not store extracted text for {gcs_path}: {e}")
+    print(f"[EXTRACT] Extracted {len(text or '')} chars ({page_count} pages) from {gcs_path}")
+    return _remember_extracted_text(key, extracted)
 
-    if project_id:
-        saved_script = create_doc('scripts', script_data)
-        return jsonify({
-            "script": result,
-            "saved": True,
-            "scriptId": saved_script['id']
-        })
 
-    return jsonify({"script": result, "saved": False})
+def delete_extracted_text(bucket, gcs_path):
+    """Remove a document's extracted-text sidecar, if any."""
+    try:
+        bucket.blob(extracted_text_path(gcs_path)).delete()
+    except gcp_exceptions.NotFound:
+        pass
+    except Exception as e:
+        print(f"[EXTRACT] Could not delete sidecar for {gcs_path}: {e}")
 
 
 # ============== AI Routes ==============
@@ -2432,37 +5134,13 @@ def get_research_document_contents(episode_id=None, series_id=None, project_id=N
 
 
 def read_document_content(gcs_path, mime_type=''):
-    """Read content from a document in GCS."""
+    """Read the full text of a document in GCS (callers fit it to their prompt with pack_context)."""
     if not gcs_path:
         return None
 
     try:
-        bucket = storage_client.bucket(STORAGE_BUCKET)
-        blob = bucket.blob(gcs_path)
-        content = blob.download_as_bytes()
-
-        # For text-based files, decode to string
-        if mime_type.startswith('text/') or gcs_path.endswith(('.txt', '.md', '.csv')):
-            return content.decode('utf-8', errors='ignore')[:10000]  # Limit to 10k chars
-
-        # Extract text from PDF documents
-        if gcs_path.endswith('.pdf'):
-            try:
-                import io
-                from PyPDF2 import PdfReader
-                reader = PdfReader(io.BytesIO(content))
-                pages_text = []
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        pages_text.append(text)
-                extracted = "\n\n".join(pages_text)
-                return extracted[:10000] if extracted else None  # Limit to 10k chars
-            except Exception as pdf_err:
-                print(f"[ERROR] PDF extraction failed for {gcs_path}: {pdf_err}")
-                return None
-
-        return None
+        extracted = load_document_text(gcs_path, mime_type)
+        return (extracted or {}).get('text') or None
     except Exception as e:
         print(f"[ERROR] Error reading document {gcs_path}: {e}")
         return None
@@ -2494,9 +5172,10 @@ def ai_simple_research():
     # Build context from research documents
     context_section = ""
     if research_docs:
+        packed = pack_context([{'kind': 'research', 'title': doc['source'], 'text': doc['content']}
+                               for doc in research_docs])
         context_section = "\n\n## Reference Documents\n\nThe following research documents have been uploaded and should be used as context:\n\n"
-        for doc in research_docs:
-            context_section += f"### {doc['source']}\n{doc['content']}\n\n"
+        context_section += packed['text'] + "\n\n"
 
     # Use user's query if provided, otherwise fall back to title/description
     research_query = user_query if user_query else f"Research background information for the documentary episode titled '{title}': {description}"
@@ -2529,38 +5208,43 @@ Format your response with:
 
     system_prompt = """You are a documentary research assistant. Provide comprehensive background research with real source links. Always format URLs as markdown links that can be clicked. Focus on factual, verifiable information from credible sources. When reference documents are provided, incorporate their information and expand upon it."""
 
-    raw_result = generate_ai_response(prompt, system_prompt)
-    result = clean_ai_response(raw_result)
+    def save_research_result(raw_result):
+        result = clean_ai_response(raw_result)
+        print(f"[DEBUG] AI response length: {len(result)} chars")
 
-    print(f"[DEBUG] AI response length: {len(result)} chars")
+        response_data = {
+            "result": result,
+            "title": title,
+            "query": research_query,
+            "saved": False,
+            "documentsUsed": len(research_docs)
+        }
 
-    response_data = {
-        "result": result,
-        "title": title,
-        "query": research_query,
-        "saved": False,
-        "documentsUsed": len(research_docs)
-    }
+        # Save research to episode if episodeId provided
+        if save_research and episode_id and project_id:
+            try:
+                print(f"[DEBUG] Saving research to episode {episode_id}")
+                # Update the episode with the research content
+                episode_ref = db.collection(COLLECTIONS['episodes']).document(episode_id)
+                episode_ref.update({
+                    'research': result,
+                    'researchGeneratedAt': datetime.utcnow().isoformat(),
+                    'updatedAt': datetime.utcnow().isoformat()
+                })
+                doc_cache.invalidate('episodes', episode_id)
+                response_data['saved'] = True
+                response_data['episodeId'] = episode_id
+                print(f"[DEBUG] Research saved successfully to episode {episode_id}")
+            except Exception as e:
+                print(f"[ERROR] Failed to save research: {e}")
+                response_data['saveError'] = str(e)
+        return response_data
 
-    # Save research to episode if episodeId provided
-    if save_research and episode_id and project_id:
-        try:
-            print(f"[DEBUG] Saving research to episode {episode_id}")
-            # Update the episode with the research content
-            episode_ref = db.collection(COLLECTIONS['episodes']).document(episode_id)
-            episode_ref.update({
-                'research': result,
-                'researchGeneratedAt': datetime.utcnow().isoformat(),
-                'updatedAt': datetime.utcnow().isoformat()
-            })
-            response_data['saved'] = True
-            response_data['episodeId'] = episode_id
-            print(f"[DEBUG] Research saved successfully to episode {episode_id}")
-        except Exception as e:
-            print(f"[ERROR] Failed to save research: {e}")
-            response_data['saveError'] = str(e)
+    if wants_stream():
+        # `done` carries the cleaned result, which replaces the streamed text
+        return sse_response(stream_ai_response(prompt, system_prompt), on_complete=save_research_result)
 
-    return jsonify(response_data)
+    return jsonify(save_research_result(generate_ai_response(prompt, system_prompt)))
 
 
 @app.route("/api/episodes/<episode_id>/research", methods=["GET"])
@@ -2600,6 +5284,7 @@ def delete_episode_research(episode_id):
             'researchGeneratedAt': '',
             'updatedAt': datetime.utcnow().isoformat()
         })
+        doc_cache.invalidate('episodes', episode_id)
         print(f"[DEBUG] Research deleted for episode {episode_id}")
         return jsonify({"success": True})
     except Exception as e:
@@ -2634,6 +5319,7 @@ def save_episode_research(episode_id):
             'researchGeneratedAt': datetime.utcnow().isoformat(),
             'updatedAt': datetime.utcnow().isoformat()
         })
+        doc_cache.invalidate('episodes', episode_id)
         print(f"[DEBUG] Research saved for episode {episode_id}, length: {len(research)}")
 
         # Extract markdown links and create assets as reference links
@@ -3038,7 +5724,7 @@ Return ONLY the JSON object as specified."""
 
             # Use multimodal model with video
             video_part = Part.from_uri(video_uri, mime_type=mime_type)
-            response = model.generate_content([system_prompt, video_part, prompt])
+            response = coalesced_generate_content([system_prompt, video_part, prompt])
             result = response.text
 
             # Delete the temporary video file after analysis (only if we uploaded it)
@@ -3069,7 +5755,7 @@ Based on the content, create:
 
 Return ONLY the JSON object as specified."""
 
-                response = model.generate_content([system_prompt, doc_part, prompt])
+                response = coalesced_generate_content([system_prompt, doc_part, prompt])
                 result = response.text
             else:
                 # For text files, decode and send as text
@@ -3081,7 +5767,7 @@ Return ONLY the JSON object as specified."""
                 prompt = f"""Analyze this document and create a comprehensive documentary project blueprint.
 
 DOCUMENT CONTENT:
-{text_content[:50000]}
+{fit_to_budget(text_content)}
 
 Based on the content, create:
 1. A compelling project title
@@ -3352,13 +6038,16 @@ def init_sample_data():
     if existing:
         return jsonify({"message": "Data already exists", "projectId": existing[0].id})
 
+    # Everything is queued and committed as one batch
+    bulk = BulkWrite()
+
     # Create sample project
     project_data = {
         'title': 'Apollo 11: Journey to the Moon',
         'description': 'A comprehensive documentary series exploring the historic first moon landing',
         'status': 'In Production'
     }
-    project = create_doc('projects', project_data)
+    project = bulk.create('projects', project_data)
     project_id = project['id']
 
     # Create sample episodes
@@ -3369,7 +6058,7 @@ def init_sample_data():
         {'projectId': project_id, 'title': 'Episode 4: One Small Step', 'description': 'The lunar landing and moonwalk', 'status': 'Planning', 'duration': '45 min'}
     ]
     for ep in episodes:
-        create_doc('episodes', ep)
+        bulk.create('episodes', ep)
 
     # Create sample research
     research_items = [
@@ -3377,7 +6066,7 @@ def init_sample_data():
         {'projectId': project_id, 'title': 'Cold War Context Research', 'content': 'Key sources: "The Right Stuff" by Tom Wolfe, Smithsonian Air & Space Museum archives, Kennedy Space Center historical records.', 'category': 'Background'}
     ]
     for r in research_items:
-        create_doc('research', r)
+        bulk.create('research', r)
 
     # Create sample interviews
     interviews = [
@@ -3385,7 +6074,7 @@ def init_sample_data():
         {'projectId': project_id, 'subject': 'Gene Kranz', 'role': 'Flight Director', 'status': 'Requested', 'questions': 'Describe mission control during landing.\nWhat was the most critical moment?\nHow did the team prepare?', 'notes': 'Contact through NASA public affairs'}
     ]
     for i in interviews:
-        create_doc('interviews', i)
+        bulk.create('interviews', i)
 
     # Create sample shots
     shots = [
@@ -3393,7 +6082,7 @@ def init_sample_data():
         {'projectId': project_id, 'description': 'Saturn V rocket at Space Center Houston', 'location': 'Houston, TX', 'equipment': 'Gimbal, 4K camera', 'status': 'Pending'}
     ]
     for s in shots:
-        create_doc('shots', s)
+        bulk.create('shots', s)
 
     # Create sample assets
     assets = [
@@ -3402,7 +6091,7 @@ def init_sample_data():
         {'projectId': project_id, 'title': 'Lunar Surface Photos', 'type': 'Image', 'source': 'NASA/Hasselblad', 'status': 'Acquired', 'notes': 'High-res scans of original photos'}
     ]
     for a in assets:
-        create_doc('assets', a)
+        bulk.create('assets', a)
 
     # Create sample script
     script = {
@@ -3423,7 +6112,8 @@ ACT 3: APOLLO 11 CREW
 - Training montage
 - Mission objectives'''
     }
-    create_doc('scripts', script)
+    bulk.create('scripts', script)
+    bulk.commit()
 
     return jsonify({"message": "Sample data created", "projectId": project_id})
 
@@ -3441,22 +6131,22 @@ def get_project_dashboard(project_id):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/projects/<project_id>/dashboard/rebuild", methods=["POST"])
+def rebuild_project_dashboard(project_id):
+    """Recompute the materialized dashboard counters from scratch."""
+    try:
+        rebuild_project_stats(project_id)
+        return jsonify(get_project_dashboard_stats(project_id))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/api/projects/<project_id>/workflow-overview", methods=["GET"])
 def get_project_workflow_overview(project_id):
     """Get workflow overview for all episodes in a project."""
     try:
         episodes = get_all_docs('episodes', project_id)
-        overview = []
-        for episode in episodes:
-            workflow_status = get_episode_workflow_status(episode['id'])
-            if workflow_status:
-                overview.append({
-                    'episodeId': episode['id'],
-                    'episodeTitle': episode.get('title', 'Untitled'),
-                    'seriesId': episode.get('seriesId'),
-                    **workflow_status
-                })
-        return jsonify(overview)
+        return jsonify(aggregate_project_workflow(episodes)['overview'])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -3517,7 +6207,8 @@ def create_episode_factory():
 def get_episode_research_bucket(episode_id):
     """Get all research documents from the research bucket for an episode."""
     try:
-        docs = get_docs_by_episode('research_documents', episode_id)
+        docs = get_docs_by_episode('research_documents', episode_id,
+                                   fields=list_projection('research_documents'))
         return jsonify(docs)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -3884,7 +6575,8 @@ def delete_transcript(transcript_id):
 def get_episode_script_versions(episode_id):
     """Get all script versions for an episode."""
     try:
-        versions = get_docs_by_episode('script_versions', episode_id)
+        versions = get_docs_by_episode('script_versions', episode_id,
+                                       fields=list_projection('script_versions', 'versionNumber'))
         # Sort by version number
         versions.sort(key=lambda x: x.get('versionNumber', 0))
         return jsonify(versions)
@@ -3922,7 +6614,7 @@ def create_script_version():
                 'versionType': data['versionType'],
                 'createdAt': version['createdAt']
             })
-            update_doc('episodes', data['episodeId'], {'scriptWorkspace': script_workspace})
+            update_doc('episodes', data['episodeId'], {'scriptWorkspace': script_workspace}, return_doc=False)
 
         return jsonify(version), 201
     except Exception as e:
@@ -4087,104 +6779,107 @@ def update_agent_task_route(task_id):
 
 
 # --- AI Agent Swarm for Script Generation ---
-@app.route("/api/ai/script-swarm", methods=["POST"])
-def ai_script_swarm():
-    """Execute script generation using multi-agent swarm architecture."""
-    try:
-        data = request.get_json()
-        episode_id = data.get('episodeId')
-        segment_number = data.get('segmentNumber')  # Optional: generate specific segment only
+# The swarm runs as a background job. The job is itself an agent_tasks doc
+# (taskType 'script_swarm') that links the five agent tasks it spawns; each
+# agent's output is checkpointed on its own task, so a job interrupted by a
+# crash or redeploy resumes from the last completed agent.
+SWARM_SPECIALISTS = ('research_specialist', 'archive_specialist', 'interview_producer')
+SWARM_STAGES = SWARM_SPECIALISTS + ('script_writer', 'fact_checker')
+SWARM_MAX_JOBS = int(os.environ.get('SWARM_MAX_JOBS', '2'))
+SWARM_HEARTBEAT_SECONDS = float(os.environ.get('SWARM_HEARTBEAT_SECONDS', '60'))
+SWARM_JOB_STALE_SECONDS = float(os.environ.get('SWARM_JOB_STALE_SECONDS', '300'))
+SWARM_RESUME_ON_STARTUP = os.environ.get('SWARM_RESUME_ON_STARTUP', '0' if APP_ENV == 'test' else '1') == '1'
+SWARM_INSTANCE_ID = os.environ.get('K_REVISION', 'local') + ':' + uuid.uuid4().hex[:8]
+_swarm_job_executor = ThreadPoolExecutor(max_workers=SWARM_MAX_JOBS, thread_name_prefix='swarm-job')
+SWARM_EVENTS_POLL_SECONDS = 2.0
+SWARM_EVENTS_MAX_SECONDS = float(os.environ.get('SWARM_EVENTS_MAX_SECONDS', '900'))  # per events connection
+# Jobs running in this process: {job_id: {'stage', 'status', 'chunks'}} — the
+# script writer's text lands in `chunks` as it streams, for the events endpoint.
+_swarm_live = {}
+
+SWARM_SPECIALIST_PROMPTS = {
+    'research_specialist': ('analyze_research', 'researchContext', """Analyze the following research and provide:
+1. A verified timeline of key events
+2. Technical concepts that need explanation
+3. Claims that require interview corroboration
+4. Suggested 5-7 segment narrative structure
 
-        if not episode_id:
-            return jsonify({"error": "episodeId is required"}), 400
+Research Documents:
+{context}""", 'No research available'),
+    'archive_specialist': ('match_archive', 'archiveContext', """Review the available archive footage and provide:
+1. Key visual sequences that support the story
+2. Footage gaps that need B-roll or Gen AI visuals
+3. Suggested archive clips for each story beat
+4. Pacing recommendations based on available material
 
-        # Get episode data
-        episode = get_doc('episodes', episode_id)
-        if not episode:
-            return jsonify({"error": "Episode not found"}), 404
+Archive Log:
+{context}""", 'No archive available'),
+    'interview_producer': ('extract_soundbites', 'interviewContext', """Analyze the interview transcripts and provide:
+1. Top 10 soundbites ranked by emotional impact
+2. Soundbites matched to potential story segments
+3. Gaps where additional interviews are needed
+4. Suggestions for follow-up questions
 
-        # Get research documents
-        research_docs = get_docs_by_episode('research_documents', episode_id)
+Interview Transcripts:
+{context}""", 'No interviews available'),
+}
 
-        # Get archive logs
-        archive_logs = get_docs_by_episode('archive_logs', episode_id)
 
-        # Get interview transcripts
-        transcripts = get_docs_by_episode('interview_transcripts', episode_id)
+def _swarm_context(episode):
+    """Gather everything the swarm agents need for an episode."""
+    episode_id = episode['id']
+    research_docs = get_docs_by_episode('research_documents', episode_id)
+    archive_logs = get_docs_by_episode('archive_logs', episode_id)
+    transcripts = get_docs_by_episode('interview_transcripts', episode_id)
 
-        # Get series bible if available
-        series_id = episode.get('seriesId')
-        series = get_doc('series', series_id) if series_id else None
-
-        # Load universal config (Thomas's craft rules)
-        universal_doc = db.collection(COLLECTIONS['universal_config']).document('global').get()
-        universal_rules = universal_doc.to_dict().get('rules', DEFAULT_UNIVERSAL_RULES) if universal_doc.exists else DEFAULT_UNIVERSAL_RULES
-
-        # Load series config for format-aware script generation
-        series_config_doc = db.collection(COLLECTIONS['series_config']).document(series_id).get() if series_id else None
-        series_config = series_config_doc.to_dict() if series_config_doc and series_config_doc.exists else {}
-        script_format = series_config.get('workflow', {}).get('scriptFormat', '2-column')
-        script_columns = series_config.get('workflow', {}).get('scriptColumns', ['visuals', 'script'])
-        fact_check_mode = series_config.get('workflow', {}).get('factCheckMode', 'at_generation')
-        commentary_format = series_config.get('scriptStyle', {}).get('commentaryFormat', 'CAPS')
-
-        # Build context for agents
-        research_context = "\n\n".join([
-            f"**{doc.get('title', 'Untitled')}**\n{doc.get('content', '')}"
-            for doc in research_docs
-        ])
+    # Get series bible if available
+    series_id = episode.get('seriesId')
+    series = get_doc('series', series_id) if series_id else None
 
-        archive_context = "\n".join([
-            f"- {clip.get('description', '')} [{clip.get('filename', '')}] TC: {clip.get('timecodeIn', '')}-{clip.get('timecodeOut', '')}"
+    # Context sections for pack_context, one list per specialist
+    contexts = {
+        'research_specialist': [
+            {'kind': 'research', 'title': doc.get('title', 'Untitled'), 'text': doc.get('content', ''),
+             'date': doc.get('updatedAt') or doc.get('createdAt')}
+            for doc in research_docs
+        ],
+        'archive_specialist': [
+            {'kind': 'archive', 'date': log.get('updatedAt') or log.get('createdAt'), 'text': "\n".join(
+                f"- {clip.get('description', '')} [{clip.get('filename', '')}] TC: {clip.get('timecodeIn', '')}-{clip.get('timecodeOut', '')}"
+                for clip in log.get('clips', []))}
             for log in archive_logs
-            for clip in log.get('clips', [])
-        ])
-
-        interview_context = "\n\n".join([
-            f"**{t.get('speakerName', 'Unknown Speaker')}**\n" +
-            "\n".join([f"[{s.get('timecode', '')}] {s.get('text', '')}" for s in t.get('segments', [])])
+        ],
+        'interview_producer': [
+            {'kind': 'transcript', 'title': t.get('speakerName', 'Unknown Speaker'),
+             'date': t.get('updatedAt') or t.get('createdAt'),
+             'text': "\n".join(f"[{s.get('timecode', '')}] {s.get('text', '')}" for s in t.get('segments', []))}
             for t in transcripts
-        ])
-
-        series_bible = series.get('seriesBible', '') if series else ''
-        episode_brief = episode.get('brief', {})
-
-        # Create agent tasks
-        tasks_created = []
-
-        # Agent 1: Research Specialist - Analyze research and suggest structure
-        research_task = create_agent_task(episode_id, 'research_specialist', 'analyze_research', {
-            'episodeBrief': episode_brief,
-            'researchContext': research_context[:10000]  # Limit context size
-        })
-        tasks_created.append(research_task)
-
-        # Agent 2: Archive Specialist - Match archive to story beats
-        archive_task = create_agent_task(episode_id, 'archive_specialist', 'match_archive', {
-            'episodeBrief': episode_brief,
-            'archiveContext': archive_context[:10000]
-        })
-        tasks_created.append(archive_task)
+        ],
+    }
 
-        # Agent 3: Interview Producer - Extract soundbites
-        interview_task = create_agent_task(episode_id, 'interview_producer', 'extract_soundbites', {
-            'episodeBrief': episode_brief,
-            'interviewContext': interview_context[:10000]
-        })
-        tasks_created.append(interview_task)
+    return {
+        # Universal config (Thomas's craft rules) and series format config
+        'universal_rules': config_service.universal_rules(),
+        'script_format': config_service.script_format(series_id)['scriptFormat'],
+        'commentary_format': config_service.commentary_format(series_id),
+        'series_bible': series.get('seriesBible', '') if series else '',
+        'episode_brief': episode.get('brief', {}),
+        'contexts': contexts,
+    }
 
-        # Execute agents (in production, this would be async)
-        # For now, execute synchronously
-        results = {}
 
-        for task in tasks_created:
-            agent_type = task['agentType']
-            agent_info = AGENT_TYPES[agent_type]
-            input_data = task['inputData']
+def _swarm_specialist_prompts(ctx, agent_type):
+    """(task_type, input_data, prompt, system_prompt) for one specialist agent."""
+    agent_info = AGENT_TYPES[agent_type]
+    episode_brief = ctx['episode_brief']
+    series_bible = ctx['series_bible']
+    task_type, input_key, template, empty = SWARM_SPECIALIST_PROMPTS[agent_type]
+    context = pack_context(ctx['contexts'][agent_type], AGENT_MODELS.get(agent_type),
+                           budget=SWARM_CONTEXT_TOKENS)['text']
+    input_data = {'episodeBrief': episode_brief, input_key: context}
 
-            # Build agent-specific prompt
-            system_prompt = f"""=== UNIVERSAL DOCUMENTARY CRAFT RULES (HIGHEST PRIORITY) ===
-{universal_rules}
+    system_prompt = f"""=== UNIVERSAL DOCUMENTARY CRAFT RULES (HIGHEST PRIORITY) ===
+{ctx['universal_rules']}
 
 === AGENT ROLE ===
 You are the {agent_info['name']}, specialized in {agent_info['role']}.
@@ -4199,66 +6894,29 @@ Episode Brief:
 - Story Beats: {', '.join(episode_brief.get('storyBeats', []))}
 - Unique Angle: {episode_brief.get('uniqueAngle', 'Not specified')}"""
 
-            if agent_type == 'research_specialist':
-                prompt = f"""Analyze the following research and provide:
-1. A verified timeline of key events
-2. Technical concepts that need explanation
-3. Claims that require interview corroboration
-4. Suggested 5-7 segment narrative structure
-
-Research Documents:
-{input_data.get('researchContext', 'No research available')}"""
-
-            elif agent_type == 'archive_specialist':
-                prompt = f"""Review the available archive footage and provide:
-1. Key visual sequences that support the story
-2. Footage gaps that need B-roll or Gen AI visuals
-3. Suggested archive clips for each story beat
-4. Pacing recommendations based on available material
-
-Archive Log:
-{input_data.get('archiveContext', 'No archive available')}"""
-
-            elif agent_type == 'interview_producer':
-                prompt = f"""Analyze the interview transcripts and provide:
-1. Top 10 soundbites ranked by emotional impact
-2. Soundbites matched to potential story segments
-3. Gaps where additional interviews are needed
-4. Suggestions for follow-up questions
-
-Interview Transcripts:
-{input_data.get('interviewContext', 'No interviews available')}"""
+    prompt = template.format(context=context or empty)
+    return task_type, input_data, prompt, system_prompt
 
-            # Execute AI call — use the per-agent model config
-            agent_model = AGENT_MODELS.get(agent_type, MODEL_NAME)
-            update_agent_task(task['id'], 'in_progress')
-            try:
-                response = generate_ai_response(prompt, system_prompt, model_name=agent_model)
-                results[agent_type] = response
-                update_agent_task(task['id'], 'completed', {'analysis': response})
-            except Exception as e:
-                update_agent_task(task['id'], 'failed', error=str(e))
-                results[agent_type] = f"Error: {str(e)}"
 
-        # Agent 4: Script Writer - Synthesize all inputs into script
-        # Build format-specific instructions
-        if script_format == '3-column':
-            format_instructions = """Create the script in 3-COLUMN FORMAT:
+def _swarm_writer_prompt(ctx, results):
+    """Script writer prompt synthesizing the specialist outputs."""
+    if ctx['script_format'] == '3-column':
+        format_instructions = """Create the script in 3-COLUMN FORMAT:
 BOX NO | VISUALS | AUDIO
 1      | [Camera direction or archive description] | [NARRATION IN CAPS]
 2      | [Archive clip reference or GEN AI VISUAL] | "[Interview sync in lowercase]"
 Use sequential box numbers for each row."""
-        else:
-            format_instructions = """Create the script in 2-COLUMN FORMAT. For each segment:
+    else:
+        format_instructions = """Create the script in 2-COLUMN FORMAT. For each segment:
 SEGMENT N: [TITLE IN CAPS]
 
 VISUALS: [Camera direction, archive reference, or GEN AI VISUAL description]
 SCRIPT:  [NARRATION IN CAPS if commentary. "Interview sync in lowercase." [SOT: Name - Quote]]"""
 
-        script_writer_prompt = f"""Based on the analysis from the specialist agents, create a documentary script.
+    return f"""Based on the analysis from the specialist agents, create a documentary script.
 
 === UNIVERSAL CRAFT RULES (OBEY THESE ABSOLUTELY) ===
-{universal_rules}
+{ctx['universal_rules']}
 
 RESEARCH SPECIALIST ANALYSIS:
 {results.get('research_specialist', 'Not available')}
@@ -4271,69 +6929,428 @@ INTERVIEW PRODUCER SOUNDBITES:
 
 {format_instructions}
 
-Create 5-7 segments. Commentary format: {commentary_format}. Write in broadcast documentary style. Target 45 minutes total."""
+Create 5-7 segments. Commentary format: {ctx['commentary_format']}. Write in broadcast documentary style. Target 45 minutes total."""
+
+
+def _swarm_fact_check_prompt(script_response):
+    return f"""Review this script and verify all factual claims:
+
+{script_response}
+
+For each major claim, provide:
+1. The claim text
+2. Source verification (from research documents)
+3. Confidence level (verified/probable/requires_confirmation)
+4. Any legal concerns to flag"""
+
+
+def _swarm_job_is_stale(job):
+    heartbeat = job.get('heartbeatAt') or job.get('startedAt') or job.get('createdAt')
+    if not heartbeat:
+        return True
+    try:
+        age = (datetime.utcnow() - datetime.fromisoformat(heartbeat)).total_seconds()
+    except ValueError:
+        return True
+    return age > SWARM_JOB_STALE_SECONDS
+
+
+def claim_swarm_job(job_id):
+    """Atomically take ownership of a swarm job that is new, failed or abandoned.
+
+    Returns the job doc, or None when it's finished or another instance holds it."""
+    job_ref = db.collection(COLLECTIONS['agent_tasks']).document(job_id)
+
+    @firestore.transactional
+    def _claim(transaction):
+        job = doc_to_dict(job_ref.get(transaction=transaction))
+        if not job or job.get('taskType') != 'script_swarm':
+            return None
+        status = job.get('status')
+        if status == 'completed' or (status == 'in_progress' and not _swarm_job_is_stale(job)):
+            return None
+        now = datetime.utcnow().isoformat()
+        updates = {'status': 'in_progress', 'workerId': SWARM_INSTANCE_ID, 'heartbeatAt': now,
+                   'error': None, 'updatedAt': now}
+        if status != 'pending':
+            updates['resumedAt'] = now
+            updates['resumeCount'] = job.get('resumeCount', 0) + 1
+        if not job.get('startedAt'):
+            updates['startedAt'] = now
+        transaction.update(job_ref, updates)
+        return {**job, **updates}
+
+    doc_cache.invalidate('agent_tasks', job_id)
+    return _claim(db.transaction())
+
+
+class SwarmJobLost(RuntimeError):
+    """Another instance has claimed the swarm job since this one did."""
+
+
+def _swarm_owned_write(job_id, updates, creates=()):
+    """Update a swarm job (and create `creates` docs) in one transaction, only while this instance owns it.
+
+    `creates` is a list of (collection_name, doc_id, data). Raises SwarmJobLost
+    when the job's workerId is no longer SWARM_INSTANCE_ID."""
+    job_ref = db.collection(COLLECTIONS['agent_tasks']).document(job_id)
+    now = datetime.utcnow().isoformat()
+    updates = {**updates, 'updatedAt': now}
+
+    @firestore.transactional
+    def _write(transaction):
+        job = doc_to_dict(job_ref.get(transaction=transaction))
+        if not job or job.get('workerId') != SWARM_INSTANCE_ID:
+            raise SwarmJobLost(f"Swarm job {job_id} is now owned by {(job or {}).get('workerId')}")
+        for collection_name, doc_id, data in creates:
+            data = normalize_project_scope({**data, 'createdAt': now, 'updatedAt': now})
+            transaction.create(db.collection(COLLECTIONS[collection_name]).document(doc_id), data)
+        transaction.update(job_ref, updates)
+
+    try:
+        _write(db.transaction())
+    finally:
+        doc_cache.invalidate('agent_tasks', job_id)
+        for collection_name, doc_id, _ in creates:
+            doc_cache.invalidate(collection_name, doc_id)
+
 
-        script_task = create_agent_task(episode_id, 'script_writer', 'generate_script', {
-            'agentInputs': results
+def start_swarm_heartbeat(job_id):
+    """Heartbeat a claimed job until the returned event is set or ownership is lost.
+
+    Started at claim time so a job waiting in the executor queue doesn't look abandoned."""
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(SWARM_HEARTBEAT_SECONDS):
+            try:
+                _swarm_owned_write(job_id, {'heartbeatAt': datetime.utcnow().isoformat()})
+            except SwarmJobLost as e:
+                print(f"[SWARM] Stopping heartbeat: {e}")
+                return
+            except Exception as e:
+                print(f"[SWARM] Heartbeat failed for {job_id}: {e}")
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    return stop
+
+
+@ai_lane('batch')
+def run_script_swarm_job(job, stop_heartbeat=None):
+    """Run (or resume) a claimed swarm job, skipping agents already completed.
+
+    Every checkpoint and the final commit verify this instance still owns the
+    job; if another worker took it over, this run stops without writing."""
+    job_id = job['id']
+    episode_id = job['episodeId']
+    agent_tasks = dict(job.get('agentTasks') or {})
+
+    live = _swarm_live[job_id] = {'stage': job.get('stage'), 'status': 'in_progress', 'chunks': []}
+
+    def checkpoint(stage):
+        live['stage'] = stage
+        _swarm_owned_write(job_id, {
+            'stage': stage,
+            'agentTasks': agent_tasks,
+            'heartbeatAt': datetime.utcnow().isoformat(),
         })
-        update_agent_task(script_task['id'], 'in_progress')
 
+    def completed_output(agent_type, key):
+        task_id = agent_tasks.get(agent_type)
+        task = get_doc('agent_tasks', task_id) if task_id else None
+        if task and task.get('status') == 'completed':
+            return (task.get('outputData') or {}).get(key)
+        return None
+
+    def agent_task(agent_type, task_type, input_data):
+        previous = agent_tasks.get(agent_type)
+        if previous:
+            # Left unfinished by an earlier run
+            update_agent_task(previous, 'failed', error='Superseded by resumed swarm job', return_doc=False)
+        task = create_agent_task(episode_id, agent_type, task_type, {**input_data, 'swarmJobId': job_id})
+        agent_tasks[agent_type] = task['id']
+        return task
+
+    if stop_heartbeat is None:
+        stop_heartbeat = start_swarm_heartbeat(job_id)
+    try:
+        episode = get_doc('episodes', episode_id)
+        if not episode:
+            raise RuntimeError("Episode not found")
+        ctx = _swarm_context(episode)
+        series_bible = ctx['series_bible']
+
+        # Agents 1-3: specialists, concurrently
+        results = {}
+        specialists = []
+        for agent_type in SWARM_SPECIALISTS:
+            done = completed_output(agent_type, 'analysis')
+            if done is not None:
+                results[agent_type] = done
+                continue
+            task_type, input_data, prompt, system_prompt = _swarm_specialist_prompts(ctx, agent_type)
+            task = agent_task(agent_type, task_type, input_data)
+            specialists.append((task, prompt, system_prompt, AGENT_MODELS.get(agent_type, MODEL_NAME)))
+        checkpoint('specialists')
+        if specialists:
+            results.update(run_swarm_specialists(specialists))
+
+        # Agent 4: Script Writer - Synthesize all inputs into script
+        script_response = completed_output('script_writer', 'script')
+        if script_response is None:
+            task = agent_task('script_writer', 'generate_script', {'agentInputs': results})
+            checkpoint('script_writer')
+            update_agent_task(task['id'], 'in_progress', return_doc=False)
+            try:
+                for text in stream_ai_response(_swarm_writer_prompt(ctx, results),
+                        f"You are the Script Writer agent. Build voiceover narrative with story arc (setup, complication, resolution). Write to broadcast documentary standards. {series_bible[:1000] if series_bible else ''}",
+                        model_name=AGENT_MODELS['script_writer'],
+                        generation_config={"max_output_tokens": 65536, "temperature": 0.7}):
+                    live['chunks'].append(text)
+                script_response = ''.join(live['chunks'])
+            except Exception as e:
+                update_agent_task(task['id'], 'failed', error=str(e), return_doc=False)
+                raise
+            update_agent_task(task['id'], 'completed', {'script': script_response}, return_doc=False)
+
+        # Agent 5: Fact Checker - Verify claims
+        fact_response = completed_output('fact_checker', 'verification')
+        if fact_response is None:
+            task = agent_task('fact_checker', 'verify_script', {'script': script_response})
+            checkpoint('fact_checker')
+            update_agent_task(task['id'], 'in_progress', return_doc=False)
+            try:
+                fact_response = generate_ai_response(_swarm_fact_check_prompt(script_response),
+                    "You are the Fact Checker agent. Cross-reference every major claim. Flag statements requiring legal review. Generate source citation log.",
+                    model_name=AGENT_MODELS['fact_checker'])
+            except Exception as e:
+                update_agent_task(task['id'], 'failed', error=str(e), return_doc=False)
+                raise
+            update_agent_task(task['id'], 'completed', {'verification': fact_response}, return_doc=False)
+
+        # Create the script version and complete the job in one ownership-checked
+        # transaction; the version reuses the job id so it can't be written twice.
+        now = datetime.utcnow().isoformat()
+        _swarm_owned_write(job_id, {
+            'status': 'completed',
+            'stage': 'done',
+            'agentTasks': agent_tasks,
+            'outputData': {'scriptVersionId': job_id},
+            'completedAt': now,
+            'heartbeatAt': now,
+        }, creates=[('script_versions', job_id, {
+            'episodeId': episode_id,
+            'versionNumber': 1,
+            'versionType': 'V1_initial',
+            'content': script_response,
+            'factCheck': fact_response,
+            'agentOutputs': {
+                'research_specialist': results.get('research_specialist'),
+                'archive_specialist': results.get('archive_specialist'),
+                'interview_producer': results.get('interview_producer'),
+                'script_writer': script_response,
+                'fact_checker': fact_response
+            },
+            'isLocked': False,
+            'swarmJobId': job_id,
+        })])
+        live['status'] = 'completed'
+        print(f"[SWARM] Job {job_id} complete for episode {episode_id}")
+    except SwarmJobLost as e:
+        # The new owner records the outcome; don't overwrite it
+        print(f"[SWARM] Abandoning run: {e}")
+    except Exception as e:
+        print(f"[SWARM] Job {job_id} failed: {e}")
         try:
-            script_response = generate_ai_response(script_writer_prompt,
-                f"You are the Script Writer agent. Build voiceover narrative with story arc (setup, complication, resolution). Write to broadcast documentary standards. {series_bible[:1000] if series_bible else ''}",
-                model_name=AGENT_MODELS['script_writer'],
-                generation_config={"max_output_tokens": 65536, "temperature": 0.7})
-            update_agent_task(script_task['id'], 'completed', {'script': script_response})
+            _swarm_owned_write(job_id, {'agentTasks': agent_tasks, 'status': 'failed', 'error': str(e),
+                                        'completedAt': datetime.utcnow().isoformat()})
+        except Exception as inner:
+            print(f"[SWARM] Could not record failure for {job_id}: {inner}")
+    finally:
+        stop_heartbeat.set()
+        if live['status'] != 'completed':
+            live['status'] = 'failed'
+        # Keep the buffer briefly for late event subscribers
+        cleanup = threading.Timer(60, _swarm_live.pop, args=(job_id, None))
+        cleanup.daemon = True
+        cleanup.start()
+
+
+def submit_script_swarm_job(job_id):
+    """Claim a swarm job and queue it on the swarm job executor. Returns the claimed job or None."""
+    job = claim_swarm_job(job_id)
+    if job:
+        stop_heartbeat = start_swarm_heartbeat(job_id)
+        try:
+            _swarm_job_executor.submit(run_script_swarm_job, job, stop_heartbeat)
+        except Exception:
+            stop_heartbeat.set()
+            raise
+    return job
 
-            # Agent 5: Fact Checker - Verify claims
-            fact_check_prompt = f"""Review this script and verify all factual claims:
 
-{script_response}
+def resume_swarm_job_if_stale(job):
+    """Re-submit a pending or running job whose worker stopped heartbeating. Returns the claimed job or None."""
+    if job.get('status') not in ('pending', 'in_progress') or not _swarm_job_is_stale(job):
+        return None
+    claimed = submit_script_swarm_job(job['id'])
+    if claimed:
+        print(f"[SWARM] Resuming job {job['id']} from stage {job.get('stage')}")
+    return claimed
+
+
+def resume_stale_swarm_jobs():
+    """Pick up swarm jobs left in progress by a crashed or redeployed instance."""
+    try:
+        docs = (db.collection(COLLECTIONS['agent_tasks'])
+                .where('taskType', '==', 'script_swarm')
+                .where('status', '==', 'in_progress')
+                .stream())
+        for doc in docs:
+            resume_swarm_job_if_stale(doc_to_dict(doc))
+    except Exception as e:
+        print(f"[SWARM] Could not scan for stale jobs: {e}")
+
+
+def swarm_job_status(job):
+    """Job summary with per-agent progress."""
+    agent_tasks = job.get('agentTasks') or {}
+    tasks = {}
+    ids = [agent_tasks[a] for a in SWARM_STAGES if agent_tasks.get(a)]
+    if ids:
+        refs = [db.collection(COLLECTIONS['agent_tasks']).document(i) for i in ids]
+        tasks = {doc.id: doc_to_dict(doc) for doc in db.get_all(refs, field_paths=['status', 'startedAt', 'completedAt', 'error'])}
+    agents = {}
+    for agent_type in SWARM_STAGES:
+        task = tasks.get(agent_tasks.get(agent_type)) or {}
+        agents[agent_type] = {
+            'taskId': agent_tasks.get(agent_type),
+            'status': task.get('status', 'pending'),
+            'startedAt': task.get('startedAt'),
+            'completedAt': task.get('completedAt'),
+            'error': task.get('error'),
+        }
+    output = job.get('outputData') or {}
+    return {
+        'jobId': job['id'],
+        'episodeId': job.get('episodeId'),
+        'status': job.get('status'),
+        'stage': job.get('stage'),
+        'agents': agents,
+        'completedAgents': sum(1 for a in agents.values() if a['status'] == 'completed'),
+        'totalAgents': len(SWARM_STAGES),
+        'scriptVersionId': output.get('scriptVersionId'),
+        'error': job.get('error'),
+        'startedAt': job.get('startedAt'),
+        'completedAt': job.get('completedAt'),
+        'resumeCount': job.get('resumeCount', 0),
+    }
+
+
+@app.route("/api/ai/script-swarm", methods=["POST"])
+def ai_script_swarm():
+    """Start multi-agent script generation as a background job (poll the status endpoint)."""
+    try:
+        data = request.get_json()
+        episode_id = data.get('episodeId')
+        segment_number = data.get('segmentNumber')  # Optional: generate specific segment only
 
-For each major claim, provide:
-1. The claim text
-2. Source verification (from research documents)
-3. Confidence level (verified/probable/requires_confirmation)
-4. Any legal concerns to flag"""
+        if not episode_id:
+            return jsonify({"error": "episodeId is required"}), 400
 
-            fact_task = create_agent_task(episode_id, 'fact_checker', 'verify_script', {
-                'script': script_response
-            })
-            update_agent_task(fact_task['id'], 'in_progress')
+        episode = get_doc('episodes', episode_id)
+        if not episode:
+            return jsonify({"error": "Episode not found"}), 404
 
-            fact_response = generate_ai_response(fact_check_prompt,
-                "You are the Fact Checker agent. Cross-reference every major claim. Flag statements requiring legal review. Generate source citation log.",
-                model_name=AGENT_MODELS['fact_checker'])
-            update_agent_task(fact_task['id'], 'completed', {'verification': fact_response})
+        job = create_agent_task(episode_id, 'script_swarm', 'script_swarm', {'segmentNumber': segment_number})
+        job = submit_script_swarm_job(job['id']) or job
+        return jsonify({
+            'success': True,
+            'jobId': job['id'],
+            'status': job.get('status'),
+            'statusUrl': f"/api/ai/script-swarm/{job['id']}",
+            'eventsUrl': f"/api/ai/script-swarm/{job['id']}/events",
+            'staleAfterSeconds': SWARM_JOB_STALE_SECONDS,
+        }), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            # Create script version
-            script_version = create_doc('script_versions', {
-                'episodeId': episode_id,
-                'versionNumber': 1,
-                'versionType': 'V1_initial',
-                'content': script_response,
-                'factCheck': fact_response,
-                'agentOutputs': {
-                    'research_specialist': results.get('research_specialist'),
-                    'archive_specialist': results.get('archive_specialist'),
-                    'interview_producer': results.get('interview_producer'),
-                    'script_writer': script_response,
-                    'fact_checker': fact_response
-                },
-                'isLocked': False
-            })
 
-            return jsonify({
-                'success': True,
-                'scriptVersionId': script_version['id'],
-                'script': script_response,
-                'factCheck': fact_response,
-                'agentOutputs': results
-            })
+@app.route("/api/ai/script-swarm/<job_id>", methods=["GET"])
+def ai_script_swarm_status(job_id):
+    """Per-agent progress of a script swarm job (re-submitting it if its worker has died)."""
+    try:
+        job = get_doc('agent_tasks', job_id)
+        if not job or job.get('taskType') != 'script_swarm':
+            return jsonify({"error": "Swarm job not found"}), 404
+        job = resume_swarm_job_if_stale(job) or job
+        return jsonify(swarm_job_status(job))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
 
+@app.route("/api/ai/script-swarm/<job_id>/events", methods=["GET"])
+def ai_script_swarm_events(job_id):
+    """Server-Sent Events for a swarm job: stage changes, the script writer's text as
+    it streams (when the job runs in this process), then `done` with the job status.
+
+    Stale jobs are re-submitted while polling. A connection ends with `done`
+    (streamTimedOut: true) after SWARM_EVENTS_MAX_SECONDS so it can't hold a
+    worker thread indefinitely; clients reconnect or fall back to polling."""
+    job = get_doc('agent_tasks', job_id)
+    if not job or job.get('taskType') != 'script_swarm':
+        return jsonify({"error": "Swarm job not found"}), 404
+
+    def fresh_job():
+        doc_cache.invalidate('agent_tasks', job_id)
+        return get_doc('agent_tasks', job_id) or job
+
+    def events():
+        sent = 0
+        last_stage = None
+        deadline = time.monotonic() + SWARM_EVENTS_MAX_SECONDS
+        while True:
+            live = _swarm_live.get(job_id)
+            if live:
+                chunks = live['chunks']
+                while sent < len(chunks):
+                    yield sse_event('chunk', {'text': chunks[sent]})
+                    sent += 1
+                stage, status = live['stage'], live['status']
+            else:
+                current = fresh_job()
+                try:
+                    current = resume_swarm_job_if_stale(current) or current
+                except Exception as e:
+                    print(f"[SWARM] Could not resume stale job {job_id}: {e}")
+                stage, status = current.get('stage'), current.get('status')
+            if stage != last_stage:
+                yield sse_event('stage', {'stage': stage})
+                last_stage = stage
+            if status in ('completed', 'failed'):
+                yield sse_event('done', swarm_job_status(fresh_job()))
+                return
+            if time.monotonic() > deadline:
+                yield sse_event('done', {**swarm_job_status(fresh_job()), 'streamTimedOut': True})
+                return
+            time.sleep(0.5 if live else SWARM_EVENTS_POLL_SECONDS)
+
+    return event_stream_response(events())
+
+
+@app.route("/api/ai/script-swarm/<job_id>/resume", methods=["POST"])
+def ai_script_swarm_resume(job_id):
+    """Resume a failed or abandoned swarm job from its last completed agent."""
+    try:
+        job = get_doc('agent_tasks', job_id)
+        if not job or job.get('taskType') != 'script_swarm':
+            return jsonify({"error": "Swarm job not found"}), 404
+        claimed = submit_script_swarm_job(job_id)
+        if not claimed:
+            return jsonify({"error": "Job is complete or still running", "status": job.get('status')}), 409
+        return jsonify({'success': True, 'jobId': job_id, 'status': claimed['status'],
+                        'statusUrl': f"/api/ai/script-swarm/{job_id}",
+                        'staleAfterSeconds': SWARM_JOB_STALE_SECONDS}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -4372,8 +7389,7 @@ For each major claim, provide:
 3. Any legal concerns to flag
 4. Suggested corrections where needed"""
 
-        universal_doc = db.collection(COLLECTIONS['universal_config']).document('global').get()
-        universal_rules = universal_doc.to_dict().get('rules', DEFAULT_UNIVERSAL_RULES) if universal_doc.exists else DEFAULT_UNIVERSAL_RULES
+        universal_rules = config_service.universal_rules()
 
         system_prompt = f"""=== UNIVERSAL DOCUMENTARY CRAFT RULES ===
 {universal_rules}
@@ -4385,6 +7401,7 @@ You are the Fact Checker agent. Cross-reference every major claim. Flag statemen
 
         # Update the version doc with new fact check
         version_doc.reference.update({'factCheck': fact_response, 'factCheckedAt': datetime.utcnow().isoformat()})
+        doc_cache.invalidate('script_versions', version_doc.id)
 
         return jsonify({"success": True, "factCheck": fact_response})
     except Exception as e:
@@ -4417,8 +7434,7 @@ def generate_iv_brief():
 
         episode_brief = episode.get('brief', {})
 
-        universal_doc = db.collection(COLLECTIONS['universal_config']).document('global').get()
-        universal_rules = universal_doc.to_dict().get('rules', DEFAULT_UNIVERSAL_RULES) if universal_doc.exists else DEFAULT_UNIVERSAL_RULES
+        universal_rules = config_service.universal_rules()
 
         results = {}
 
@@ -4487,8 +7503,8 @@ def import_research_batch():
         data = request.get_json()
         docs = data if isinstance(data, list) else data.get('docs', [])
 
-        created = []
-        updated_episodes = set()
+        bulk = BulkWrite()
+        episode_beats = {}  # episodeId -> merged storyBeats
 
         for doc_data in docs:
             title = doc_data.get('title', 'Untitled')
@@ -4498,7 +7514,7 @@ def import_research_batch():
             source_type = doc_data.get('sourceType', 'external_agent')
 
             # Create research document
-            new_doc = create_doc('research_documents', {
+            bulk.create('research_documents', {
                 'title': title,
                 'content': content,
                 'episodeId': episode_id,
@@ -4507,7 +7523,6 @@ def import_research_batch():
                 'documentType': source_type,
                 'confidenceLevel': 'requires_confirmation',
             })
-            created.append(new_doc['id'])
 
             # Parse ## Sequence / ## Beat headers → update episode storyBeats
             if episode_id:
@@ -4517,20 +7532,21 @@ def import_research_batch():
                     if line.startswith('## Sequence') or line.startswith('## Beat')
                 ]
                 if beat_lines:
-                    episode = get_doc('episodes', episode_id)
-                    if episode:
-                        existing_brief = episode.get('brief', {})
-                        existing_beats = existing_brief.get('storyBeats', [])
-                        merged_beats = list(dict.fromkeys(existing_beats + beat_lines))
-                        db.collection(COLLECTIONS['episodes']).document(episode_id).update({
-                            'brief.storyBeats': merged_beats
-                        })
-                        updated_episodes.add(episode_id)
+                    if episode_id not in episode_beats:
+                        episode = get_doc('episodes', episode_id)
+                        if not episode:
+                            continue
+                        episode_beats[episode_id] = episode.get('brief', {}).get('storyBeats', [])
+                    episode_beats[episode_id] = list(dict.fromkeys(episode_beats[episode_id] + beat_lines))
+
+        for episode_id, merged_beats in episode_beats.items():
+            bulk.update('episodes', episode_id, {'brief.storyBeats': merged_beats})
+        created = bulk.commit()
 
         return jsonify({
             "success": True,
             "created": len(created),
-            "updated_episodes": list(updated_episodes),
+            "updated_episodes": list(episode_beats),
             "document_ids": created
         })
     except Exception as e:
@@ -4575,7 +7591,7 @@ Format each section clearly with headers."""
         system_prompt = """You are a documentary research specialist. Generate thorough, factually-grounded research questions and identify key sources.
 Focus on verifiable facts and primary sources. Identify potential contradictions or controversies that need investigation."""
 
-        update_agent_task(task['id'], 'in_progress')
+        update_agent_task(task['id'], 'in_progress', return_doc=False)
 
         try:
             raw_response = generate_ai_response(prompt, system_prompt)
@@ -4594,7 +7610,7 @@ Focus on verifiable facts and primary sources. Identify potential contradictions
             update_agent_task(task['id'], 'completed', {
                 'researchPackage': response,
                 'documentId': research_doc['id']
-            })
+            }, return_doc=False)
 
             return jsonify({
                 'success': True,
@@ -4604,7 +7620,7 @@ Focus on verifiable facts and primary sources. Identify potential contradictions
             })
 
         except Exception as e:
-            update_agent_task(task['id'], 'failed', error=str(e))
+            update_agent_task(task['id'], 'failed', error=str(e), return_doc=False)
             return jsonify({"error": str(e)}), 500
 
     except Exception as e:
@@ -4646,7 +7662,7 @@ def update_series_knowledge_base(series_id):
         knowledge_base = series.get('knowledgeBase', {})
         knowledge_base.update(data)
 
-        updated = update_doc('series', series_id, {'knowledgeBase': knowledge_base})
+        updated = update_doc('series', series_id, {'knowledgeBase': knowledge_base}, prior=series)
         return jsonify(updated)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4664,12 +7680,10 @@ def bulk_create_episodes(series_id):
         if not episodes_data:
             return jsonify({"error": "episodes array is required"}), 400
 
-        created = []
         for ep_data in episodes_data:
             ep_data['seriesId'] = series_id
             ep_data['projectId'] = project_id
-            episode = create_episode_with_buckets(ep_data)
-            created.append(episode)
+        created = create_episode_docs([init_episode_buckets(ep_data) for ep_data in episodes_data])
 
         return jsonify({
             'success': True,
@@ -4866,7 +7880,7 @@ Return ONLY the JSON object, no markdown formatting."""
         from vertexai.generative_models import Part
         audio_part = Part.from_data(data=file_bytes, mime_type=mime_type)
 
-        response = model.generate_content(
+        response = coalesced_generate_content(
             [audio_part, prompt],
             generation_config={"temperature": 0.1, "max_output_tokens": 8192}
         )
@@ -4934,7 +7948,7 @@ def process_transcript(transcript_id):
 Interview with: {transcript.get('speakerName', 'Unknown')}
 
 Transcript:
-{full_text[:50000]}
+{fit_to_budget(full_text)}
 
 Format each soundbite with:
 - Timecode (if available)
@@ -4950,7 +7964,7 @@ Format each soundbite with:
             'processed': True,
             'processedAt': datetime.utcnow().isoformat(),
             'aiAnalysis': response
-        })
+        }, return_doc=False)
 
         return jsonify({
             'success': True,
@@ -5104,7 +8118,7 @@ def update_episode_brief(episode_id):
         brief = episode.get('brief', {})
         brief.update(data)
 
-        updated = update_doc('episodes', episode_id, {'brief': brief})
+        updated = update_doc('episodes', episode_id, {'brief': brief}, prior=episode)
         return jsonify(updated.get('brief', {}))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5185,6 +8199,25 @@ def api_health():
     })
 
 
+ARCHIVE_SEARCH_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'title': {'type': 'STRING'},
+            'duration_seconds': {'type': 'NUMBER'},
+            'visual_description': {'type': 'STRING'},
+            'archive_source': {'type': 'STRING'},
+            'category': {'type': 'STRING'},
+            'year_range': {'type': 'STRING'},
+            'quality': {'type': 'STRING'},
+            'search_term': {'type': 'STRING'},
+        },
+        'required': ['title', 'visual_description'],
+    },
+}
+
+
 @app.route("/api/search-archive", methods=["POST"])
 def api_search_archive():
     """Archive search via AI prompt → JSON array of clips with real thumbnails."""
@@ -5209,13 +8242,8 @@ Return a JSON array of archive clips. Each clip must have:
 
 Provide 5-8 relevant results. Return ONLY the JSON array."""
 
-        response_text = generate_ai_response(prompt,
-                                            generation_config={"max_output_tokens": 4096, "temperature": 0.3})
-        try:
-            import json
-            result = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            result = []
+        result = generate_json(prompt, ARCHIVE_SEARCH_SCHEMA,
+                               generation_config={"max_output_tokens": 4096, "temperature": 0.3}, default=[])
 
         # Fetch real thumbnails from NASA Images API for each result
         for clip in result:
@@ -5300,6 +8328,17 @@ def api_nasa_search():
         return jsonify({"error": str(e)}), 500
 
 
+CLIP_ANALYSIS_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'visual_description': {'type': 'STRING'},
+        'mood': {'type': 'STRING'},
+        'quality_score': {'type': 'NUMBER'},
+    },
+    'required': ['visual_description', 'mood', 'quality_score'],
+}
+
+
 @app.route("/api/analyze-clip", methods=["POST"])
 def api_analyze_clip():
     """Clip visual analysis → {visual_description, mood, quality_score}."""
@@ -5313,18 +8352,34 @@ Return ONLY valid JSON with these keys:
 - mood: string
 - quality_score: number (0-100)"""
 
-        response_text = generate_ai_response(prompt,
-                                            generation_config={"max_output_tokens": 4096, "temperature": 0.3})
         try:
-            import json
-            result = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            result = {"visual_description": response_text, "mood": "unknown", "quality_score": 50}
+            result = generate_json(prompt, CLIP_ANALYSIS_SCHEMA,
+                                   generation_config={"max_output_tokens": 4096, "temperature": 0.3},
+                                   template='analyze_clip', no_cache=wants_no_cache())
+        except JSONGenerationError as e:
+            result = {"visual_description": e.text, "mood": "unknown", "quality_score": 50}
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+EXPERTS_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'name': {'type': 'STRING'},
+            'title': {'type': 'STRING'},
+            'affiliation': {'type': 'STRING'},
+            'expertise_area': {'type': 'STRING'},
+            'relevance': {'type': 'STRING'},
+            'relevance_score': {'type': 'NUMBER'},
+        },
+        'required': ['name'],
+    },
+}
+
+
 @app.route("/api/find-experts", methods=["POST"])
 def api_find_experts():
     """Expert discovery → JSON array of experts."""
@@ -5351,12 +8406,9 @@ Return ONLY a JSON array where each object has:
 - relevance: string (why they are relevant to this topic)
 - relevance_score: number (0.0-1.0)"""
 
-        response_text = generate_ai_response(prompt,
-                                            generation_config={"max_output_tokens": 8192, "temperature": 0.5})
-        try:
-            result = json.loads(clean_ai_response(response_text))
-        except (json.JSONDecodeError, ValueError):
-            result = []
+        result = generate_json(prompt, EXPERTS_SCHEMA,
+                               generation_config={"max_output_tokens": 8192, "temperature": 0.5},
+                               template='find_experts', no_cache=wants_no_cache(), default=[])
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5384,6 +8436,20 @@ Return ONLY the rewritten text, no markdown or explanations."""
         return jsonify({"error": str(e)}), 500
 
 
+SOURCE_INDEX_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'title': {'type': 'STRING'},
+        'summary': {'type': 'STRING'},
+        'key_topics': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'key_facts': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'content_type': {'type': 'STRING'},
+        'suggested_questions': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+    },
+    'required': ['title', 'summary'],
+}
+
+
 @app.route("/api/index-source", methods=["POST"])
 def api_index_source():
     """Source indexing (URL/text/youtube) → analysis JSON."""
@@ -5421,12 +8487,10 @@ Return ONLY valid JSON with:
         else:
             return jsonify({"error": "Invalid source type or missing content"}), 400
 
-        response_text = generate_ai_response(prompt)
         try:
-            import json
-            analysis = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            analysis = {"title": title or url or "Unknown", "summary": response_text}
+            analysis = generate_json(prompt, SOURCE_INDEX_SCHEMA, template='index_source', no_cache=wants_no_cache())
+        except JSONGenerationError as e:
+            analysis = {"title": title or url or "Unknown", "summary": e.text}
 
         return jsonify({
             "status": "indexed",
@@ -5441,6 +8505,27 @@ Return ONLY valid JSON with:
         return jsonify({"error": str(e), "status": "error"}), 500
 
 
+SOURCE_QUERY_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'response': {'type': 'STRING'},
+        'key_facts': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'source_citations': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {'source_title': {'type': 'STRING'}, 'relevant_info': {'type': 'STRING'}},
+            },
+        },
+        'confidence_level': {'type': 'STRING'},
+        'follow_up_questions': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'contradictions': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'gaps': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+    },
+    'required': ['response', 'key_facts', 'source_citations'],
+}
+
+
 @app.route("/api/query-sources", methods=["POST"])
 def api_query_sources():
     """Cross-source research → {response, key_facts, source_citations, ...}."""
@@ -5489,13 +8574,11 @@ Return ONLY valid JSON with:
 - source_citations: array of objects with source_title and relevant_info
 - follow_up_questions: array of 2-3 questions"""
 
-        response_text = generate_ai_response(prompt,
-                                            generation_config={"max_output_tokens": 8192, "temperature": 0.5})
         try:
-            import json
-            result = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            result = {"response": response_text, "key_facts": [], "source_citations": []}
+            result = generate_json(prompt, SOURCE_QUERY_SCHEMA,
+                                   generation_config={"max_output_tokens": 8192, "temperature": 0.5})
+        except JSONGenerationError as e:
+            result = {"response": e.text, "key_facts": [], "source_citations": []}
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5522,8 +8605,13 @@ def api_chat():
         conversation_context = "\n".join(context_parts)
         full_prompt = f"""{f'Previous conversation:{chr(10)}{conversation_context}{chr(10)}{chr(10)}' if conversation_context else ''}User: {message}"""
 
+        generation_config = {"max_output_tokens": 4096, "temperature": 0.7}
+        if wants_stream():
+            return sse_response(stream_ai_response(full_prompt, system_prompt=system_instruction,
+                                                   generation_config=generation_config))
+
         response_text = generate_ai_response(full_prompt, system_prompt=system_instruction,
-                                            generation_config={"max_output_tokens": 4096, "temperature": 0.7})
+                                            generation_config=generation_config)
         return jsonify({"response": response_text})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5534,6 +8622,9 @@ def api_chat():
 @app.route("/api/users", methods=["GET"])
 def get_users():
     """Get all user profiles."""
+    paged = paged_list_response('users')
+    if paged:
+        return paged
     users = get_all_docs('users')
     return jsonify(users)
 
@@ -5610,6 +8701,7 @@ def update_universal_config():
         db.collection(COLLECTIONS['universal_config']).document('global').set({
             **data, "updatedAt": datetime.utcnow().isoformat()
         }, merge=True)
+        config_service.invalidate('universal_config', 'global')
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5639,6 +8731,8 @@ def create_series_config():
         db.collection(COLLECTIONS['series_config']).document(series_id).set({
             **data, "updatedAt": datetime.utcnow().isoformat()
         })
+        config_service.invalidate('series_config', series_id)
+        doc_cache.invalidate('series_config', series_id)
         return jsonify({**data, "id": series_id}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5664,6 +8758,8 @@ def update_series_config(series_id):
         db.collection(COLLECTIONS['series_config']).document(series_id).set({
             **data, "updatedAt": datetime.utcnow().isoformat()
         }, merge=True)
+        config_service.invalidate('series_config', series_id)
+        doc_cache.invalidate('series_config', series_id)
         return jsonify({**data, "id": series_id})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5674,6 +8770,8 @@ def delete_series_config(series_id):
     """Delete series config."""
     try:
         db.collection(COLLECTIONS['series_config']).document(series_id).delete()
+        config_service.invalidate('series_config', series_id)
+        doc_cache.invalidate('series_config', series_id)
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5754,6 +8852,8 @@ def seed_series_configs():
             db.collection(COLLECTIONS['series_config']).document(series_id).set({
                 **config, "id": series_id, "updatedAt": datetime.utcnow().isoformat()
             })
+        config_service.invalidate('series_config')
+        doc_cache.invalidate_collection('series_config')
         return jsonify({"success": True, "seeded": 3})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5901,7 +9001,7 @@ def save_project_brief(project_id):
         # Sync target_duration_minutes to project level if provided in brief
         if data.get('episode_duration_minutes'):
             updates['target_duration_minutes'] = data['episode_duration_minutes']
-        update_doc('projects', project_id, updates)
+        update_doc('projects', project_id, updates, return_doc=False)
         return jsonify({"success": True, "brief": data})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5927,7 +9027,7 @@ def save_project_bible(project_id):
         project = get_doc('projects', project_id)
         if not project:
             return jsonify({"error": "Project not found"}), 404
-        update_doc('projects', project_id, {'bible': data})
+        update_doc('projects', project_id, {'bible': data}, return_doc=False)
         return jsonify({"success": True, "bible": data})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5953,7 +9053,7 @@ def save_episode_structure(episode_id):
         episode = get_doc('episodes', episode_id)
         if not episode:
             return jsonify({"error": "Episode not found"}), 404
-        update_doc('episodes', episode_id, {'structure': data})
+        update_doc('episodes', episode_id, {'structure': data}, return_doc=False)
         return jsonify({"success": True, "structure": data})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5962,6 +9062,19 @@ def save_episode_structure(episode_id):
 # ============== Missing Frontend Endpoints ==============
 
 
+DOCUMENT_ANALYSIS_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'title': {'type': 'STRING'},
+        'summary': {'type': 'STRING'},
+        'key_topics': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'key_facts': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'timeline_events': {'type': 'ARRAY', 'items': {'type': 'OBJECT', 'properties': {'date': {'type': 'STRING'}, 'event': {'type': 'STRING'}}}},
+    },
+    'required': ['title', 'summary'],
+}
+
+
 @app.route("/api/analyze-document", methods=["POST"])
 def api_analyze_document():
     """Analyze uploaded document content → structured summary."""
@@ -5994,12 +9107,11 @@ Return ONLY valid JSON with:
 - key_facts: array of strings (5-8 notable facts)
 - timeline_events: array (empty array for non-temporal documents)"""
 
-        response_text = generate_ai_response(prompt)
         try:
-            import json
-            analysis = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            analysis = {"title": file_name, "summary": response_text, "key_topics": [], "key_facts": [], "timeline_events": []}
+            analysis = generate_json(prompt, DOCUMENT_ANALYSIS_SCHEMA, template='analyze_document',
+                                     no_cache=wants_no_cache())
+        except JSONGenerationError as e:
+            analysis = {"title": file_name, "summary": e.text, "key_topics": [], "key_facts": [], "timeline_events": []}
 
         return jsonify({
             "status": "analyzed",
@@ -6013,6 +9125,23 @@ Return ONLY valid JSON with:
         return jsonify({"error": str(e)}), 500
 
 
+SERIES_STRUCTURE_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'episodes': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {'title': {'type': 'STRING'}, 'research_focus': {'type': 'STRING'}, 'suggested_engine': {'type': 'STRING'}},
+                'required': ['title'],
+            },
+        },
+        'themes': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+    },
+    'required': ['episodes', 'themes'],
+}
+
+
 @app.route("/api/series-structure", methods=["POST"])
 def api_series_structure():
     """Generate documentary series structure from premise."""
@@ -6032,17 +9161,49 @@ Return ONLY valid JSON with:
   - suggested_engine: string (one of: google_deep_research, academic_search, investigative)
 - themes: array of strings (3-5 overarching themes that connect the episodes)"""
 
-        response_text = generate_ai_response(prompt)
-        try:
-            import json
-            result = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            result = {"episodes": [], "themes": []}
+        result = generate_json(prompt, SERIES_STRUCTURE_SCHEMA, template='series_structure',
+                               no_cache=wants_no_cache(), default={"episodes": [], "themes": []})
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+SCRIPT_ACTS_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'title': {'type': 'STRING'},
+            'scenes': {
+                'type': 'ARRAY',
+                'items': {
+                    'type': 'OBJECT',
+                    'properties': {
+                        'title': {'type': 'STRING'},
+                        'beats': {
+                            'type': 'ARRAY',
+                            'items': {
+                                'type': 'OBJECT',
+                                'properties': {
+                                    'type': {'type': 'STRING', 'enum': ['voice_over', 'expert', 'archive', 'ai_visual']},
+                                    'content': {'type': 'STRING'},
+                                    'speaker': {'type': 'STRING'},
+                                    'topic': {'type': 'STRING'},
+                                    'duration_seconds': {'type': 'NUMBER'},
+                                },
+                                'required': ['type', 'content'],
+                            },
+                        },
+                    },
+                    'required': ['title', 'beats'],
+                },
+            },
+        },
+        'required': ['title', 'scenes'],
+    },
+}
+
+
 @app.route("/api/generate-script", methods=["POST"])
 def api_generate_script():
     """Multi-agent script generation for a documentary."""
@@ -6069,31 +9230,29 @@ def api_generate_script():
         # Load universal rules (Thomas's craft rules)
         universal_rules = DEFAULT_UNIVERSAL_RULES
         try:
-            universal_doc = db.collection(COLLECTIONS['universal_config']).document('global').get()
-            if universal_doc.exists:
-                universal_rules = universal_doc.to_dict().get('rules', DEFAULT_UNIVERSAL_RULES)
+            universal_rules = config_service.universal_rules()
         except Exception:
             pass
 
         # Load series config for format-aware generation
-        series_config = {}
+        commentary_format = 'CAPS'
+        format_config = {'scriptFormat': '2-column', 'factCheckMode': 'at_generation'}
+        script_directives = {}
         if series_id:
             try:
-                series_config_doc = db.collection(COLLECTIONS['series_config']).document(series_id).get()
-                if series_config_doc.exists:
-                    series_config = series_config_doc.to_dict()
+                commentary_format = config_service.commentary_format(series_id)
+                format_config = config_service.script_format(series_id)
+                script_directives = config_service.style_dna_directives(series_id)
             except Exception:
                 pass
 
-        commentary_format = series_config.get('scriptStyle', {}).get('commentaryFormat', 'CAPS')
-        script_format = series_config.get('workflow', {}).get('scriptFormat', '2-column')
-        fact_check_mode = series_config.get('workflow', {}).get('factCheckMode', 'at_generation')
+        script_format = format_config['scriptFormat']
+        fact_check_mode = format_config['factCheckMode']
 
         # Extract Style DNA directives if available
         style_dna_block = ""
-        style_dna = series_config.get('styleDna', {})
-        if style_dna and style_dna.get('script_directives'):
-            sd = style_dna['script_directives']
+        if script_directives:
+            sd = script_directives
             style_dna_block = f"""
 === STYLE DNA DIRECTIVES (From Reference Analysis) ===
 Pacing: {sd.get('pacing_instruction', 'N/A')}
@@ -6111,23 +9270,27 @@ Comparative Style: {sd.get('comparative_reference', 'N/A')}
 """
 
         # --- Server-side research enrichment ---
-        # Fetch research documents from Firestore even if frontend didn't send researchContext
+        # Fetch research documents from Firestore even if frontend didn't send researchContext,
+        # then pack everything into the script model's context budget
         episode_id = data.get("episodeId", "")
-        server_research_items = []
+        research_sections = []
+        if research_context:
+            research_sections.append({'kind': 'brief', 'text': "\n".join(
+                f"- {r}" if isinstance(r, str) else f"- {r.get('title', '')}: {r.get('summary', '')}"
+                for r in research_context
+            )})
 
         # 1. Fetch from research_documents collection (structured research)
         if episode_id:
             try:
                 research_docs = get_docs_by_episode('research_documents', episode_id)
                 for rdoc in research_docs:
-                    title_str = rdoc.get('title', 'Untitled')
-                    summary_str = rdoc.get('summary', rdoc.get('content', ''))[:2000]
+                    text = rdoc.get('summary', rdoc.get('content', ''))
                     key_facts = rdoc.get('key_facts', [])
-                    facts_str = "; ".join(key_facts) if key_facts else ""
-                    entry = f"- {title_str}: {summary_str}"
-                    if facts_str:
-                        entry += f"\n  Key facts: {facts_str}"
-                    server_research_items.append(entry)
+                    if key_facts:
+                        text += f"\nKey facts: {'; '.join(key_facts)}"
+                    research_sections.append({'kind': 'research', 'title': rdoc.get('title', 'Untitled'), 'text': text,
+                                              'date': rdoc.get('updatedAt') or rdoc.get('createdAt')})
             except Exception:
                 pass
 
@@ -6136,7 +9299,8 @@ Comparative Style: {sd.get('comparative_reference', 'N/A')}
             try:
                 ep_doc = get_doc('episodes', episode_id)
                 if ep_doc and ep_doc.get('research'):
-                    server_research_items.append(f"- Episode Research Brief:\n{ep_doc['research'][:3000]}")
+                    research_sections.append({'kind': 'brief', 'title': 'Episode Research Brief',
+                                              'text': ep_doc['research']})
             except Exception:
                 pass
 
@@ -6149,21 +9313,12 @@ Comparative Style: {sd.get('comparative_reference', 'N/A')}
                     project_id=data.get("projectId", "")
                 )
                 for dc in doc_contents:
-                    server_research_items.append(f"- {dc['source']}:\n{dc['content'][:2000]}")
+                    research_sections.append({'kind': 'research', 'title': dc['source'], 'text': dc['content']})
             except Exception:
                 pass
 
-        # Merge frontend-provided context with server-side research
-        all_research = []
-        if research_context:
-            all_research.extend(
-                f"- {r}" if isinstance(r, str) else f"- {r.get('title', '')}: {r.get('summary', '')}"
-                for r in research_context
-            )
-        if server_research_items:
-            all_research.extend(server_research_items)
-
-        research_summary = "\n".join(all_research) if all_research else "No research context provided."
+        research_summary = pack_context(research_sections, AGENT_MODELS['script_writer'])['text'] \
+            or "No research context provided."
 
         archive_summary = "\n".join(
             f"- {a}" if isinstance(a, str) else f"- {a.get('title', '')}: {a.get('visual_description', '')}"
@@ -6220,21 +9375,40 @@ STRUCTURAL REQUIREMENTS:
 - The sum of all duration_seconds MUST total approximately {duration * 60} seconds ({duration} minutes).
 - Write FULL narration text for every voice_over beat — do NOT use placeholders."""
 
-        response_text = generate_ai_response(
-            prompt,
-            model_name=AGENT_MODELS['script_writer'],
-            generation_config={"max_output_tokens": 65536, "temperature": 0.7}
-        )
-        try:
-            import json
-            result = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            result = []
-        return jsonify(result)
+        def parse_beats(response_text):
+            # Streamed text can't be re-prompted, so only local repair applies
+            try:
+                beats = parse_json_text(response_text)
+            except ValueError:
+                return []
+            return [] if validate_json(beats, SCRIPT_ACTS_SCHEMA) else beats
+
+        generation_config = {"max_output_tokens": 65536, "temperature": 0.7}
+        if wants_stream():
+            # Chunks are raw JSON text; `done` carries the parsed beats
+            stream_config = {**generation_config, "response_mime_type": "application/json",
+                             "response_schema": SCRIPT_ACTS_SCHEMA}
+            return sse_response(
+                stream_ai_response(prompt, model_name=AGENT_MODELS['script_writer'], generation_config=stream_config),
+                on_complete=lambda text: {"beats": parse_beats(text)})
+
+        beats = generate_json(prompt, SCRIPT_ACTS_SCHEMA, model_name=AGENT_MODELS['script_writer'],
+                              generation_config=generation_config, default=[])
+        return jsonify(beats)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+INTERVIEW_PLAN_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'ideal_soundbite': {'type': 'STRING'},
+        'questions': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+    },
+    'required': ['ideal_soundbite', 'questions'],
+}
+
+
 @app.route("/api/interview-plan", methods=["POST"])
 def api_interview_plan():
     """Generate interview strategy for a scene/topic."""
@@ -6252,17 +9426,40 @@ Return ONLY valid JSON with:
 - ideal_soundbite: string (the ideal 1-2 sentence soundbite you want the interviewee to deliver)
 - questions: array of strings (8-12 interview questions, ordered from warm-up to probing, designed to naturally elicit the ideal soundbite)"""
 
-        response_text = generate_ai_response(prompt)
-        try:
-            import json
-            result = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
-            result = {"ideal_soundbite": "", "questions": []}
+        result = generate_json(prompt, INTERVIEW_PLAN_SCHEMA, template='interview_plan',
+                               no_cache=wants_no_cache(), default={"ideal_soundbite": "", "questions": []})
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+BROLL_BRIEF_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'shots': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'description': {'type': 'STRING'},
+                    'duration_seconds': {'type': 'NUMBER'},
+                    'camera_movement': {'type': 'STRING'},
+                    'framing': {'type': 'STRING'},
+                    'lighting': {'type': 'STRING'},
+                },
+                'required': ['description'],
+            },
+        },
+        'colour_palette': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'camera_notes': {'type': 'STRING'},
+        'mood': {'type': 'STRING'},
+        'music_suggestion': {'type': 'STRING'},
+        'status': {'type': 'STRING'},
+    },
+    'required': ['shots'],
+}
+
+
 @app.route("/api/generate-broll", methods=["POST"])
 def api_generate_broll():
     """Generate a structured B-roll visual brief (Veo not yet integrated for video generation)."""
@@ -6291,15 +9488,15 @@ Return ONLY valid JSON with:
 - music_suggestion: string (style/tempo of accompanying music)
 - status: string (always "visual_brief" — video generation not yet available)"""
 
-        response_text = generate_ai_response(ai_prompt,
-                                             generation_config={"max_output_tokens": 4096, "temperature": 0.7})
         try:
-            result = json.loads(response_text.strip().removeprefix("```json").removesuffix("```").strip())
-        except (json.JSONDecodeError, ValueError):
+            result = generate_json(ai_prompt, BROLL_BRIEF_SCHEMA,
+                                   generation_config={"max_output_tokens": 4096, "temperature": 0.7},
+                                   template='generate_broll', no_cache=wants_no_cache())
+        except JSONGenerationError as e:
             result = {
                 "shots": [{"description": prompt, "duration_seconds": duration, "camera_movement": "static", "framing": "wide", "lighting": "natural"}],
                 "colour_palette": ["#1a1a2e", "#16213e", "#0f3460"],
-                "camera_notes": response_text,
+                "camera_notes": e.text,
                 "mood": "documentary",
                 "music_suggestion": "ambient underscore",
                 "status": "visual_brief"
@@ -6415,6 +9612,58 @@ def api_vertex_models():
         return jsonify(models)
 
 
+# GCS usage is expensive to compute (a full blob listing), so it is cached
+# and refreshed in a background thread at most every GCS_USAGE_TTL seconds.
+GCS_USAGE_TTL = int(os.environ.get("GCS_USAGE_TTL", "900"))
+_gcs_usage = {'refreshedAt': None, 'refreshedMonotonic': 0.0, 'refreshing': False}
+_gcs_usage_lock = threading.Lock()
+
+
+def _refresh_gcs_usage():
+    """Walk the primary bucket and record bucket count, total size and file count."""
+    try:
+        bucket_count = sum(1 for _ in storage_client.list_buckets())
+        size_bytes = 0
+        files = 0
+        for blob in storage_client.bucket(STORAGE_BUCKET).list_blobs(fields='items(size),nextPageToken'):
+            size_bytes += blob.size or 0
+            files += 1
+        with _gcs_usage_lock:
+            _gcs_usage.update({
+                'bucketCount': bucket_count,
+                'primaryBucketSizeBytes': size_bytes,
+                'primaryBucketFiles': files,
+                'error': None,
+                'refreshedAt': datetime.utcnow().isoformat(),
+                'refreshedMonotonic': time.monotonic(),
+            })
+    except Exception as e:
+        print(f"[CLOUD STATS] GCS usage refresh failed: {e}")
+        with _gcs_usage_lock:
+            _gcs_usage['error'] = str(e)
+            _gcs_usage['refreshedMonotonic'] = time.monotonic()
+    finally:
+        with _gcs_usage_lock:
+            _gcs_usage['refreshing'] = False
+
+
+def get_gcs_usage():
+    """Cached GCS usage summary; kicks off a background refresh when stale."""
+    with _gcs_usage_lock:
+        stale = time.monotonic() - _gcs_usage['refreshedMonotonic'] > GCS_USAGE_TTL \
+            or _gcs_usage['refreshedAt'] is None
+        if stale and not _gcs_usage['refreshing']:
+            _gcs_usage['refreshing'] = True
+            threading.Thread(target=_refresh_gcs_usage, daemon=True).start()
+        return {k: v for k, v in _gcs_usage.items() if k != 'refreshedMonotonic'}
+
+
+def count_collection(full_name):
+    """Document count via a Firestore count() aggregation (no document reads)."""
+    result = db.collection(full_name).count().get()
+    return int(result[0][0].value)
+
+
 @app.route("/api/cloud/stats", methods=["GET"])
 def api_cloud_stats():
     """Live infrastructure stats from Firestore and GCS."""
@@ -6428,29 +9677,23 @@ def api_cloud_stats():
             "assets": COLLECTIONS.get("assets", "doc_assets"),
             "interviews": COLLECTIONS.get("interviews", "doc_interviews"),
             "shots": COLLECTIONS.get("shots", "doc_shots"),
-            "users": "users",
+            "users": COLLECTIONS.get("users", "doc_users"),
         }
         counts = {}
         for label, full_name in stat_collections.items():
-            docs = db.collection(full_name).limit(1000).stream()
-            counts[label] = sum(1 for _ in docs)
+            counts[label] = count_collection(full_name)
 
-        # GCS quick summary (just bucket count + total size of primary bucket)
-        bucket_count = sum(1 for _ in storage_client.list_buckets())
-        primary_size_bytes = 0
-        try:
-            primary_bucket = storage_client.bucket(STORAGE_BUCKET)
-            blobs = list(primary_bucket.list_blobs(max_results=500))
-            primary_size_bytes = sum(b.size or 0 for b in blobs)
-        except Exception:
-            pass
+        gcs = get_gcs_usage()
+        size_bytes = gcs.get('primaryBucketSizeBytes')
 
         return jsonify({
             "firestore": counts,
             "totalDocuments": sum(counts.values()),
-            "gcsBucketCount": bucket_count,
-            "primaryBucketSizeGb": round(primary_size_bytes / (1024 ** 3), 2),
-            "primaryBucketFiles": len(blobs) if 'blobs' in dir() else 0,
+            "gcsBucketCount": gcs.get('bucketCount'),
+            "primaryBucketSizeGb": round(size_bytes / (1024 ** 3), 2) if size_bytes is not None else None,
+            "primaryBucketFiles": gcs.get('primaryBucketFiles'),
+            "gcsRefreshedAt": gcs.get('refreshedAt'),
+            "gcsRefreshing": gcs.get('refreshing'),
             "region": LOCATION,
             "project": PROJECT_ID
         })
@@ -6957,7 +10200,7 @@ def seed_kevin_catalog(project_id):
     )
     existing_titles = {d.to_dict().get("kevin_title", "").lower() for d in existing_docs}
 
-    created = 0
+    bulk = BulkWrite()
     skipped = 0
 
     for video in KEVIN_LACEY_CATALOG:
@@ -6991,9 +10234,9 @@ def seed_kevin_catalog(project_id):
             "shots": [],
             "createdAt": datetime.utcnow().isoformat(),
         }
-        create_doc("youtube_clips", catalog_doc)
-        created += 1
+        bulk.create("youtube_clips", catalog_doc)
 
+    created = len(bulk.commit())
     return jsonify({
         "message": "Kevin's catalog seeded",
         "created": created,
@@ -7039,17 +10282,53 @@ Meta object:
 Be thorough — capture every shot. Return only valid JSON, no markdown wrapping."""
 
 
+YOUTUBE_ANALYSIS_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'shots': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'timecode': {'type': 'STRING'},
+                    'duration_seconds': {'type': 'INTEGER'},
+                    'shot_type': {'type': 'STRING'},
+                    'location_description': {'type': 'STRING'},
+                    'subject': {'type': 'STRING'},
+                    'action': {'type': 'STRING'},
+                    'camera_movement': {'type': 'STRING'},
+                    'usability': {'type': 'STRING'},
+                    'tags': {'type': 'STRING'},
+                },
+                'required': ['timecode', 'shot_type'],
+            },
+        },
+        'meta': {
+            'type': 'OBJECT',
+            'properties': {
+                'video_summary': {'type': 'STRING'},
+                'location_name': {'type': 'STRING'},
+                'location_type': {'type': 'STRING'},
+                'total_shots': {'type': 'INTEGER'},
+                'presenter_on_screen': {'type': 'BOOLEAN'},
+                'story_potential': {'type': 'STRING'},
+                'abc_suitability': {'type': 'STRING'},
+                'abc_reason': {'type': 'STRING'},
+            },
+            'required': ['video_summary', 'location_name'],
+        },
+    },
+    'required': ['shots', 'meta'],
+}
+
+
 def _run_youtube_analysis(url: str, project_id: str, batch_id: str = None, batch_index: int = 0):
     """Core Gemini YouTube analysis — runs synchronously, safe to call in thread."""
     try:
         video_part = Part.from_uri(uri=url, mime_type="video/mp4")
-        response = model.generate_content(
-            [video_part, YOUTUBE_SHOT_PROMPT],
-            generation_config={"max_output_tokens": 8192, "temperature": 0.1}
-        )
-        raw = clean_ai_response(response.text)
-        data = json.loads(raw)
-    except json.JSONDecodeError:
+        data = generate_json([video_part, YOUTUBE_SHOT_PROMPT], YOUTUBE_ANALYSIS_SCHEMA,
+                             generation_config={"max_output_tokens": 8192, "temperature": 0.1})
+    except JSONGenerationError:
         data = {"shots": [], "meta": {"video_summary": "Parse error", "location_name": "Unknown",
                                        "location_type": "other", "total_shots": 0,
                                        "presenter_on_screen": False, "story_potential": "",
@@ -7099,6 +10378,7 @@ def _run_youtube_analysis(url: str, project_id: str, batch_id: str = None, batch
                 "status": "complete" if completed >= total else "running",
                 "updatedAt": datetime.utcnow().isoformat(),
             })
+            doc_cache.invalidate("youtube_batches", batch_id)
 
     return saved
 
@@ -7138,6 +10418,7 @@ def youtube_batch_analyze():
     })
     batch_id = batch_doc["id"]
 
+    @ai_lane('batch')
     def run_batch():
         for i, url in enumerate(urls):
             try:
@@ -7163,6 +10444,9 @@ def youtube_batch_status(batch_id):
 @app.route("/api/projects/<project_id>/youtube-clips", methods=["GET"])
 def get_youtube_clips(project_id):
     """Get all analyzed YouTube clips for a project."""
+    paged = paged_list_response('youtube_clips', project_id)
+    if paged:
+        return paged
     docs = db.collection(COLLECTIONS["youtube_clips"]) \
               .where("projectId", "==", project_id) \
               .order_by("createdAt") \
@@ -7246,7 +10530,7 @@ Return as JSON:
 }}"""
 
     try:
-        response = model.generate_content(
+        response = coalesced_generate_content(
             scoring_prompt,
             generation_config={"max_output_tokens": 8192, "temperature": 0.2}
         )
@@ -7326,7 +10610,7 @@ def _run_social_analysis(url: str, project_id: str, platform: str, catalog_doc_i
 
     try:
         video_part = Part.from_uri(uri=gcs_uri, mime_type="video/mp4")
-        response = model.generate_content(
+        response = coalesced_generate_content(
             [video_part, YOUTUBE_SHOT_PROMPT],
             generation_config={"max_output_tokens": 8192, "temperature": 0.1}
         )
@@ -7370,6 +10654,7 @@ def _run_social_analysis(url: str, project_id: str, platform: str, catalog_doc_i
 
     if catalog_doc_id:
         db.collection(COLLECTIONS["youtube_clips"]).document(catalog_doc_id).update(clip_doc)
+        doc_cache.invalidate("youtube_clips", catalog_doc_id)
         return {**clip_doc, "id": catalog_doc_id}
 
     return create_doc("youtube_clips", clip_doc)
@@ -7471,6 +10756,7 @@ def _entry_to_url(entry: dict, platform: str) -> str:
     return direct
 
 
+@ai_lane('batch')
 def _process_creator_batch(batch_ref, entries: list, project_id: str, platform: str):
     """
     Background thread: for each scraped entry, download (if needed) → GCS → Gemini analysis → Firestore.
@@ -7949,9 +11235,10 @@ ABANDONED_EPISODES_SEED = [
 
 
 def _seed_episode_planner(project_id: str) -> dict:
-    """Create story cards + episode arrangements from ABANDONED_EPISODES_SEED."""
-    story_card_ids = {}  # slot_key -> firestore_id
+    """Create story cards + episode arrangements from ABANDONED_EPISODES_SEED in one bulk write."""
+    bulk = BulkWrite()
     episode_refs = []
+    story_cards_created = 0
 
     for ep in ABANDONED_EPISODES_SEED:
         slot_ids = {}
@@ -7971,9 +11258,8 @@ def _seed_episode_planner(project_id: str) -> dict:
                 "kevin_url": None,  # linked when YouTube clips are analyzed
                 "created_at": datetime.utcnow().isoformat(),
             }
-            doc_ref = db.collection(COLLECTIONS["story_cards"]).document()
-            doc_ref.set(card)
-            slot_ids[story["slot"]] = doc_ref.id
+            slot_ids[story["slot"]] = bulk.create("story_cards", card)["id"]
+            story_cards_created += 1
 
         arr = {
             "project_id": project_id,
@@ -7994,20 +11280,55 @@ def _seed_episode_planner(project_id: str) -> dict:
             "created_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat(),
         }
-        doc_ref = db.collection(COLLECTIONS["episode_arrangements"]).document()
-        doc_ref.set(arr)
-        episode_refs.append({**arr, "id": doc_ref.id})
+        episode_refs.append(bulk.create("episode_arrangements", arr))
 
-    return {"episodes_created": len(episode_refs), "story_cards_created": sum(len(ep["stories"]) for ep in ABANDONED_EPISODES_SEED)}
+    bulk.commit()
+    return {"episodes_created": len(episode_refs), "story_cards_created": story_cards_created}
 
 
-def _get_story_card(card_id: str) -> dict | None:
-    if not card_id:
-        return None
-    doc = db.collection(COLLECTIONS["story_cards"]).document(card_id).get()
-    if doc.exists:
-        return {**doc.to_dict(), "id": doc.id}
-    return None
+# Per-project story card cache for the planner views: {project_id: (expires_at, {card_id: card})}
+STORY_CARD_CACHE_TTL = 60
+STORY_CARD_BATCH_SIZE = 100
+ARRANGEMENT_SLOTS = ["slot_a", "slot_b", "slot_c", "slot_d"]
+_story_card_cache = {}
+_story_card_cache_lock = threading.Lock()
+
+
+def invalidate_story_card_cache(project_id: str):
+    """Drop cached story cards for a project after cards move or are replaced."""
+    with _story_card_cache_lock:
+        _story_card_cache.pop(project_id, None)
+
+
+def _get_story_cards(project_id: str, card_ids) -> dict:
+    """Fetch many story cards at once: cached ones first, the rest via chunked db.get_all()."""
+    wanted = {cid for cid in card_ids if cid}
+    now = time.monotonic()
+    with _story_card_cache_lock:
+        expires_at, cached = _story_card_cache.get(project_id, (0, {}))
+        if expires_at < now:
+            cached = {}
+        found = {cid: cached[cid] for cid in wanted if cid in cached}
+
+    missing = sorted(wanted - set(found))
+    collection = db.collection(COLLECTIONS["story_cards"])
+    fetched = {}
+    for i in range(0, len(missing), STORY_CARD_BATCH_SIZE):
+        refs = [collection.document(cid) for cid in missing[i:i + STORY_CARD_BATCH_SIZE]]
+        for doc in db.get_all(refs):
+            if doc.exists:
+                fetched[doc.id] = {**doc.to_dict(), "id": doc.id}
+
+    if fetched:
+        with _story_card_cache_lock:
+            expires_at, cached = _story_card_cache.get(project_id, (0, {}))
+            if expires_at < now:
+                cached, expires_at = {}, now + STORY_CARD_CACHE_TTL
+            cached.update(fetched)
+            _story_card_cache[project_id] = (expires_at, cached)
+
+    found.update(fetched)
+    return {cid: dict(card) for cid, card in found.items()}
 
 
 @app.route("/api/projects/<project_id>/seed-episode-planner", methods=["POST"])
@@ -8036,15 +11357,13 @@ def get_episode_arrangements(project_id):
         .order_by("episode_number")
         .stream()
     )
-    result = []
-    for doc in docs:
-        arr = {**doc.to_dict(), "id": doc.id}
-        # Populate story card data for each slot
-        for slot in ["slot_a", "slot_b", "slot_c", "slot_d"]:
+    result = [{**doc.to_dict(), "id": doc.id} for doc in docs]
+    # Populate story card data for each slot in one batched read
+    cards = _get_story_cards(project_id, [arr.get(slot) for arr in result for slot in ARRANGEMENT_SLOTS])
+    for arr in result:
+        for slot in ARRANGEMENT_SLOTS:
             if arr.get(slot):
-                card = _get_story_card(arr[slot])
-                arr[f"{slot}_data"] = card
-        result.append(arr)
+                arr[f"{slot}_data"] = cards.get(arr[slot])
     return jsonify(result)
 
 
@@ -8066,6 +11385,7 @@ def update_episode_arrangement(project_id, ep_num):
     update_data = {k: v for k, v in data.items() if k in ["locked", "title", "theme", "arc", "notes"]}
     update_data["updated_at"] = datetime.utcnow().isoformat()
     doc_ref.update(update_data)
+    doc_cache.invalidate("episode_arrangements", docs[0].id)
     updated = {**docs[0].to_dict(), **update_data, "id": docs[0].id}
     return jsonify(updated)
 
@@ -8119,6 +11439,8 @@ def swap_story_cards(project_id):
     # Perform swap
     from_doc.reference.update({slot_field_from: to_card_id, "updated_at": now})
     to_doc.reference.update({slot_field_to: from_card_id, "updated_at": now})
+    doc_cache.invalidate("episode_arrangements", from_doc.id)
+    doc_cache.invalidate("episode_arrangements", to_doc.id)
 
     # Update story card's current_episode and current_slot fields
     if from_card_id:
@@ -8131,6 +11453,10 @@ def swap_story_cards(project_id):
             "current_episode": from_ep,
             "current_slot": from_slot.upper(),
         })
+    for card_id in (from_card_id, to_card_id):
+        if card_id:
+            doc_cache.invalidate("story_cards", card_id)
+    invalidate_story_card_cache(project_id)
 
     return jsonify({"swapped": True, "from_card": from_card_id, "to_card": to_card_id})
 
@@ -8149,13 +11475,14 @@ def assess_arrangements(project_id):
         return jsonify({"error": "No arrangements found. Seed the planner first."}), 404
 
     # Build a compact summary for the AI
+    arrangements = [doc.to_dict() for doc in docs]
+    cards = _get_story_cards(project_id, [arr.get(s) for arr in arrangements for s in ARRANGEMENT_SLOTS])
     ep_summaries = []
-    for doc in docs:
-        arr = doc.to_dict()
+    for arr in arrangements:
         slots = []
-        for s in ["slot_a", "slot_b", "slot_c", "slot_d"]:
+        for s in ARRANGEMENT_SLOTS:
             if arr.get(s):
-                card = _get_story_card(arr[s])
+                card = cards.get(arr[s])
                 if card:
                     slots.append(f"{s[-1].upper()}: {card['location_name']} ({card['state_country']})")
         ep_summaries.append(
@@ -8178,7 +11505,7 @@ Analyse and provide:
 
 Be direct, editorial, and specific. Reference episode numbers and story names."""
 
-    resp = model.generate_content(prompt)
+    resp = coalesced_generate_content(prompt)
     assessment = resp.text if hasattr(resp, "text") else str(resp)
 
     return jsonify({
@@ -8208,7 +11535,7 @@ def import_script(project_id):
 Your job is to extract everything needed to populate the production workflow — research context, archive requirements, expert contributors, and visual ideas.
 
 SCRIPT:
-{script_text[:50000]}
+{fit_to_budget(script_text)}
 
 Return a JSON object with EXACTLY this structure:
 {{
@@ -8232,7 +11559,7 @@ Return a JSON object with EXACTLY this structure:
 
 Extract AT LEAST 5 research_topics, 5 archive_needs, 3 expert_types, and 5 visual_ideas."""
 
-    resp = model.generate_content(
+    resp = coalesced_generate_content(
         prompt,
         generation_config={"response_mime_type": "application/json"},
     )
@@ -8242,10 +11569,12 @@ Extract AT LEAST 5 research_topics, 5 archive_needs, 3 expert_types, and 5 visua
         extracted = {"error": "Failed to parse script analysis", "raw": resp.text[:500]}
         return jsonify(extracted), 500
 
+    bulk = BulkWrite()
+
     # Save research topics as research documents
     research_saved = []
     for rt in extracted.get("research_topics", []):
-        doc = create_doc("research_documents", {
+        doc = bulk.create("research_documents", {
             "project_id": project_id,
             "topic": rt.get("topic"),
             "why_needed": rt.get("why_needed"),
@@ -8259,7 +11588,7 @@ Extract AT LEAST 5 research_topics, 5 archive_needs, 3 expert_types, and 5 visua
     # Save archive needs as assets
     assets_saved = []
     for an in extracted.get("archive_needs", []):
-        doc = create_doc("assets", {
+        doc = bulk.create("assets", {
             "project_id": project_id,
             "description": an.get("description"),
             "asset_type": an.get("type"),
@@ -8274,7 +11603,7 @@ Extract AT LEAST 5 research_topics, 5 archive_needs, 3 expert_types, and 5 visua
     # Save expert types as interview plans
     interviews_saved = []
     for et in extracted.get("expert_types", []):
-        doc = create_doc("interviews", {
+        doc = bulk.create("interviews", {
             "project_id": project_id,
             "topic": et.get("role"),
             "scene_context": et.get("reason"),
@@ -8288,6 +11617,7 @@ Extract AT LEAST 5 research_topics, 5 archive_needs, 3 expert_types, and 5 visua
         })
         interviews_saved.append(doc)
 
+    bulk.commit()
     return jsonify({
         "episode_summary": extracted.get("episode_summary"),
         "key_facts": extracted.get("key_facts", []),
@@ -8616,9 +11946,13 @@ def import_production_episodes(project_id):
     Replace episodes 1-3 with the actively developed production episodes.
     Moves displaced seed story cards to an unassigned pool (current_episode=None, current_slot='POOL').
     Also imports research summaries, contributors, and visual ideas into the project's collections.
+    All writes go out as one bulk write, new documents first, so a failed import
+    leaves the existing plan untouched.
     """
-    # --- Step 1: Find and move displaced story cards for eps 1-3 to pool ---
-    displaced_count = 0
+    # --- Step 1: Find displaced story cards for eps 1-3 (moved to pool in step 3) ---
+    invalidate_story_card_cache(project_id)
+    displaced_cards = []
+    displaced_arrangements = []
     for ep_num in [1, 2, 3]:
         arr_docs = list(
             db.collection(COLLECTIONS["episode_arrangements"])
@@ -8633,16 +11967,11 @@ def import_production_episodes(project_id):
             for slot_key in ["slot_a", "slot_b", "slot_c", "slot_d"]:
                 card_id = arr.get(slot_key)
                 if card_id:
-                    db.collection(COLLECTIONS["story_cards"]).document(card_id).update({
-                        "current_episode": None,
-                        "current_slot": "POOL",
-                        "updated_at": datetime.utcnow().isoformat(),
-                    })
-                    displaced_count += 1
-            # Delete the old arrangement
-            db.collection(COLLECTIONS["episode_arrangements"]).document(arr_id).delete()
+                    displaced_cards.append(card_id)
+            displaced_arrangements.append(arr_id)
 
     # --- Step 2: Create new story cards and episode arrangements from production data ---
+    bulk = BulkWrite()
     story_cards_created = 0
     episodes_created = 0
     research_saved = 0
@@ -8670,14 +11999,12 @@ def import_production_episodes(project_id):
                 "created_at": datetime.utcnow().isoformat(),
                 "updated_at": datetime.utcnow().isoformat(),
             }
-            doc_ref = db.collection(COLLECTIONS["story_cards"]).document()
-            doc_ref.set(card)
-            slot_ids[story["slot"]] = doc_ref.id
+            slot_ids[story["slot"]] = bulk.create("story_cards", card)["id"]
             story_cards_created += 1
 
             # Save contributors as interview plans
             for c in story.get("contributors", []):
-                create_doc("interviews", {
+                bulk.create("interviews", {
                     "project_id": project_id,
                     "topic": c.get("role"),
                     "scene_context": f"Ep{ep['episode_number']} {story['location_name']} — {c.get('name_suggestion', '')}",
@@ -8694,7 +12021,7 @@ def import_production_episodes(project_id):
 
             # Save visual ideas as assets
             for vi in story.get("visual_ideas", []):
-                create_doc("assets", {
+                bulk.create("assets", {
                     "project_id": project_id,
                     "description": vi.get("description"),
                     "asset_type": vi.get("type"),
@@ -8708,7 +12035,7 @@ def import_production_episodes(project_id):
 
             # Save research summary as a research document
             if story.get("research_summary"):
-                create_doc("research_documents", {
+                bulk.create("research_documents", {
                     "project_id": project_id,
                     "topic": story["location_name"],
                     "why_needed": f"Primary A/B/C/D story for Episode {ep['episode_number']}",
@@ -8723,7 +12050,7 @@ def import_production_episodes(project_id):
         # Save episode structure as a research document
         if ep.get("episode_structure"):
             es = ep["episode_structure"]
-            create_doc("research_documents", {
+            bulk.create("research_documents", {
                 "project_id": project_id,
                 "topic": f"Episode {ep['episode_number']} Structure — {ep['title']}",
                 "why_needed": "Full episode structure and act breakdown",
@@ -8755,15 +12082,26 @@ def import_production_episodes(project_id):
             "created_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat(),
         }
-        arr_ref = db.collection(COLLECTIONS["episode_arrangements"]).document()
-        arr_ref.set(arr)
+        bulk.create("episode_arrangements", arr)
         episodes_created += 1
 
+    # --- Step 3: Move displaced cards to the pool and drop the old arrangements ---
+    for card_id in displaced_cards:
+        bulk.update("story_cards", card_id, {
+            "current_episode": None,
+            "current_slot": "POOL",
+            "updated_at": datetime.utcnow().isoformat(),
+        })
+    for arr_id in displaced_arrangements:
+        bulk.delete("episode_arrangements", arr_id)
+
+    bulk.commit()
+    invalidate_story_card_cache(project_id)
     return jsonify({
         "message": "Production episodes imported successfully",
         "episodes_imported": episodes_created,
         "story_cards_created": story_cards_created,
-        "displaced_to_pool": displaced_count,
+        "displaced_to_pool": len(displaced_cards),
         "research_documents_saved": research_saved,
         "interview_plans_saved": interviews_saved,
         "visual_assets_saved": assets_saved,
@@ -8908,16 +12246,74 @@ def admin_promote_to_prod():
     })
 
 
+@app.route("/api/admin/migrations/project-scope", methods=["POST"])
+def admin_migrate_project_scope():
+    """Start the background projectId backfill. Optional body: {"collections": [...]}."""
+    data = request.get_json(silent=True) or {}
+    names = data.get('collections') or list(COLLECTIONS.keys())
+    unknown = [n for n in names if n not in COLLECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown collections: {', '.join(unknown)}"}), 400
+    if not start_project_scope_migration(names):
+        return jsonify({"error": "Migration already running", "job": _project_scope_job}), 409
+    return jsonify({"status": "started", "job": _project_scope_job}), 202
+
+
+@app.route("/api/admin/migrations/project-scope", methods=["GET"])
+def admin_project_scope_status():
+    """Report the running job and which collections are marked migrated."""
+    migrated = _load_project_scope_state()
+    return jsonify({
+        "job": _project_scope_job,
+        "migrated": sorted(migrated),
+        "pending": sorted(n for n in COLLECTIONS if n not in migrated and n != 'migrations'),
+    })
+
+
+@app.route("/api/admin/cache-stats", methods=["GET"])
+def admin_cache_stats():
+    """Report in-process cache occupancy and hit/miss counters."""
+    return jsonify({"documents": doc_cache.stats(), "config": config_service.stats(),
+                    "models": model_registry.stats(), "ai": ai_cache_stats(),
+                    "coalescing": ai_single_flight.stats(), "gateway": ai_gateway.stats()})
+
+
+@app.route("/api/admin/cache-stats", methods=["DELETE"])
+def admin_clear_caches():
+    """Drop all in-process cache entries."""
+    doc_cache.clear()
+    ai_memory_cache.clear()
+    config_service.invalidate('universal_config')
+    config_service.invalidate('series_config')
+    return jsonify({"success": True})
+
+
+@app.route("/api/admin/ai-metrics", methods=["GET"])
+def admin_ai_metrics():
+    """Per-route AI latency, token and cost report.
+
+    Defaults to this instance since startup; ?hours=N aggregates the flushed
+    metrics of all instances over the last N hours."""
+    try:
+        hours = request.args.get('hours', type=float)
+        if hours:
+            ai_telemetry.flush()
+            return jsonify({**ai_metrics_from_firestore(hours), "routing": model_routing_stats()})
+        return jsonify({**ai_telemetry.snapshot(), "routing": model_routing_stats()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # ============== Style Lab ==============
 
 def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_id=''):
     """Run four-pass Gemini style analysis on a video reference. Safe to call in a thread."""
     try:
         # --- Pass 1: Beat sheet extraction ---
-        update_doc('style_references', reference_id, {'analysis_status': 'pass1_running'})
+        update_doc('style_references', reference_id, {'analysis_status': 'pass1_running'}, return_doc=False)
 
         video_part = Part.from_uri(uri=gcs_uri, mime_type=mime_type)
-        pass1_response = model.generate_content(
+        pass1_response = coalesced_generate_content(
             [video_part, STYLE_LAB_PASS1_PROMPT],
             generation_config={"max_output_tokens": 8192, "temperature": 0.2}
         )
@@ -8927,7 +12323,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
         update_doc('style_references', reference_id, {
             'beat_sheet': beat_sheet,
             'analysis_status': 'pass1_complete',
-        })
+        }, return_doc=False)
 
         # Update batch progress after pass 1
         if batch_id:
@@ -8941,12 +12337,13 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
                     'results': results,
                     'updatedAt': datetime.utcnow().isoformat(),
                 })
+                doc_cache.invalidate('style_batches', batch_id)
 
         # --- Pass 2: Five-pillar deep analysis ---
-        update_doc('style_references', reference_id, {'analysis_status': 'pass2_running'})
+        update_doc('style_references', reference_id, {'analysis_status': 'pass2_running'}, return_doc=False)
 
         pass2_prompt = STYLE_LAB_PASS2_PROMPT.format(beat_sheet_json=json.dumps(beat_sheet, indent=2))
-        pass2_response = model.generate_content(
+        pass2_response = coalesced_generate_content(
             [video_part, pass2_prompt],
             generation_config={"max_output_tokens": 8192, "temperature": 0.2}
         )
@@ -8956,7 +12353,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
         update_doc('style_references', reference_id, {
             'pillars': pillars,
             'analysis_status': 'pass2_complete',
-        })
+        }, return_doc=False)
 
         # Update batch progress after pass 2
         if batch_id:
@@ -8970,12 +12367,13 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
                     'results': results,
                     'updatedAt': datetime.utcnow().isoformat(),
                 })
+                doc_cache.invalidate('style_batches', batch_id)
 
         # --- Pass 3: Content layer (opening, interviews, archive) ---
-        update_doc('style_references', reference_id, {'analysis_status': 'pass3_running'})
+        update_doc('style_references', reference_id, {'analysis_status': 'pass3_running'}, return_doc=False)
 
         pass3_prompt = STYLE_LAB_PASS3_PROMPT.format(beat_sheet_json=json.dumps(beat_sheet, indent=2))
-        pass3_response = model.generate_content(
+        pass3_response = coalesced_generate_content(
             [video_part, pass3_prompt],
             generation_config={"max_output_tokens": 8192, "temperature": 0.2}
         )
@@ -8987,7 +12385,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
         update_doc('style_references', reference_id, {
             'pillars': pillars,
             'analysis_status': 'pass3_complete',
-        })
+        }, return_doc=False)
 
         # Update batch progress after pass 3
         if batch_id:
@@ -9001,17 +12399,17 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
                     'results': results,
                     'updatedAt': datetime.utcnow().isoformat(),
                 })
+                doc_cache.invalidate('style_batches', batch_id)
 
         # --- Pass 4: Production layer (sound, story engine, ad breaks, fingerprint) ---
-        update_doc('style_references', reference_id, {'analysis_status': 'pass4_running'})
+        update_doc('style_references', reference_id, {'analysis_status': 'pass4_running'}, return_doc=False)
 
         # Look up ad break config from series config
         ad_break_config = "No ad break configuration available."
         if series_id:
             try:
-                series_config_doc = db.collection(COLLECTIONS['series_config']).document(series_id).get()
-                if series_config_doc.exists:
-                    sc = series_config_doc.to_dict()
+                sc = config_service.series_config(series_id)
+                if sc:
                     # Check for development brief with ad break info
                     has_ad_breaks = sc.get('has_ad_breaks', False)
                     ad_breaks_per_part = sc.get('ad_breaks_per_part', 0)
@@ -9025,7 +12423,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
             pass3_json=json.dumps(pass3_pillars, indent=2),
             ad_break_config=ad_break_config,
         )
-        pass4_response = model.generate_content(
+        pass4_response = coalesced_generate_content(
             [video_part, pass4_prompt],
             generation_config={"max_output_tokens": 8192, "temperature": 0.2}
         )
@@ -9037,7 +12435,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
         update_doc('style_references', reference_id, {
             'pillars': pillars,
             'analysis_status': 'complete',
-        })
+        }, return_doc=False)
 
         # Update batch progress after pass 4 (final)
         if batch_id:
@@ -9055,6 +12453,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
                     'results': results,
                     'updatedAt': datetime.utcnow().isoformat(),
                 })
+                doc_cache.invalidate('style_batches', batch_id)
 
     except Exception as e:
         print(f"[style-lab] Analysis failed for {reference_id}: {e}")
@@ -9062,7 +12461,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
             update_doc('style_references', reference_id, {
                 'analysis_status': 'error',
                 'analysis_error': str(e),
-            })
+            }, return_doc=False)
         except Exception:
             pass
 
@@ -9082,6 +12481,7 @@ def _run_style_analysis(reference_id, gcs_uri, mime_type, batch_id=None, series_
                         'results': results,
                         'updatedAt': datetime.utcnow().isoformat(),
                     })
+                    doc_cache.invalidate('style_batches', batch_id)
             except Exception:
                 pass
 
@@ -9201,6 +12601,7 @@ def style_lab_analyze():
     })
     batch_id = batch_doc['id']
 
+    @ai_lane('batch')
     def run_batch():
         for ref in refs:
             _run_style_analysis(
@@ -9229,9 +12630,13 @@ def style_lab_batch_status(batch_id):
 @app.route("/api/projects/<project_id>/style-references", methods=["GET"])
 def get_style_references(project_id):
     """List all style references for a project."""
-    docs = db.collection(COLLECTIONS['style_references']) \
-              .where('projectId', '==', project_id) \
-              .stream()
+    fields = list_projection('style_references')
+    query = db.collection(COLLECTIONS['style_references']) \
+              .where('projectId', '==', project_id)
+    paged = paged_list_response('style_references', queries=[query], fields=fields)
+    if paged:
+        return paged
+    docs = _project(query, fields).stream()
     return jsonify([{**d.to_dict(), "id": d.id} for d in docs]), 200
 
 
@@ -9290,7 +12695,8 @@ def put_style_dna(series_id):
         'updatedAt': datetime.utcnow().isoformat(),
     }
 
-    update_doc('series_config', series_id, {'styleDna': style_dna})
+    update_doc('series_config', series_id, {'styleDna': style_dna}, return_doc=False)
+    config_service.invalidate('series_config', series_id)
     return jsonify({"success": True, "styleDna": style_dna}), 200
 
 
@@ -9368,7 +12774,7 @@ Return ONLY valid JSON:
 }}"""
 
     try:
-        response = model.generate_content(
+        response = coalesced_generate_content(
             [composite_prompt],
             generation_config={"max_output_tokens": 4096, "temperature": 0.3}
         )
@@ -9420,7 +12826,7 @@ Provide a detailed, specific answer based on the video content. Reference specif
 
     try:
         video_part = Part.from_uri(uri=gcs_uri, mime_type=mime_type)
-        response = model.generate_content(
+        response = coalesced_generate_content(
             [video_part, drill_prompt],
             generation_config={"max_output_tokens": 4096, "temperature": 0.3}
         )
@@ -9563,6 +12969,30 @@ def transcribe_youtube():
 
 # ============== Episode Fast Track Pipeline ==============
 
+STORY_EXTRACTION_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'stories': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'slot': {'type': 'STRING', 'enum': ['A', 'B', 'C']},
+                    'title': {'type': 'STRING'},
+                    'description': {'type': 'STRING'},
+                    'themes': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+                    'locations': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+                },
+                'required': ['slot', 'title', 'description'],
+            },
+        },
+        'episode_theme': {'type': 'STRING'},
+        'episode_title_suggestion': {'type': 'STRING'},
+    },
+    'required': ['stories', 'episode_theme'],
+}
+
+
 @app.route("/api/ai/extract-stories", methods=["POST"])
 def extract_stories():
     """Extract A/B/C story structure from an episode brief using Gemini 3 Flash."""
@@ -9614,21 +13044,24 @@ Return this exact JSON structure:
 
 If the brief only describes fewer than 3 stories, extract what you can and leave remaining slots with descriptive placeholders based on the theme."""
 
-        flash_model = GenerativeModel("gemini-2.0-flash-001")
-        response = flash_model.generate_content(
-            f"{system_prompt}\n\n{prompt}",
-            generation_config={"response_mime_type": "application/json"}
-        )
-        raw = clean_ai_response(response.text)
-        result = json.loads(raw)
+        result = routed_generate_json('extract_stories', prompt, STORY_EXTRACTION_SCHEMA, system_prompt=system_prompt,
+                                      validators=[lambda v: [] if v.get('stories') else ["no stories extracted"]])
         return jsonify(result), 200
 
-    except json.JSONDecodeError as e:
+    except JSONGenerationError as e:
         return jsonify({"error": f"Failed to parse AI response as JSON: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+DEEP_RESEARCH_SECTIONS = (
+    'EXECUTIVE SUMMARY', 'HISTORICAL TIMELINE', 'KEY CHARACTERS', 'THE DISASTER/SCANDAL',
+    'THE COVER-UP OR AFTERMATH', 'HUMAN COST', 'EXPERT VOICES', 'ARCHIVE SOURCES', 'MODERN PARALLELS',
+    'THE VILLAIN', 'VISUAL OPPORTUNITIES', 'UNANSWERED QUESTIONS', 'WTF MOMENTS', 'PRODUCTION NOTES',
+)
+DEEP_RESEARCH_MIN_WORDS = 1200
+
+
 @app.route("/api/ai/deep-research-fast-track", methods=["POST"])
 def deep_research_fast_track():
     """Deep research for a single story using Gemini + Google Search grounding."""
@@ -9689,16 +13122,13 @@ EPISODE BRIEF CONTEXT:
 
 Generate the full 14-section research document now. Be thorough and specific."""
 
-        # Use Gemini 3.1 Pro with Google Search grounding for live web research
-        research_model = GenerativeModel("gemini-3.1-pro-preview")
-        search_tool = Tool._from_gapic(
-            raw_tool=GapicTool(google_search=GapicTool.GoogleSearch())
-        )
-        response = research_model.generate_content(
-            f"{system_prompt}\n\n{prompt}",
-            tools=[search_tool],
+        # Google Search grounding for live web research; escalates past the fast
+        # tier when sections are missing or the document is thin
+        research_text = routed_generate(
+            'deep_research_fast_track', prompt, system_prompt,
+            validators=[required_sections(*DEEP_RESEARCH_SECTIONS), min_words(DEEP_RESEARCH_MIN_WORDS)],
+            tools=[get_tool('google_search')],
         )
-        research_text = response.text
 
         # Save to Firestore
         research_doc = create_doc('research_documents', {
@@ -9738,37 +13168,40 @@ def master_script_fast_track():
 
         # Load research documents for this episode
         research_docs = get_docs_by_episode('research_documents', episode_id)
-        research_context = ""
-        for doc in research_docs:
-            research_context += f"\n\n--- {doc.get('title', 'Research')} ---\n"
-            research_context += doc.get('content', '')[:8000]
+        sections = [
+            {'kind': 'research', 'title': doc.get('title', 'Research'), 'text': doc.get('content', ''),
+             'date': doc.get('updatedAt') or doc.get('createdAt')}
+            for doc in research_docs
+        ]
 
-        if not research_context.strip():
+        if not any(section['text'].strip() for section in sections):
             return jsonify({"error": "No research documents found for this episode. Run deep research first."}), 400
 
         # Load beat sheet from series config (Abandoned)
         beat_sheet = ""
         try:
-            config_doc = db.collection(COLLECTIONS['series_config']).document('abandoned').get()
-            if config_doc.exists:
-                config_data = config_doc.to_dict()
-                beat_sheet = config_data.get('beat_sheet', '')
+            beat_sheet = config_service.beat_sheet('abandoned')
         except Exception:
             pass
 
         # Load any existing transcripts linked to this episode
-        transcript_context = ""
         try:
             transcripts = db.collection(COLLECTIONS['interview_transcripts']).where(
                 'episodeId', '==', episode_id
             ).stream()
             for t in transcripts:
                 td = t.to_dict()
-                transcript_context += f"\n\n--- Transcript: {td.get('title', 'Unknown')} ---\n"
-                transcript_context += td.get('content', '')[:5000]
+                sections.append({'kind': 'transcript', 'title': f"Transcript: {td.get('title', 'Unknown')}",
+                                 'text': td.get('content', ''), 'date': td.get('updatedAt') or td.get('createdAt')})
         except Exception:
             pass
 
+        # Use the configured script model (defaults to gemini-2.5-pro)
+        script_model_name = AGENT_MODELS.get('script_writer', 'gemini-2.5-pro')
+        packed = pack_context(sections, script_model_name)
+        research_context = packed_text(packed, 'research')
+        transcript_context = packed_text(packed, 'transcript')
+
         system_prompt = f"""You are a master script writer for the documentary series ABANDONED PLACES: UNCOVERED.
 
 You write in the show's distinctive voice: conversational, darkly humorous, emotionally powerful.
@@ -9790,39 +13223,40 @@ EPISODE TITLE: {episode_title}
 EPISODE THEME: {episode_theme}
 
 RESEARCH MATERIAL:
-{research_context[:20000]}
+{research_context}
 
-{'TRANSCRIPT MATERIAL:' + chr(10) + transcript_context[:10000] if transcript_context else ''}
+{'TRANSCRIPT MATERIAL:' + chr(10) + transcript_context if transcript_context else ''}
 
 Generate the FULL master script now. Include all beats from cold open through to the next episode tease.
 Make it production-ready — a producer should be able to hand this to an editor."""
 
-        # Use the configured script model (defaults to gemini-2.5-pro)
-        script_model_name = AGENT_MODELS.get('script_writer', 'gemini-2.5-pro')
-        script_model = GenerativeModel(script_model_name)
-        response = script_model.generate_content(
-            f"{system_prompt}\n\n{prompt}",
-        )
-        script_text = response.text
+        def save_master_script(script_text):
+            script_doc = create_doc('script_versions', {
+                'episodeId': episode_id,
+                'title': f'Master Script — {episode_title}',
+                'content': script_text,
+                'versionNumber': 1,
+                'status': 'draft',
+                'wordCount': len(script_text.split()),
+                'source': 'fast_track_pipeline',
+                'model': script_model_name,
+            })
+            return {
+                "script_id": script_doc['id'],
+                "title": script_doc['title'],
+                "word_count": script_doc['wordCount'],
+                "preview": script_text[:800],
+            }
 
-        # Save to Firestore
-        script_doc = create_doc('script_versions', {
-            'episodeId': episode_id,
-            'title': f'Master Script — {episode_title}',
-            'content': script_text,
-            'versionNumber': 1,
-            'status': 'draft',
-            'wordCount': len(script_text.split()),
-            'source': 'fast_track_pipeline',
-            'model': script_model_name,
-        })
+        if wants_stream():
+            return sse_response(stream_ai_response(prompt, system_prompt, model_name=script_model_name),
+                                on_complete=save_master_script)
 
-        return jsonify({
-            "script_id": script_doc['id'],
-            "title": script_doc['title'],
-            "word_count": script_doc['wordCount'],
-            "preview": script_text[:800],
-        }), 200
+        response = coalesced_generate_content(
+            f"{system_prompt}\n\n{prompt}",
+            model_name=script_model_name,
+        )
+        return jsonify(save_master_script(response.text)), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -9885,6 +13319,7 @@ def mark_notification_read(notif_id):
         'read': True,
         'updatedAt': datetime.utcnow().isoformat(),
     })
+    doc_cache.invalidate('notifications', notif_id)
     return jsonify({"success": True})
 
 
@@ -10118,10 +13553,10 @@ def golden_script_analyze(script_id):
     filename = golden.get('filename', '')
 
     # Update status to analyzing
-    update_doc('golden_scripts', script_id, {'analysisStatus': 'analyzing'})
+    update_doc('golden_scripts', script_id, {'analysisStatus': 'analyzing'}, return_doc=False)
 
     # Use Gemini Pro for deep analysis
-    analysis_model = GenerativeModel(AGENT_MODELS.get('script_writer', 'gemini-2.5-pro'))
+    analysis_model_name = AGENT_MODELS.get('script_writer', 'gemini-2.5-pro')
 
     prompt = f"""You are an expert script analyst for documentary television. You are analyzing a "Golden Script" — the reference episode that defines the style, structure, and format for an entire series.
 
@@ -10212,16 +13647,17 @@ Analyze this script deeply and return a JSON object with EXACTLY this structure:
 Be thorough and specific. Extract real examples from the script text. Count actual scenes, don't estimate."""
 
     try:
-        resp = analysis_model.generate_content(
+        resp = coalesced_generate_content(
             prompt,
             generation_config={"response_mime_type": "application/json"},
+            model_name=analysis_model_name,
         )
         analysis = json.loads(resp.text)
 
         update_doc('golden_scripts', script_id, {
             'analysisStatus': 'complete',
             'analysisResult': analysis,
-        })
+        }, return_doc=False)
 
         return jsonify({
             "id": script_id,
@@ -10232,17 +13668,21 @@ Be thorough and specific. Extract real examples from the script text. Count actu
         update_doc('golden_scripts', script_id, {
             'analysisStatus': 'error',
             'analysisError': str(e),
-        })
+        }, return_doc=False)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/golden-scripts/by-project/<project_id>", methods=["GET"])
 def golden_scripts_by_project(project_id):
     """Get all golden scripts for a project."""
-    docs = db.collection(COLLECTIONS['golden_scripts']) \
+    fields = list_projection('golden_scripts', 'createdAt')
+    paged = paged_list_response('golden_scripts', project_id, descending=True, fields=fields)
+    if paged:
+        return paged
+    query = db.collection(COLLECTIONS['golden_scripts']) \
         .where('projectId', '==', project_id) \
-        .order_by('createdAt', direction=firestore.Query.DESCENDING) \
-        .stream()
+        .order_by('createdAt', direction=firestore.Query.DESCENDING)
+    docs = _project(query, fields).stream()
     results = [doc_to_dict(d) for d in docs]
     return jsonify(results)
 
@@ -10250,10 +13690,10 @@ def golden_scripts_by_project(project_id):
 @app.route("/api/golden-scripts/by-series/<series_id>", methods=["GET"])
 def golden_scripts_by_series(series_id):
     """Get all golden scripts for a series."""
-    docs = db.collection(COLLECTIONS['golden_scripts']) \
+    query = db.collection(COLLECTIONS['golden_scripts']) \
         .where('seriesId', '==', series_id) \
-        .order_by('createdAt', direction=firestore.Query.DESCENDING) \
-        .stream()
+        .order_by('createdAt', direction=firestore.Query.DESCENDING)
+    docs = _project(query, list_projection('golden_scripts', 'createdAt')).stream()
     results = [doc_to_dict(d) for d in docs]
     return jsonify(results)
 
@@ -10307,6 +13747,8 @@ def save_script_profile(series_id):
             'createdAt': datetime.utcnow().isoformat(),
             'updatedAt': datetime.utcnow().isoformat(),
         })
+    config_service.invalidate('series_config', series_id)
+    doc_cache.invalidate('series_config', series_id)
 
     return jsonify({"success": True, "seriesId": series_id})
 
@@ -10355,6 +13797,9 @@ def save_beat_sheet():
 @app.route("/api/beat-sheets/by-project/<project_id>", methods=["GET"])
 def beat_sheets_by_project(project_id):
     """Get all beat sheets for a project."""
+    paged = paged_list_response('beat_sheets', project_id, descending=True)
+    if paged:
+        return paged
     docs = db.collection(COLLECTIONS['beat_sheets']) \
         .where('projectId', '==', project_id) \
         .order_by('createdAt', direction=firestore.Query.DESCENDING) \
@@ -10372,6 +13817,37 @@ def beat_sheet_get(sheet_id):
     return jsonify(doc)
 
 
+BEAT_SHEET_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'beats': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'id': {'type': 'STRING'},
+                    'reference': {'type': 'STRING'},
+                    'title': {'type': 'STRING'},
+                    'description': {'type': 'STRING'},
+                    'type': {'type': 'STRING'},
+                    'duration_estimate_seconds': {'type': 'NUMBER'},
+                    'research_notes': {'type': 'STRING'},
+                    'archive_reference': {'type': 'STRING'},
+                    'order': {'type': 'INTEGER'},
+                },
+                'required': ['title', 'description'],
+            },
+        },
+        'commentary': {'type': 'STRING'},
+        'total_duration_estimate': {'type': 'NUMBER'},
+        'viability_note': {'type': 'STRING'},
+        'suggested_followups': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+        'research_gaps': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+    },
+    'required': ['beats'],
+}
+
+
 @app.route("/api/ai/generate-beat-sheet", methods=["POST"])
 def generate_beat_sheet():
     """Generate or refine a beat sheet using Gemini 2.5 Pro with Google Search grounding."""
@@ -10411,9 +13887,8 @@ This is the benchmark. Every beat sheet you create must match this standard.
         series_context = ""
         if series_id:
             try:
-                config_doc = db.collection(COLLECTIONS['series_config']).document(series_id).get()
-                if config_doc.exists:
-                    config_data = config_doc.to_dict()
+                config_data = config_service.series_config(series_id)
+                if config_data:
                     series_name = config_data.get('name', series_id)
                     series_context = f"""
 == SERIES BIBLE ==
@@ -10518,39 +13993,17 @@ Generate the initial beat sheet now. Create 8-12 beats that cover the full episo
 
         full_prompt = "\n".join(prompt_parts)
 
-        # Use Gemini 3.1 Pro with Google Search grounding
-        beat_model = GenerativeModel("gemini-3.1-pro-preview")
-        search_tool = Tool._from_gapic(
-            raw_tool=GapicTool(google_search=GapicTool.GoogleSearch())
-        )
-        response = beat_model.generate_content(
-            f"{system_prompt}\n\n{full_prompt}",
-            tools=[search_tool],
-        )
-        response_text = response.text
-
-        # Clean and parse JSON response
-        cleaned = response_text.strip()
-        if cleaned.startswith("```json"):
-            cleaned = cleaned[7:]
-        if cleaned.startswith("```"):
-            cleaned = cleaned[3:]
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
-
+        # Google Search grounding; escalates to the grounded pro model if the beat sheet is thin
         try:
-            result = json.loads(cleaned)
-        except json.JSONDecodeError:
-            # Try to extract JSON from the response
-            json_match = re.search(r'\{[\s\S]*\}', cleaned)
-            if json_match:
-                result = json.loads(json_match.group())
-            else:
-                return jsonify({
-                    "error": "Failed to parse AI response as JSON",
-                    "raw_response": response_text[:2000]
-                }), 500
+            result = routed_generate_json(
+                'generate_beat_sheet', full_prompt, BEAT_SHEET_SCHEMA, system_prompt=system_prompt,
+                tools=[get_tool('google_search')],
+                validators=[lambda v: [] if len(v.get('beats', [])) >= 3 else ["fewer than 3 beats"]])
+        except JSONGenerationError as e:
+            return jsonify({
+                "error": "Failed to parse AI response as JSON",
+                "raw_response": e.text[:2000]
+            }), 500
 
         # Ensure required fields exist
         if 'beats' not in result:
@@ -10583,6 +14036,14 @@ try:
 except Exception as _e:
     print(f"[startup] Could not auto-seed users: {_e}")
 
+# Resume swarm jobs orphaned by a crash or redeploy
+if SWARM_RESUME_ON_STARTUP:
+    threading.Thread(target=resume_stale_swarm_jobs, daemon=True).start()
+
+# Periodically persist AI call metrics
+if AI_TELEMETRY_FLUSH_SECONDS > 0:
+    threading.Thread(target=_flush_ai_telemetry_forever, daemon=True).start()
+
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
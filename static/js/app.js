@@ -1423,13 +1423,62 @@
             `);
 
             try {
-                const result = await api('/api/ai/script-swarm', 'POST', {
+                const job = await api('/api/ai/script-swarm', 'POST', {
                     episodeId: state.selectedEpisode
                 });
+                if (job.error) throw new Error(job.error);
+                await pollScriptSwarm(job);
+            } catch (error) {
+                showModal('Error', `<p class="text-red-400">${error.message}</p>`);
+            }
+        }
 
-                await loadEpisodeWorkspace(state.selectedEpisode);
-                closeModal();
-                render();
+        // The swarm runs as a background job — poll until it finishes. Give up after
+        // a few stale periods or repeated failed status requests and offer a resume.
+        async function pollScriptSwarm(job) {
+            const deadline = Date.now() + 4 * (job.staleAfterSeconds || 300) * 1000;
+            let status = job;
+            let failures = 0;
+            while (status.status !== 'completed' && status.status !== 'failed') {
+                if (Date.now() > deadline || failures >= 5) {
+                    showModal('Script Swarm Stalled', `
+                        <p class="text-red-400 mb-4">${failures >= 5 ? 'The job status could not be loaded.' : 'The script swarm is taking longer than expected.'}</p>
+                        <button onclick="resumeScriptSwarm('${job.jobId}')" class="bg-[#1a73e8] hover:bg-[#1557b0] text-white font-bold py-2 px-4 rounded-lg transition">Resume Job</button>
+                    `);
+                    return;
+                }
+                await new Promise(resolve => setTimeout(resolve, 3000));
+                try {
+                    const next = await api(job.statusUrl);
+                    if (next.status) {
+                        status = next;
+                        failures = 0;
+                    } else {
+                        failures++;
+                    }
+                } catch (error) {
+                    failures++;
+                }
+            }
+            if (status.status === 'failed') throw new Error(status.error || 'Script swarm failed');
+
+            await loadEpisodeWorkspace(state.selectedEpisode);
+            closeModal();
+            render();
+        }
+
+        async function resumeScriptSwarm(jobId) {
+            showModal('AI Script Swarm', `
+                <div class="text-center py-8">
+                    <div class="text-4xl mb-4">🤖</div>
+                    <p class="text-white font-bold mb-2">Resuming Agent Swarm</p>
+                </div>
+            `);
+            try {
+                // 409 means the job is still running or already complete; keep polling it either way
+                const job = await api(`/api/ai/script-swarm/${jobId}/resume`, 'POST');
+                if (job.error && !job.status) throw new Error(job.error);
+                await pollScriptSwarm({ ...job, jobId, statusUrl: `/api/ai/script-swarm/${jobId}` });
             } catch (error) {
                 showModal('Error', `<p class="text-red-400">${error.message}</p>`);
             }
@@ -17,10 +17,13 @@ os.environ['GCP_PROJECT_ID'] = 'test-project'
 @pytest.fixture
 def mock_firestore():
     """Mock Firestore client."""
+    from app import doc_cache
+    doc_cache.clear()
     with patch('app.db') as mock_db:
         mock_collection = MagicMock()
         mock_db.collection.return_value = mock_collection
         yield mock_db
+    doc_cache.clear()
 
 
 @pytest.fixture
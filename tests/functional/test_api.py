@@ -134,19 +134,17 @@ class TestProjectsAPI:
         assert response.status_code == 200
         mock_update.assert_called_once()
 
-    @patch('app.db')
-    @patch('app.delete_doc')
-    def test_delete_project(self, mock_delete, mock_db, app_client):
-        """Test DELETE /api/projects/<id> deletes a project."""
-        # Mock Firestore collection operations
-        mock_collection = MagicMock()
-        mock_collection.where.return_value.stream.return_value = iter([])
-        mock_db.collection.return_value = mock_collection
-        mock_delete.return_value = None
+    @patch('app.get_doc')
+    @patch('app.start_project_delete')
+    def test_delete_project(self, mock_start, mock_get, app_client):
+        """Test DELETE /api/projects/<id> starts a background cascade delete."""
+        mock_get.return_value = {'id': 'test-project-1', 'name': 'Test'}
+        mock_start.return_value = {'projectId': 'test-project-1', 'status': 'running'}
 
         response = app_client.delete('/api/projects/test-project-1')
 
-        assert response.status_code == 200
+        assert response.status_code == 202
+        mock_start.assert_called_once_with('test-project-1')
 
 
 class TestEpisodesAPI:
@@ -184,10 +182,10 @@ class TestEpisodesAPI:
         assert response.status_code == 201
         assert 'id' in data
 
-    @patch('app.update_doc')
+    @patch('app.update_episode_doc')
     def test_update_episode(self, mock_update, app_client):
         """Test PUT /api/episodes/<id> updates an episode."""
-        mock_update.return_value = None
+        mock_update.return_value = {'id': 'test-episode-1', 'title': 'Updated Title'}
 
         response = app_client.put('/api/episodes/test-episode-1',
             data=json.dumps({'title': 'Updated Title'}),
@@ -195,6 +193,7 @@ class TestEpisodesAPI:
         )
 
         assert response.status_code == 200
+        assert json.loads(response.data)['title'] == 'Updated Title'
 
 
 class TestResearchAPI:
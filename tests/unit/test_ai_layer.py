@@ -0,0 +1,1010 @@
+"""
+Unit tests for the AI orchestration helpers in app.py
+"""
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def _task(task_id, agent_type):
+    return {'id': task_id, 'agentType': agent_type, 'inputData': {}}
+
+
+class TestSwarmSpecialists:
+    """Tests for concurrent specialist execution in the script swarm."""
+
+    @patch('app.update_agent_task')
+    @patch('app.generate_ai_response')
+    def test_specialists_run_concurrently(self, mock_generate, mock_update):
+        """Test all three specialists are in flight at the same time."""
+        from app import run_swarm_specialists
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        def generate(prompt, system_prompt, model_name=None):
+            barrier.wait()
+            return f'analysis for {prompt}'
+        mock_generate.side_effect = generate
+
+        specialists = [
+            (_task('t1', 'research_specialist'), 'research', 'sys', None),
+            (_task('t2', 'archive_specialist'), 'archive', 'sys', None),
+            (_task('t3', 'interview_producer'), 'interviews', 'sys', None),
+        ]
+        results = run_swarm_specialists(specialists, timeout=5)
+
+        assert results == {
+            'research_specialist': 'analysis for research',
+            'archive_specialist': 'analysis for archive',
+            'interview_producer': 'analysis for interviews',
+        }
+        statuses = [c.args[1] for c in mock_update.call_args_list]
+        assert statuses.count('in_progress') == 3
+        assert statuses.count('completed') == 3
+
+    @patch('app.update_agent_task')
+    @patch('app.generate_ai_response')
+    def test_slow_agent_times_out_without_blocking_others(self, mock_generate, mock_update):
+        """Test a slow specialist is marked failed and the others still return."""
+        from app import run_swarm_specialists
+
+        release = threading.Event()
+
+        def generate(prompt, system_prompt, model_name=None):
+            if prompt == 'archive':
+                release.wait(5)
+            return 'ok'
+        mock_generate.side_effect = generate
+
+        specialists = [
+            (_task('t1', 'research_specialist'), 'research', 'sys', None),
+            (_task('t2', 'archive_specialist'), 'archive', 'sys', None),
+        ]
+        try:
+            results = run_swarm_specialists(specialists, timeout=0.2)
+        finally:
+            release.set()
+
+        assert results['research_specialist'] == 'ok'
+        assert 'timed out' in results['archive_specialist']
+        failed = [c for c in mock_update.call_args_list if c.args[:2] == ('t2', 'failed')]
+        assert len(failed) == 1
+
+    @patch('app.update_agent_task')
+    @patch('app.generate_ai_response')
+    def test_abandoned_agent_skips_model_call(self, mock_generate, mock_update):
+        """Test an agent that times out before reaching the model never calls it and ends failed."""
+        from app import run_swarm_specialists
+
+        abandoned = threading.Event()
+        finished = threading.Event()
+
+        def update(task_id, status, *args, **kwargs):
+            if status == 'in_progress':
+                abandoned.wait(5)  # the timeout fires while this write is in flight
+            elif status == 'failed':
+                abandoned.set()
+                if mock_update.call_count == 3:
+                    finished.set()
+        mock_update.side_effect = update
+
+        results = run_swarm_specialists([(_task('t1', 'research_specialist'), 'p', 's', None)], timeout=0.1)
+
+        assert finished.wait(5)
+        assert 'timed out' in results['research_specialist']
+        mock_generate.assert_not_called()
+        assert mock_update.call_args.args[:2] == ('t1', 'failed')
+
+    @patch('app.update_agent_task')
+    @patch('app.generate_ai_response')
+    def test_agent_error_is_recorded(self, mock_generate, mock_update):
+        """Test a failing specialist records the error and returns an error note."""
+        from app import run_swarm_specialists
+
+        mock_generate.side_effect = RuntimeError('quota exceeded')
+
+        results = run_swarm_specialists([(_task('t1', 'research_specialist'), 'p', 's', None)], timeout=5)
+
+        assert results['research_specialist'].startswith('Error:')
+        mock_update.assert_any_call('t1', 'failed', None, error='quota exceeded', return_doc=False)
+
+
+class TestSwarmJobs:
+    """Tests for background, resumable script swarm jobs."""
+
+    def _ctx(self):
+        return {'universal_rules': 'rules', 'script_format': '2-column', 'commentary_format': 'vo',
+                'series_bible': '', 'episode_brief': {}, 'contexts': {
+                    'research_specialist': 'r', 'archive_specialist': 'a', 'interview_producer': 'i'}}
+
+    def test_stale_detection(self):
+        """Test a job is stale only once its heartbeat is older than the threshold."""
+        from app import _swarm_job_is_stale, SWARM_JOB_STALE_SECONDS
+        from datetime import datetime, timedelta
+
+        fresh = datetime.utcnow().isoformat()
+        old = (datetime.utcnow() - timedelta(seconds=SWARM_JOB_STALE_SECONDS + 5)).isoformat()
+
+        assert not _swarm_job_is_stale({'heartbeatAt': fresh})
+        assert _swarm_job_is_stale({'heartbeatAt': old})
+        assert _swarm_job_is_stale({})
+
+    @patch('app.start_swarm_heartbeat')
+    @patch('app._swarm_owned_write')
+    @patch('app.update_agent_task')
+    @patch('app.create_agent_task')
+    @patch('app.generate_ai_response')
+    @patch('app.run_swarm_specialists')
+    @patch('app._swarm_context')
+    @patch('app.get_doc')
+    def test_resume_skips_completed_agents(self, mock_get, mock_ctx, mock_specialists, mock_generate,
+                                           mock_create, mock_update_task, mock_owned, mock_heartbeat):
+        """Test a resumed job reuses checkpointed specialist and writer output."""
+        from app import run_script_swarm_job
+
+        tasks = {
+            'task-r': {'status': 'completed', 'outputData': {'analysis': 'R'}},
+            'task-a': {'status': 'completed', 'outputData': {'analysis': 'A'}},
+            'task-i': {'status': 'completed', 'outputData': {'analysis': 'I'}},
+            'task-w': {'status': 'completed', 'outputData': {'script': 'SCRIPT'}},
+            'task-f': {'status': 'in_progress'},
+        }
+        mock_get.side_effect = lambda coll, doc_id: (
+            {'id': doc_id, 'title': 'Ep'} if coll == 'episodes' else tasks.get(doc_id))
+        mock_ctx.return_value = self._ctx()
+        mock_create.return_value = {'id': 'task-f2'}
+        mock_generate.return_value = 'FACTS'
+
+        run_script_swarm_job({'id': 'job-1', 'episodeId': 'ep-1', 'agentTasks': {
+            'research_specialist': 'task-r', 'archive_specialist': 'task-a',
+            'interview_producer': 'task-i', 'script_writer': 'task-w', 'fact_checker': 'task-f'}})
+
+        mock_specialists.assert_not_called()
+        assert mock_generate.call_count == 1
+        assert 'SCRIPT' in mock_generate.call_args.args[0]
+        mock_update_task.assert_any_call('task-f', 'failed', error='Superseded by resumed swarm job',
+                                         return_doc=False)
+        mock_update_task.assert_any_call('task-f2', 'completed', {'verification': 'FACTS'}, return_doc=False)
+        job_id, updates = mock_owned.call_args.args
+        assert job_id == 'job-1' and updates['status'] == 'completed'
+        [(collection_name, version_id, version)] = mock_owned.call_args.kwargs['creates']
+        assert (collection_name, version_id, version['content']) == ('script_versions', 'job-1', 'SCRIPT')
+        assert mock_heartbeat.return_value.set.called
+
+    @patch('app.start_swarm_heartbeat')
+    @patch('app._swarm_owned_write')
+    @patch('app.update_agent_task')
+    @patch('app.create_agent_task')
+    @patch('app.run_swarm_specialists')
+    @patch('app._swarm_context')
+    @patch('app.get_doc')
+    def test_lost_ownership_stops_without_recording(self, mock_get, mock_ctx, mock_specialists, mock_create,
+                                                    mock_update_task, mock_owned, mock_heartbeat):
+        """Test a runner whose job was re-claimed elsewhere stops and leaves the job doc alone."""
+        from app import run_script_swarm_job, SwarmJobLost
+
+        mock_get.side_effect = lambda coll, doc_id: {'id': doc_id} if coll == 'episodes' else None
+        mock_ctx.return_value = self._ctx()
+        mock_create.side_effect = lambda *args: {'id': f'task-{mock_create.call_count}'}
+        mock_owned.side_effect = SwarmJobLost('owned by other')
+
+        with patch('app._swarm_specialist_prompts', return_value=('t', {}, 'p', 's')):
+            run_script_swarm_job({'id': 'job-2', 'episodeId': 'ep-1'})
+
+        mock_specialists.assert_not_called()
+        assert mock_owned.call_count == 1  # the checkpoint; no failure write
+        assert not any(c.args[0] == 'job-2' for c in mock_update_task.call_args_list)
+
+    def test_owned_write_rejects_other_worker(self, mock_firestore):
+        """Test the ownership check raises instead of writing when workerId has changed."""
+        from app import _swarm_owned_write, SwarmJobLost, SWARM_INSTANCE_ID
+
+        job_ref = mock_firestore.collection.return_value.document.return_value
+        job_ref.get.return_value.exists = True
+        job_ref.get.return_value.to_dict.return_value = {'workerId': 'other-instance'}
+        transaction = mock_firestore.transaction.return_value
+
+        with patch('app.firestore.transactional', lambda fn: fn):
+            with pytest.raises(SwarmJobLost):
+                _swarm_owned_write('job-3', {'stage': 'fact_checker'})
+            transaction.update.assert_not_called()
+
+            job_ref.get.return_value.to_dict.return_value = {'workerId': SWARM_INSTANCE_ID}
+            _swarm_owned_write('job-3', {'stage': 'fact_checker'})
+        assert transaction.update.call_args.args[1]['stage'] == 'fact_checker'
+
+    @patch('app._swarm_job_executor')
+    @patch('app.start_swarm_heartbeat')
+    @patch('app.claim_swarm_job')
+    def test_heartbeat_starts_at_claim(self, mock_claim, mock_heartbeat, mock_executor):
+        """Test a queued job is heartbeated from claim time, not from when it starts running."""
+        from app import submit_script_swarm_job, run_script_swarm_job
+
+        mock_claim.return_value = {'id': 'job-4', 'episodeId': 'ep-1'}
+
+        submit_script_swarm_job('job-4')
+
+        mock_heartbeat.assert_called_once_with('job-4')
+        mock_executor.submit.assert_called_once_with(
+            run_script_swarm_job, mock_claim.return_value, mock_heartbeat.return_value)
+
+    @patch('app.submit_script_swarm_job')
+    @patch('app.get_doc')
+    def test_status_resubmits_stale_job(self, mock_get, mock_submit):
+        """Test polling an orphaned job hands it to a new worker instead of waiting for a restart."""
+        from app import app, ai_script_swarm_status
+
+        mock_get.return_value = {'id': 'job-5', 'taskType': 'script_swarm', 'status': 'in_progress',
+                                 'heartbeatAt': '2020-01-01T00:00:00'}
+        mock_submit.return_value = {**mock_get.return_value, 'workerId': 'me'}
+
+        with app.test_request_context('/api/ai/script-swarm/job-5'):
+            with patch('app.swarm_job_status', side_effect=lambda job: {'status': job['status']}):
+                ai_script_swarm_status('job-5')
+
+        mock_submit.assert_called_once_with('job-5')
+
+    @patch('app.time.sleep')
+    @patch('app.get_doc')
+    def test_events_stream_ends_at_max_duration(self, mock_get, mock_sleep):
+        """Test an events connection for a job that never finishes is closed with a final done event."""
+        from app import app, ai_script_swarm_events
+        from datetime import datetime
+
+        mock_get.return_value = {'id': 'job-6', 'taskType': 'script_swarm', 'status': 'in_progress',
+                                 'stage': 'script_writer', 'heartbeatAt': datetime.utcnow().isoformat()}
+        with patch('app.SWARM_EVENTS_MAX_SECONDS', 0), \
+                patch('app.swarm_job_status', side_effect=lambda job: {'status': job['status']}):
+            with app.test_request_context('/api/ai/script-swarm/job-6/events'):
+                body = ai_script_swarm_events('job-6').get_data(as_text=True)
+
+        assert 'event: stage' in body
+        assert 'event: done' in body and '"streamTimedOut": true' in body
+
+
+class TestStreaming:
+    """Tests for Server-Sent Events streaming of AI generations."""
+
+    def _chunk(self, text):
+        chunk = MagicMock()
+        if text is None:
+            type(chunk).text = property(lambda self: (_ for _ in ()).throw(ValueError('no text')))
+        else:
+            chunk.text = text
+        return chunk
+
+    @patch('app.model')
+    def test_stream_skips_chunks_without_text(self, mock_model):
+        """Test finish-reason-only chunks are skipped instead of raising."""
+        from app import stream_ai_response
+
+        mock_model.generate_content.return_value = iter(
+            [self._chunk('SCENE 1'), self._chunk(None), self._chunk(': OPEN')])
+
+        assert list(stream_ai_response('prompt')) == ['SCENE 1', ': OPEN']
+        assert mock_model.generate_content.call_args.kwargs['stream'] is True
+
+    def test_sse_response_emits_chunks_then_done(self):
+        """Test text is relayed as chunk events and the completed text is persisted once."""
+        from app import app, sse_response
+
+        saved = []
+        with app.test_request_context('/api/chat?stream=1'):
+            response = sse_response(iter(['Hello ', 'world']),
+                                    on_complete=lambda text: saved.append(text) or {'scriptId': 's1'})
+            body = response.get_data(as_text=True)
+
+        assert response.mimetype == 'text/event-stream'
+        assert body.index('event: chunk\ndata: {"text": "Hello "}') < body.index('event: done')
+        assert 'data: {"scriptId": "s1"}' in body
+        assert saved == ['Hello world']
+
+    def test_sse_response_reports_errors(self):
+        """Test a generation failure mid-stream ends with an error event and nothing persisted."""
+        from app import app, sse_response
+
+        def chunks():
+            yield 'partial'
+            raise RuntimeError('AI generation failed: quota')
+
+        saved = []
+        with app.test_request_context('/'):
+            body = sse_response(chunks(), on_complete=saved.append).get_data(as_text=True)
+
+        assert 'event: error' in body
+        assert 'event: done' not in body
+        assert saved == []
+
+
+class TestModelRegistry:
+    """Tests for the shared GenerativeModel/Tool registry."""
+
+    @patch('app.GenerativeModel')
+    def test_builds_each_model_once(self, mock_model_cls):
+        """Test repeated lookups share one GenerativeModel per name."""
+        from app import ModelRegistry
+
+        mock_model_cls.side_effect = lambda name, **kwargs: MagicMock(name=name)
+        registry = ModelRegistry()
+
+        first = registry.model('gemini-pro-test')
+        second = registry.model('gemini-pro-test')
+        other = registry.model('gemini-flash-test')
+
+        assert first is second
+        assert other is not first
+        assert mock_model_cls.call_count == 2
+
+    @patch('app.model')
+    def test_default_model_is_the_global_model(self, mock_model):
+        """Test no name (or the default name) resolves to the module-level model."""
+        from app import ModelRegistry, MODEL_NAME
+
+        registry = ModelRegistry()
+
+        assert registry.model() is mock_model
+        assert registry.model(MODEL_NAME) is mock_model
+
+    def test_tools_are_built_once(self):
+        """Test grounding tools are shared across calls."""
+        from app import ModelRegistry
+
+        builder = MagicMock(side_effect=lambda: object())
+        registry = ModelRegistry()
+        with patch.dict('app.AI_TOOL_BUILDERS', {'google_search': builder}):
+            assert registry.tool('google_search') is registry.tool('google_search')
+        builder.assert_called_once()
+
+
+class TestAIResponseCache:
+    """Tests for the content-addressed AI response cache."""
+
+    def _snapshot(self, data):
+        snap = MagicMock()
+        snap.exists = data is not None
+        snap.to_dict.return_value = data
+        return snap
+
+    @patch('app.generate_ai_response')
+    def test_memory_hit_skips_model(self, mock_generate, mock_firestore):
+        """Test an identical second request is served without a model call."""
+        from app import cached_ai_response, ai_memory_cache
+
+        ai_memory_cache.clear()
+        mock_generate.return_value = '{"shots": []}'
+        mock_firestore.collection.return_value.document.return_value.get.return_value = self._snapshot(None)
+
+        first = cached_ai_response('analyze this clip', template='analyze_clip')
+        second = cached_ai_response('analyze this clip', template='analyze_clip')
+
+        assert first == second == '{"shots": []}'
+        mock_generate.assert_called_once()
+
+    @patch('app.generate_ai_response')
+    def test_firestore_tier_hit_and_expiry(self, mock_generate, mock_firestore):
+        """Test live Firestore entries are reused and expired ones regenerated."""
+        from app import cached_ai_response, ai_memory_cache
+        from datetime import datetime, timedelta
+
+        ref = mock_firestore.collection.return_value.document.return_value
+        ai_memory_cache.clear()
+        ref.get.return_value = self._snapshot(
+            {'text': 'cached', 'expiresAt': datetime.utcnow() + timedelta(hours=1)})
+        assert cached_ai_response('p', template='interview_plan') == 'cached'
+        mock_generate.assert_not_called()
+
+        ai_memory_cache.clear()
+        ref.get.return_value = self._snapshot(
+            {'text': 'stale', 'expiresAt': datetime.utcnow() - timedelta(hours=1)})
+        mock_generate.return_value = 'fresh'
+        assert cached_ai_response('p', template='interview_plan') == 'fresh'
+        assert ref.set.call_args.args[0]['text'] == 'fresh'
+
+    @patch('app.generate_ai_response')
+    def test_no_cache_bypasses_lookup(self, mock_generate, mock_firestore):
+        """Test noCache regenerates even when an entry exists, and refreshes it."""
+        from app import cached_ai_response, ai_memory_cache
+
+        ai_memory_cache.clear()
+        ai_memory_cache.put('ai', 'unused', {'text': 'x'})
+        mock_generate.side_effect = ['one', 'two']
+        mock_firestore.collection.return_value.document.return_value.get.return_value = self._snapshot(None)
+
+        cached_ai_response('p', template='generate_broll')
+        result = cached_ai_response('p', template='generate_broll', no_cache=True)
+
+        assert result == 'two'
+        assert cached_ai_response('p', template='generate_broll') == 'two'
+
+    def test_key_covers_model_config_and_template_version(self):
+        """Test any input that changes the response changes the key."""
+        from app import ai_cache_key
+
+        base = ai_cache_key('p', 's', 'm', {'temperature': 0.3}, 'analyze_clip')
+
+        assert base == ai_cache_key('p', 's', 'm', {'temperature': 0.3}, 'analyze_clip')
+        assert base != ai_cache_key('p', 's', 'other', {'temperature': 0.3}, 'analyze_clip')
+        assert base != ai_cache_key('p', 's', 'm', {'temperature': 0.5}, 'analyze_clip')
+        with patch.dict('app.AI_PROMPT_VERSIONS', {'analyze_clip': 2}):
+            assert base != ai_cache_key('p', 's', 'm', {'temperature': 0.3}, 'analyze_clip')
+
+    def test_stats_counters_are_thread_safe(self):
+        """Test concurrent lookups from request and worker threads don't lose counts."""
+        from app import _count_ai_cache, ai_cache_stats
+
+        before = ai_cache_stats()['bypassed']
+
+        def count():
+            for _ in range(2000):
+                _count_ai_cache('bypassed')
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert ai_cache_stats()['bypassed'] - before == 16000
+
+
+class TestRequestCoalescing:
+    """Tests for single-flight coalescing of identical AI requests."""
+
+    def _run_concurrently(self, fn, count):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(fn())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for t in threads:
+            t.start()
+        return threads, results, errors
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        """Test followers wait for the in-flight call and share its result."""
+        from app import SingleFlight
+
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return 'shared'
+
+        threads, results, errors = self._run_concurrently(lambda: flight.do('k', slow), 4)
+        while flight.stats()['shared'] < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        assert calls == [1]
+        assert results == ['shared'] * 4 and not errors
+        assert flight.stats()['inFlight'] == 0
+
+    def test_error_propagates_to_waiters_and_is_not_kept(self):
+        """Test a failed call raises for every waiter and the next call retries."""
+        from app import SingleFlight
+
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def failing():
+            release.wait(5)
+            raise RuntimeError('quota')
+
+        threads, results, errors = self._run_concurrently(lambda: flight.do('k', failing), 3)
+        while flight.stats()['shared'] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        assert len(errors) == 3 and not results
+        assert flight.do('k', lambda: 'ok') == 'ok'
+
+    def test_request_key_distinguishes_model_and_config(self):
+        """Test only requests with identical model, contents and config coalesce."""
+        from app import ai_request_key
+
+        base = ai_request_key('p', None, generation_config={'temperature': 0.2})
+
+        assert base == ai_request_key('p', None, generation_config={'temperature': 0.2})
+        assert base != ai_request_key('p', 'gemini-2.5-pro-other', generation_config={'temperature': 0.2})
+        assert base != ai_request_key('p', None, generation_config={'temperature': 0.9})
+        assert base != ai_request_key(['p', b'video-bytes'], None, generation_config={'temperature': 0.2})
+
+    def test_generate_ai_response_goes_through_coalescing(self, mock_vertex_ai):
+        """Test generate_ai_response calls the model via the single-flight group."""
+        from app import generate_ai_response, ai_single_flight
+
+        before = ai_single_flight.stats()['calls']
+
+        assert generate_ai_response('hello', 'sys') == 'Test AI response'
+        mock_vertex_ai.generate_content.assert_called_once_with('sys\n\nhello', generation_config={})
+        assert ai_single_flight.stats()['calls'] == before + 1
+
+
+class TestAIGateway:
+    """Tests for the rate-limited, adaptive AI gateway."""
+
+    @patch('app.time.sleep')
+    def test_retries_rate_limited_calls_and_halves_limit(self, mock_sleep):
+        """Test a 429 is retried with backoff and shrinks the concurrency limit."""
+        from app import AIGateway
+        from google.api_core import exceptions as gcp_exceptions
+
+        gateway = AIGateway()
+        fn = MagicMock(side_effect=[gcp_exceptions.ResourceExhausted('quota'), 'ok'])
+
+        assert gateway.call('m', fn) == 'ok'
+        assert fn.call_count == 2
+        mock_sleep.assert_called_once()
+        stats = gateway.stats()['m']
+        assert stats['rateLimited'] == 1 and stats['retries'] == 1
+        assert stats['limit'] < 4 and stats['inFlight'] == 0
+
+    def test_non_transient_errors_are_not_retried(self):
+        """Test invalid requests fail immediately and release their slot."""
+        from app import AIGateway
+
+        gateway = AIGateway()
+        fn = MagicMock(side_effect=ValueError('bad request'))
+
+        with pytest.raises(ValueError):
+            gateway.call('m', fn)
+        assert fn.call_count == 1
+        assert gateway.stats()['m']['inFlight'] == 0
+
+    @patch('app.time.sleep')
+    def test_gives_up_after_max_attempts(self, mock_sleep):
+        """Test persistent 503s raise after AI_RETRY_ATTEMPTS tries."""
+        from app import AIGateway, AI_RETRY_ATTEMPTS
+        from google.api_core import exceptions as gcp_exceptions
+
+        gateway = AIGateway()
+        fn = MagicMock(side_effect=gcp_exceptions.ServiceUnavailable('down'))
+
+        with pytest.raises(gcp_exceptions.ServiceUnavailable):
+            gateway.call('m', fn)
+        assert fn.call_count == AI_RETRY_ATTEMPTS
+
+    def test_times_out_when_no_slot_frees_before_deadline(self):
+        """Test callers beyond the concurrency limit fail at their deadline."""
+        import time
+        from app import AIGateway, AIGatewayTimeout
+
+        gateway = AIGateway()
+        governor = gateway.governor('m')
+        governor.limit = 1
+        governor.acquire(time.monotonic() + 1)
+
+        with pytest.raises(AIGatewayTimeout):
+            gateway.call('m', lambda: 'never', deadline=time.monotonic() + 0.05)
+        assert gateway.stats()['m']['timeouts'] == 1
+
+    def test_healthy_calls_grow_limit(self):
+        """Test fast successful calls additively raise the concurrency limit."""
+        from app import AIGateway
+
+        gateway = AIGateway()
+        for _ in range(8):
+            gateway.call('m', lambda: 'ok')
+
+        assert gateway.stats()['m']['limit'] > 4
+
+    def test_latency_target_scales_with_output_tokens(self):
+        """Test a long-output call is judged against a larger target than a short one."""
+        import time
+        from app import ModelGovernor
+
+        governor = ModelGovernor('m')
+        base = governor.latency_target()
+        slow = base + 30
+
+        governor.acquire(time.monotonic() + 1)
+        governor.release(latency=slow, max_output_tokens=65536)
+        assert governor.limit > 4
+
+        governor.acquire(time.monotonic() + 1)
+        governor.release(latency=slow)
+        assert governor.limit < 4
+
+    def test_streams_do_not_feed_latency_signal(self):
+        """Test a streamed call leaves the concurrency limit unchanged however long it runs."""
+        from app import stream_ai_response, ai_gateway
+
+        with patch('app.get_model') as mock_model, patch('app.time.monotonic', side_effect=range(0, 10 ** 6, 1000)):
+            mock_model.return_value.generate_content.return_value = iter([MagicMock(text='a'), MagicMock(text='b')])
+            governor = ai_gateway.governor('stream-model')
+            before = governor.limit
+            assert ''.join(stream_ai_response('p', model_name='stream-model')) == 'ab'
+
+        assert governor.limit == before and governor.in_flight == 0
+
+
+class TestPriorityLanes:
+    """Tests for interactive/batch scheduling of model calls."""
+
+    def test_batch_lane_limited_to_its_share(self):
+        """Test batch calls can't take more than AI_BATCH_SHARE of the limit."""
+        import time
+        from app import ModelGovernor
+
+        governor = ModelGovernor('m')
+        governor.limit = 4
+        deadline = time.monotonic() + 0.05
+
+        assert governor.acquire(deadline, 'batch')
+        assert governor.acquire(deadline, 'batch')
+        assert not governor.acquire(deadline, 'batch')
+        assert governor.acquire(deadline, 'interactive')
+        assert governor.lanes['batch']['inFlight'] == 2
+
+    def test_interactive_waiters_go_first(self):
+        """Test a freed slot goes to the waiting interactive call, not batch."""
+        import time
+        from app import ModelGovernor
+
+        governor = ModelGovernor('m')
+        governor.limit = 1
+        assert governor.acquire(time.monotonic() + 1, 'interactive')
+
+        order = []
+
+        def waiter(lane):
+            if governor.acquire(time.monotonic() + 2, lane):
+                order.append(lane)
+                governor.release(latency=0.01, lane=lane)
+
+        batch = threading.Thread(target=waiter, args=('batch',))
+        batch.start()
+        interactive = threading.Thread(target=waiter, args=('interactive',))
+        interactive.start()
+        while governor.lanes['interactive']['queued'] < 1:
+            time.sleep(0.01)
+        governor.release(latency=0.01, lane='interactive')
+        batch.join(3)
+        interactive.join(3)
+
+        assert order == ['interactive', 'batch']
+        stats = governor.stats()['lanes']
+        assert stats['batch']['started'] == 1 and stats['batch']['queued'] == 0
+
+    def test_ai_lane_decorator_sets_and_restores_lane(self):
+        """Test @ai_lane scopes the lane to the wrapped call."""
+        from app import ai_lane, current_ai_lane
+
+        seen = ai_lane('batch')(current_ai_lane)()
+
+        assert seen == 'batch'
+        assert current_ai_lane() == 'interactive'
+
+
+class TestContextPacking:
+    """Tests for token-budgeted prompt context packing."""
+
+    def test_fills_by_priority_and_recency(self):
+        """Test brief first, then newest research, then transcripts, then archive."""
+        from app import pack_context
+
+        packed = pack_context([
+            {'kind': 'archive', 'title': 'Archive', 'text': 'reel'},
+            {'kind': 'research', 'title': 'Old', 'text': 'old notes', 'date': '2024-01-01'},
+            {'kind': 'transcript', 'title': 'Interview', 'text': 'quote'},
+            {'kind': 'research', 'title': 'New', 'text': 'new notes', 'date': '2025-01-01'},
+            {'kind': 'brief', 'title': 'Brief', 'text': 'the brief'},
+        ], budget=1000)
+
+        assert [s['title'] for s in packed['sections']] == ['Brief', 'New', 'Old', 'Interview', 'Archive']
+        assert packed['text'].startswith('--- Brief ---\nthe brief')
+        assert packed['dropped'] == []
+
+    def test_drops_duplicate_passages(self):
+        """Test a passage repeated across documents is only included once."""
+        from app import pack_context
+
+        shared = 'The mill closed in 1987 after the flood destroyed the lower works.'
+        packed = pack_context([
+            {'kind': 'research', 'title': 'A', 'text': f"{shared}\n\nOnly in A."},
+            {'kind': 'research', 'title': 'B', 'text': f"Only in B.\n\n{shared}"},
+        ], budget=1000)
+
+        assert packed['text'].count(shared) == 1
+        assert packed['dropped'] == [{'kind': 'research', 'title': 'B', 'reason': 'duplicate',
+                                      'partial': True, 'duplicatePassages': 1}]
+
+    def test_reports_sections_cut_by_budget(self):
+        """Test low-priority material past the budget is trimmed and reported."""
+        from app import pack_context, count_tokens
+
+        brief = 'Brief sentence. ' * 50
+        archive = 'Archive clip line\n' * 400
+        packed = pack_context([
+            {'kind': 'archive', 'title': 'Archive', 'text': archive},
+            {'kind': 'brief', 'title': 'Brief', 'text': brief},
+        ], budget=400)
+
+        assert packed['tokens'] <= 400
+        assert count_tokens(packed['text']) <= 400 + 10
+        assert brief.strip() in packed['text']
+        assert packed['dropped'][0]['title'] == 'Archive'
+        assert packed['dropped'][0]['reason'] == 'budget'
+
+    def test_fit_to_budget_keeps_short_text_whole(self):
+        """Test short input passes through and long input is cut at a line break."""
+        from app import fit_to_budget
+
+        assert fit_to_budget('short transcript') == 'short transcript'
+        long_text = '\n'.join(f'[00:{i:02d}] line {i}' for i in range(2000))
+        fitted = fit_to_budget(long_text, budget=200)
+        assert long_text.startswith(fitted) and len(fitted) < len(long_text)
+        assert fitted.endswith(tuple('0123456789'))
+
+    @patch('app.generate_json')
+    @patch('app.get_research_document_contents')
+    @patch('app.get_docs_by_episode')
+    @patch('app.get_doc')
+    def test_generate_script_packs_whole_documents(self, mock_get, mock_docs, mock_uploads, mock_json):
+        """Test uploaded research reaches the script prompt packed, not cut to a fixed slice."""
+        from app import app, api_generate_script
+
+        mock_get.return_value = None
+        mock_docs.return_value = []
+        document = '\n\n'.join(f'Paragraph {i} about the mill and its workers.' for i in range(100))
+        mock_uploads.return_value = [{'source': 'Mill history.pdf', 'content': document}]
+        mock_json.return_value = []
+
+        with app.test_request_context('/api/generate-script', method='POST',
+                                      json={'title': 'Mill', 'episodeId': 'ep-1'}):
+            api_generate_script()
+
+        prompt = mock_json.call_args.args[0]
+        assert '--- Mill history.pdf ---' in prompt
+        assert 'Paragraph 99 about the mill' in prompt
+
+
+class TestStructuredOutput:
+    """Tests for schema-enforced JSON generation."""
+
+    SCHEMA = {
+        'type': 'ARRAY',
+        'items': {
+            'type': 'OBJECT',
+            'properties': {'name': {'type': 'STRING'}, 'score': {'type': 'NUMBER'}},
+            'required': ['name'],
+        },
+    }
+
+    def test_repair_json_fixes_fences_trailing_commas_and_truncation(self):
+        """Test common malformed replies are repaired locally."""
+        from app import repair_json
+
+        assert repair_json('```json\n[{"name": "a",}, ]\n```') == [{'name': 'a'}]
+        assert repair_json('Here you go: {"a": 1} hope that helps') == {'a': 1}
+        assert repair_json('[{"name": "a"}, {"name": "b", "score": 0.') == [{'name': 'a'}, {'name': 'b'}]
+        assert repair_json('{"summary": "cut off mid-sent') == {'summary': 'cut off mid-sent'}
+        with pytest.raises(ValueError):
+            repair_json('no json here')
+
+    def test_validate_json_reports_paths(self):
+        """Test validation errors point at the offending element."""
+        from app import validate_json
+
+        errors = validate_json([{'name': 'a'}, {'score': 'high'}], self.SCHEMA)
+
+        assert errors == [((1,), "missing required field 'name'"),
+                          ((1, 'score'), 'expected number, got str')]
+
+    @patch('app.generate_ai_response')
+    def test_requests_json_mode_with_schema(self, mock_ai):
+        """Test the schema is sent as response_schema with JSON mime type."""
+        from app import generate_json
+
+        mock_ai.return_value = '[{"name": "a"}]'
+
+        assert generate_json('p', self.SCHEMA, generation_config={'temperature': 0.2}) == [{'name': 'a'}]
+        config = mock_ai.call_args.kwargs['generation_config']
+        assert config == {'temperature': 0.2, 'response_mime_type': 'application/json',
+                          'response_schema': self.SCHEMA}
+
+    @patch('app.generate_ai_response')
+    def test_reprompts_only_the_invalid_element(self, mock_ai):
+        """Test a bad array element is regenerated alone and spliced back."""
+        from app import generate_json
+
+        mock_ai.side_effect = ['[{"name": "a"}, {"score": 3}]', '{"name": "b", "score": 3}']
+
+        result = generate_json('p', self.SCHEMA)
+
+        assert result == [{'name': 'a'}, {'name': 'b', 'score': 3}]
+        fragment_prompt = mock_ai.call_args.args[0]
+        assert '$[1]' in fragment_prompt and '{"score": 3}' in fragment_prompt
+        assert mock_ai.call_args.kwargs['generation_config']['response_schema'] == self.SCHEMA['items']
+
+    @patch('app.generate_ai_response')
+    def test_drops_elements_that_stay_invalid(self, mock_ai):
+        """Test an element the model can't fix is dropped rather than failing the response."""
+        from app import generate_json
+
+        mock_ai.side_effect = ['[{"name": "a"}, {"score": 3}]', 'still wrong']
+
+        assert generate_json('p', self.SCHEMA) == [{'name': 'a'}]
+
+    @patch('app.generate_ai_response')
+    def test_unusable_reply_retries_then_falls_back(self, mock_ai):
+        """Test the full request is retried once, then default or JSONGenerationError."""
+        from app import generate_json, JSONGenerationError
+
+        mock_ai.return_value = 'I cannot help with that.'
+
+        assert generate_json('p', self.SCHEMA, default=[]) == []
+        assert mock_ai.call_count == 2
+        with pytest.raises(JSONGenerationError) as excinfo:
+            generate_json('p', self.SCHEMA)
+        assert excinfo.value.text == 'I cannot help with that.'
+
+
+class TestAITelemetry:
+    """Tests for per-route AI call metrics."""
+
+    def _response(self, prompt_tokens, output_tokens):
+        response = MagicMock()
+        response.usage_metadata.prompt_token_count = prompt_tokens
+        response.usage_metadata.candidates_token_count = output_tokens
+        return response
+
+    def test_aggregates_calls_per_route_and_model(self):
+        """Test tokens, latency histogram, retries, errors and cost roll up per route."""
+        from app import AITelemetry
+
+        telemetry = AITelemetry()
+        telemetry.record_call('gemini-2.5-pro', 'api_chat', 0.4, self._response(1000, 200))
+        telemetry.record_call('gemini-2.5-pro', 'api_chat', 3.0, self._response(3000, 800), retries=1)
+        telemetry.record_call('gemini-2.5-pro', 'api_chat', 0.1, error=True)
+        telemetry.record_cache('gemini-2.5-pro', 'api_chat', hit=True)
+
+        route = telemetry.snapshot()['routes'][0]
+
+        assert route['route'] == 'api_chat' and route['calls'] == 3
+        assert route['promptTokens'] == 4000 and route['outputTokens'] == 1000
+        assert route['errors'] == 1 and route['retries'] == 1
+        assert route['cacheHitRate'] == 1.0
+        assert route['latencyMs']['max'] == 3000 and route['latencyMs']['p95'] == 5000
+        assert route['estimatedCostUsd'] == round((4000 * 1.25 + 1000 * 10.0) / 1e6, 4)
+
+    def test_unknown_model_is_flagged_unpriced(self):
+        """Test models without a price report no cost and sort ahead of priced routes."""
+        from app import AITelemetry
+
+        telemetry = AITelemetry()
+        telemetry.record_call('gemini-2.5-pro', 'api_chat', 0.4, self._response(1000, 200))
+        telemetry.record_call('new-model', 'api_script', 0.4, self._response(1000, 200))
+
+        routes = telemetry.snapshot()['routes']
+
+        assert (routes[0]['model'], routes[0]['estimatedCostUsd'], routes[0]['unpriced']) == ('new-model', None, True)
+        assert routes[1]['unpriced'] is False and routes[1]['estimatedCostUsd'] > 0
+
+    def test_gateway_records_route_of_request(self, app_client):
+        """Test model calls made inside a request are attributed to its endpoint."""
+        from app import app, AIGateway, ai_telemetry
+
+        ai_telemetry.clear()
+        with app.test_request_context('/api/refine-beat', method='POST'):
+            from flask import request
+            request.url_rule = MagicMock(endpoint='api_refine_beat')
+            AIGateway().call('m', lambda: self._response(10, 5))
+
+        route = ai_telemetry.snapshot()['routes'][0]
+        assert (route['route'], route['model'], route['promptTokens']) == ('api_refine_beat', 'm', 10)
+
+    def test_background_work_uses_lane_route(self):
+        """Test batch threads are attributed to their @ai_lane function."""
+        from app import ai_lane, current_ai_route
+
+        @ai_lane('batch')
+        def run_batch():
+            return current_ai_route()
+
+        assert run_batch().endswith('run_batch')
+        assert current_ai_route() == 'background'
+
+    def test_flush_writes_increments_and_requeues_on_failure(self, mock_firestore):
+        """Test pending metrics become Firestore increments, kept if the write fails."""
+        from app import AITelemetry
+
+        telemetry = AITelemetry()
+        telemetry.record_call('m', 'api_chat', 0.2, self._response(7, 3))
+        mock_firestore.batch.return_value.commit.side_effect = Exception('offline')
+
+        assert telemetry.flush() == 0
+        mock_firestore.batch.return_value.commit.side_effect = None
+        assert telemetry.flush() == 1
+
+        data = mock_firestore.batch.return_value.set.call_args.args[1]
+        assert data['route'] == 'api_chat' and data['promptTokens'].value == 7
+        assert mock_firestore.batch.return_value.set.call_args.kwargs == {'merge': True}
+        assert telemetry.flush() == 0
+
+    def test_flush_drops_ambiguous_failures(self, mock_firestore):
+        """Test a flush that timed out (and may have landed) isn't re-applied later."""
+        from app import AITelemetry
+        from google.api_core import exceptions as gcp_exceptions
+
+        telemetry = AITelemetry()
+        telemetry.record_call('m', 'api_chat', 0.2, self._response(7, 3))
+        mock_firestore.batch.return_value.commit.side_effect = gcp_exceptions.DeadlineExceeded('timeout')
+
+        assert telemetry.flush() == 0
+        assert mock_firestore.batch.return_value.commit.call_count == 1
+        mock_firestore.batch.return_value.commit.side_effect = None
+        assert telemetry.flush() == 0
+
+
+class TestModelRouting:
+    """Tests for cheap-first model routing with escalation."""
+
+    def _text(self, text):
+        response = MagicMock()
+        response.text = text
+        return response
+
+    @patch('app.coalesced_generate_content')
+    def test_fast_tier_output_accepted_when_valid(self, mock_generate):
+        """Test a passing fast-tier result is returned without escalation."""
+        from app import routed_generate, min_words, MODEL_TIERS
+
+        mock_generate.return_value = self._text('plenty of words here')
+
+        with patch.dict('app.ROUTING_POLICIES', {'p': ['fast', 'pro']}):
+            assert routed_generate('p', 'prompt', validators=[min_words(3)]) == 'plenty of words here'
+        assert mock_generate.call_args.args[1] == MODEL_TIERS['fast']
+
+    @patch('app.coalesced_generate_content')
+    def test_escalates_when_validator_rejects(self, mock_generate):
+        """Test missing sections send the request to the next tier."""
+        from app import routed_generate, required_sections, MODEL_TIERS, model_routing_stats
+
+        mock_generate.side_effect = [self._text('SUMMARY only'), self._text('SUMMARY ... TIMELINE')]
+
+        with patch.dict('app.ROUTING_POLICIES', {'research': ['fast', 'grounded']}):
+            text = routed_generate('research', 'prompt', 'sys',
+                                   validators=[required_sections('summary', 'timeline')])
+
+        assert text == 'SUMMARY ... TIMELINE'
+        assert [c.args[1] for c in mock_generate.call_args_list] == [MODEL_TIERS['fast'], MODEL_TIERS['grounded']]
+        assert mock_generate.call_args.args[0] == 'sys\n\nprompt'
+        outcomes = model_routing_stats()['outcomes']['research']
+        assert outcomes['escalated'][MODEL_TIERS['fast']] >= 1
+
+    @patch('app.coalesced_generate_content')
+    def test_call_failure_on_cheap_tier_escalates(self, mock_generate):
+        """Test an error from the fast model falls through to the next tier."""
+        from app import routed_generate
+
+        mock_generate.side_effect = [RuntimeError('grounding unsupported'), self._text('ok')]
+
+        with patch.dict('app.ROUTING_POLICIES', {'p': ['fast', 'pro']}):
+            assert routed_generate('p', 'prompt') == 'ok'
+
+    @patch('app.generate_ai_response')
+    def test_json_schema_failure_escalates_without_reprompting(self, mock_ai):
+        """Test invalid JSON from the fast tier goes straight to the pro tier."""
+        from app import routed_generate_json, MODEL_TIERS
+
+        schema = {'type': 'OBJECT', 'properties': {'stories': {'type': 'ARRAY'}}, 'required': ['stories']}
+        mock_ai.side_effect = ['{"wrong": true}', '{"stories": [1]}']
+
+        with patch.dict('app.ROUTING_POLICIES', {'p': ['fast', 'pro']}):
+            assert routed_generate_json('p', 'prompt', schema) == {'stories': [1]}
+        assert [c.kwargs['model_name'] for c in mock_ai.call_args_list] == [MODEL_TIERS['fast'], MODEL_TIERS['pro']]
@@ -0,0 +1,945 @@
+"""
+Unit tests for the Firestore data-layer helpers in app.py
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def _snapshot(doc_id, data):
+    """Build a fake Firestore DocumentSnapshot."""
+    snap = MagicMock()
+    snap.id = doc_id
+    snap.exists = data is not None
+    snap.to_dict.return_value = dict(data) if data is not None else None
+    return snap
+
+
+class TestDocCache:
+    """Tests for the read-through document cache."""
+
+    def test_get_doc_reads_firestore_once(self, mock_firestore):
+        """Test repeated get_doc calls are served from the cache."""
+        from app import get_doc, doc_cache
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('ep-1', {'title': 'Episode 1'})
+
+        first = get_doc('episodes', 'ep-1')
+        second = get_doc('episodes', 'ep-1')
+
+        assert first == second == {'title': 'Episode 1', 'id': 'ep-1'}
+        assert doc_ref.get.call_count == 1
+        assert doc_cache.stats()['hits'] == 1
+        assert doc_cache.stats()['misses'] == 1
+
+    def test_cached_copy_is_isolated(self, mock_firestore):
+        """Test mutating a returned document does not corrupt the cache."""
+        from app import get_doc
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('ep-1', {'workflow': {'currentPhase': 'research'}})
+
+        get_doc('episodes', 'ep-1')['workflow']['currentPhase'] = 'script'
+
+        assert get_doc('episodes', 'ep-1')['workflow']['currentPhase'] == 'research'
+
+    def test_update_doc_invalidates(self, mock_firestore):
+        """Test update_doc re-reads the document instead of returning stale data."""
+        from app import get_doc, update_doc
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('ep-1', {'title': 'Old'})
+        get_doc('episodes', 'ep-1')
+
+        doc_ref.get.return_value = _snapshot('ep-1', {'title': 'New'})
+        result = update_doc('episodes', 'ep-1', {'title': 'New'})
+
+        assert result['title'] == 'New'
+
+    def test_delete_doc_invalidates(self, mock_firestore):
+        """Test delete_doc evicts the cached document."""
+        from app import get_doc, delete_doc
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('ep-1', {'title': 'Episode 1'})
+        get_doc('episodes', 'ep-1')
+
+        delete_doc('episodes', 'ep-1')
+        doc_ref.get.return_value = _snapshot('ep-1', None)
+
+        assert get_doc('episodes', 'ep-1') is None
+
+    def test_research_delete_evicts_episode(self, mock_firestore):
+        """Test clearing an episode's research is visible to the next cached read."""
+        from app import app, get_doc, delete_episode_research
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('ep-1', {'research': 'Old findings'})
+        get_doc('episodes', 'ep-1')
+
+        doc_ref.get.return_value = _snapshot('ep-1', {'research': ''})
+        with app.test_request_context(method='DELETE'):
+            delete_episode_research('ep-1')
+
+        assert get_doc('episodes', 'ep-1')['research'] == ''
+
+    def test_lru_eviction_respects_max_entries(self):
+        """Test least-recently-used entries are evicted past the bound."""
+        from app import DocCache
+
+        cache = DocCache(ttl=60, max_entries=2, max_bytes=1024 * 1024)
+        cache.put('episodes', 'a', {'n': 1})
+        cache.put('episodes', 'b', {'n': 2})
+        cache.get('episodes', 'a')
+        cache.put('episodes', 'c', {'n': 3})
+
+        assert cache.get('episodes', 'b') is None
+        assert cache.get('episodes', 'a') == {'n': 1}
+        assert cache.stats()['evictions'] == 1
+
+    def test_expired_entries_miss(self):
+        """Test entries past their TTL are treated as misses."""
+        from app import DocCache
+
+        cache = DocCache(ttl=60, max_entries=10, max_bytes=1024 * 1024)
+        cache.put('episodes', 'a', {'n': 1})
+        with patch('app.time.monotonic', return_value=10 ** 9):
+            assert cache.get('episodes', 'a') is None
+
+
+class TestProjectScope:
+    """Tests for projectId/project_id normalization."""
+
+    def test_normalize_copies_legacy_field(self):
+        """Test snake_case project_id is mirrored onto projectId."""
+        from app import normalize_project_scope
+
+        data = normalize_project_scope({'project_id': 'proj-1'})
+
+        assert data['projectId'] == 'proj-1'
+        assert data['project_id'] == 'proj-1'
+
+    def test_normalize_keeps_existing_projectId(self):
+        """Test an explicit projectId is never overwritten."""
+        from app import normalize_project_scope
+
+        data = normalize_project_scope({'projectId': 'a', 'project_id': 'b'})
+
+        assert data['projectId'] == 'a'
+
+    def test_create_doc_normalizes(self, mock_firestore):
+        """Test create_doc writes the canonical scoping field."""
+        from app import create_doc
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.id = 'new-id'
+
+        create_doc('story_cards', {'project_id': 'proj-1'})
+
+        written = doc_ref.set.call_args[0][0]
+        assert written['projectId'] == 'proj-1'
+
+    @patch('app.is_project_scope_migrated', return_value=True)
+    def test_get_all_docs_single_query_when_migrated(self, mock_migrated, mock_firestore):
+        """Test migrated collections are listed with one projectId query."""
+        from app import get_all_docs
+
+        collection = mock_firestore.collection.return_value
+        collection.where.return_value.stream.return_value = iter([_snapshot('ep-1', {'projectId': 'p'})])
+
+        result = get_all_docs('episodes', 'p')
+
+        collection.where.assert_called_once_with('projectId', '==', 'p')
+        assert result == [{'projectId': 'p', 'id': 'ep-1'}]
+
+    @patch('app.is_project_scope_migrated', return_value=False)
+    def test_get_all_docs_merges_when_not_migrated(self, mock_migrated, mock_firestore):
+        """Test unmigrated collections still query both field spellings."""
+        from app import get_all_docs
+
+        collection = mock_firestore.collection.return_value
+        collection.where.return_value.stream.side_effect = [
+            iter([_snapshot('a', {'projectId': 'p'})]),
+            iter([_snapshot('b', {'project_id': 'p'})]),
+        ]
+
+        result = get_all_docs('episodes', 'p')
+
+        assert {d['id'] for d in result} == {'a', 'b'}
+
+
+class TestListProjection:
+    """Tests for ?fields= / ?view=summary projections."""
+
+    def test_no_params_returns_full_docs(self):
+        """Test no projection is applied by default."""
+        from app import app, list_projection
+
+        with app.test_request_context('/api/projects/p/episodes'):
+            assert list_projection('episodes') is None
+
+    def test_summary_view_uses_collection_defaults(self):
+        """Test view=summary selects the collection's summary fields."""
+        from app import app, list_projection, SUMMARY_FIELDS
+
+        with app.test_request_context('/api/projects/p/episodes?view=summary'):
+            fields = list_projection('episodes')
+
+        assert fields == SUMMARY_FIELDS['episodes']
+        assert 'research' not in fields
+
+    def test_fields_param_adds_required_and_drops_invalid(self):
+        """Test explicit fields keep required sort keys and reject bad paths."""
+        from app import app, list_projection
+
+        with app.test_request_context('/x?fields=title,bad field,workflow.currentPhase'):
+            fields = list_projection('episodes', 'order')
+
+        assert fields == ['title', 'workflow.currentPhase', 'order']
+
+    def test_get_all_docs_applies_select(self, mock_firestore):
+        """Test get_all_docs passes the projection to Firestore select()."""
+        from app import get_all_docs
+
+        collection = mock_firestore.collection.return_value
+        collection.select.return_value.stream.return_value = iter([])
+
+        get_all_docs('episodes', fields=['title'])
+
+        collection.select.assert_called_once_with(['title'])
+
+
+class TestPagination:
+    """Tests for cursor pagination helpers."""
+
+    def _query(self, docs):
+        """Fake query whose ordered/limited stream yields the given snapshots."""
+        query = MagicMock()
+        chained = query.order_by.return_value.order_by.return_value
+        chained.start_after.return_value = chained
+        chained.limit.return_value.stream.return_value = iter(docs)
+        return query
+
+    def test_page_token_round_trip(self):
+        """Test encoded tokens decode to the same cursor."""
+        from app import encode_page_token, decode_page_token
+
+        token = encode_page_token('2024-01-01T00:00:00', 'doc-9')
+
+        assert decode_page_token(token) == ('2024-01-01T00:00:00', 'doc-9')
+
+    def test_invalid_token_raises(self):
+        """Test garbage tokens are rejected."""
+        from app import decode_page_token
+
+        with pytest.raises(ValueError):
+            decode_page_token('not-a-token')
+
+    def test_fetch_page_merges_and_sets_next_token(self):
+        """Test pages merge both scope queries, dedupe and emit a cursor."""
+        from app import fetch_page, decode_page_token
+
+        camel = self._query([_snapshot('a', {'createdAt': '1'}), _snapshot('b', {'createdAt': '3'})])
+        snake = self._query([_snapshot('a', {'createdAt': '1'}), _snapshot('c', {'createdAt': '2'})])
+
+        page = fetch_page([camel, snake], limit=2)
+
+        assert [d['id'] for d in page['items']] == ['a', 'c']
+        assert decode_page_token(page['nextPageToken']) == ('2', 'c')
+
+    def test_fetch_page_last_page_has_no_token(self):
+        """Test a short final page ends pagination."""
+        from app import fetch_page
+
+        page = fetch_page([self._query([_snapshot('a', {'createdAt': '1'})])], limit=5)
+
+        assert page['nextPageToken'] is None
+        assert len(page['items']) == 1
+
+    def test_no_paging_params_returns_none(self):
+        """Test routes keep returning plain lists without limit/pageToken."""
+        from app import app, paged_list_response
+
+        with app.test_request_context('/api/projects'):
+            assert paged_list_response('projects') is None
+
+    def test_bad_limit_returns_400(self):
+        """Test a non-numeric limit is a client error."""
+        from app import app, paged_list_response
+
+        with app.test_request_context('/api/projects?limit=abc'):
+            response, status = paged_list_response('projects')
+
+        assert status == 400
+
+    @patch('app.get_all_docs')
+    def test_episode_pages_follow_list_order(self, mock_all):
+        """Test paging episodes walks them in the same order as the full list."""
+        from app import app, get_episodes
+
+        mock_all.return_value = [
+            {'id': 'e3', 'order': 3}, {'id': 'e1', 'episodeNumber': 1},
+            {'id': 'e10', 'order': 10}, {'id': 'e2', 'order': 2},
+        ]
+        with app.test_request_context('/api/projects/p1/episodes'):
+            full = [e['id'] for e in get_episodes('p1').get_json()]
+
+        paged, token = [], None
+        while True:
+            url = '/api/projects/p1/episodes?limit=3' + (f'&pageToken={token}' if token else '')
+            with app.test_request_context(url):
+                page = get_episodes('p1').get_json()
+            paged += [e['id'] for e in page['items']]
+            token = page['nextPageToken']
+            if not token:
+                break
+
+        assert full == paged == ['e1', 'e2', 'e3', 'e10']
+
+
+class TestStoryCardHydration:
+    """Tests for batched story card reads in the episode planner."""
+
+    def test_fetches_cards_with_one_get_all(self, mock_firestore):
+        """Test all slot ids are read in a single batched call and deduped."""
+        from app import _get_story_cards, invalidate_story_card_cache
+
+        invalidate_story_card_cache('proj-1')
+        mock_firestore.get_all.return_value = [
+            _snapshot('c1', {'location_name': 'Asylum'}),
+            _snapshot('c2', {'location_name': 'Mill'}),
+        ]
+
+        cards = _get_story_cards('proj-1', ['c1', 'c2', 'c1', None])
+
+        assert mock_firestore.get_all.call_count == 1
+        assert cards['c1']['location_name'] == 'Asylum'
+        assert cards['c2']['id'] == 'c2'
+
+    def test_second_call_served_from_cache(self, mock_firestore):
+        """Test cached cards skip Firestore until the project is invalidated."""
+        from app import _get_story_cards, invalidate_story_card_cache
+
+        invalidate_story_card_cache('proj-1')
+        mock_firestore.get_all.return_value = [_snapshot('c1', {'location_name': 'Asylum'})]
+
+        _get_story_cards('proj-1', ['c1'])
+        _get_story_cards('proj-1', ['c1'])
+        assert mock_firestore.get_all.call_count == 1
+
+        invalidate_story_card_cache('proj-1')
+        _get_story_cards('proj-1', ['c1'])
+        assert mock_firestore.get_all.call_count == 2
+
+    def test_large_id_sets_are_chunked(self, mock_firestore):
+        """Test more than STORY_CARD_BATCH_SIZE ids are split across calls."""
+        from app import _get_story_cards, invalidate_story_card_cache, STORY_CARD_BATCH_SIZE
+
+        invalidate_story_card_cache('proj-1')
+        mock_firestore.get_all.return_value = []
+
+        _get_story_cards('proj-1', [f'c{i}' for i in range(STORY_CARD_BATCH_SIZE + 1)])
+
+        assert mock_firestore.get_all.call_count == 2
+
+
+class TestWorkflowAggregation:
+    """Tests for the single-pass workflow aggregator."""
+
+    def _episode(self, episode_id, series_id, phases, current='research'):
+        return {
+            'id': episode_id,
+            'title': f'Episode {episode_id}',
+            'seriesId': series_id,
+            'workflow': {'currentPhase': current,
+                         'phases': {k: {'status': v} for k, v in phases.items()}},
+        }
+
+    def test_counts_phases_series_and_bottlenecks(self):
+        """Test one pass produces the dashboard and overview numbers."""
+        from app import aggregate_project_workflow
+
+        episodes = [
+            self._episode('e1', 's1', {'research': 'review', 'archive': 'pending'}),
+            self._episode('e2', 's1', {'research': 'approved', 'assembly': 'approved'}, current='assembly'),
+            self._episode('e3', None, {'research': 'in_progress'}),
+        ]
+        result = aggregate_project_workflow(episodes, [{'id': 's1', 'title': 'Series One'}])
+
+        assert result['phaseStats']['research'] == {'pending': 0, 'in_progress': 1, 'review': 1, 'approved': 1}
+        assert result['episodesBySeries']['s1'] == {'seriesName': 'Series One', 'totalEpisodes': 2,
+                                                     'completedEpisodes': 1}
+        assert result['bottlenecks'] == [{'phase': 'research', 'count': 1}]
+        assert [o['episodeId'] for o in result['overview']] == ['e1', 'e2', 'e3']
+        assert result['overview'][1]['completedPhases'] == 2
+
+    def test_ignores_unknown_phases(self):
+        """Test legacy phase keys don't break the aggregation."""
+        from app import aggregate_project_workflow
+
+        result = aggregate_project_workflow([self._episode('e1', None, {'legacy': 'review'})])
+
+        assert result['bottlenecks'] == []
+
+    @patch('app.get_doc')
+    @patch('app.get_all_docs')
+    def test_dashboard_stats_reads_no_single_docs(self, mock_get_all, mock_get_doc, mock_firestore):
+        """Test dashboard stats are computed without per-episode reads."""
+        from app import get_project_dashboard_stats
+
+        stats_ref = mock_firestore.collection.return_value.document.return_value
+        stats_ref.get.return_value = _snapshot('p1', None)
+        mock_get_all.side_effect = lambda name, project_id=None, **kw: (
+            [{'id': 's1', 'title': 'S'}] if name == 'series'
+            else [self._episode('e1', 's1', {'research': 'review'})])
+
+        stats = get_project_dashboard_stats('p1')
+
+        mock_get_doc.assert_not_called()
+        assert stats['totalEpisodes'] == 1
+        assert stats['episodesBySeries']['s1']['totalEpisodes'] == 1
+
+
+class TestProjectStats:
+    """Tests for the materialized project dashboard counters."""
+
+    def _episode(self, phases, series_id='s1', current='research'):
+        return {
+            'projectId': 'p1',
+            'seriesId': series_id,
+            'workflow': {'currentPhase': current,
+                         'phases': {k: {'status': v} for k, v in phases.items()}},
+        }
+
+    def test_increments_for_new_episode(self):
+        """Test creating an episode adds one to each of its counters."""
+        from app import project_stats_increments
+
+        inc = project_stats_increments(None, self._episode({'research': 'in_progress'}))
+
+        assert inc['totalEpisodes'].value == 1
+        assert inc['phaseStats']['research']['in_progress'].value == 1
+        assert inc['series']['s1']['totalEpisodes'].value == 1
+
+    def test_increments_for_phase_change_only_touch_changed_counters(self):
+        """Test a status change moves one count and leaves totals alone."""
+        from app import project_stats_increments
+
+        before = self._episode({'research': 'in_progress'})
+        after = self._episode({'research': 'review'})
+        inc = project_stats_increments(before, after)
+
+        assert 'totalEpisodes' not in inc
+        assert inc['phaseStats']['research']['in_progress'].value == -1
+        assert inc['phaseStats']['research']['review'].value == 1
+
+    def test_increments_for_completion(self):
+        """Test approving assembly counts the episode as completed for its series."""
+        from app import project_stats_increments
+
+        before = self._episode({'assembly': 'in_progress'}, current='assembly')
+        after = self._episode({'assembly': 'approved'}, current='assembly')
+
+        inc = project_stats_increments(before, after)
+
+        assert inc['series']['s1']['completedEpisodes'].value == 1
+
+    def test_dashboard_reads_stats_doc(self, mock_firestore):
+        """Test the dashboard is served from the stats doc without listing episodes."""
+        from app import get_project_dashboard_stats
+
+        stats_ref = mock_firestore.collection.return_value.document.return_value
+        stats_ref.get.return_value = _snapshot('p1', {
+            'totalEpisodes': 3,
+            'phaseStats': {'script': {'review': 2}},
+            'series': {'s1': {'seriesName': 'One', 'totalEpisodes': 3, 'completedEpisodes': 1},
+                       'orphan': {'totalEpisodes': 1}},
+        })
+
+        with patch('app.get_all_docs') as mock_get_all:
+            stats = get_project_dashboard_stats('p1')
+            mock_get_all.assert_not_called()
+
+        assert stats['totalEpisodes'] == 3
+        assert stats['totalSeries'] == 1
+        assert stats['phaseStats']['script']['review'] == 2
+        assert stats['phaseStats']['research']['pending'] == 0
+        assert stats['bottlenecks'] == [{'phase': 'script', 'count': 2}]
+
+    def test_transactional_create_caches_only_after_commit(self, mock_firestore):
+        """Test an episode created in a transaction isn't cached until the transaction returns."""
+        from app import create_doc, create_episode_doc, doc_cache
+
+        mock_firestore.collection.return_value.document.return_value.id = 'ep-new'
+        transaction = MagicMock()
+
+        create_doc('episodes', {'title': 'Draft'}, transaction=transaction)
+        assert doc_cache.get('episodes', 'ep-new') is None
+
+        with patch('app.firestore.transactional', lambda fn: fn), \
+                patch('app._stage_stats_change', return_value=lambda: None):
+            episode = create_episode_doc({'title': 'Pilot', 'projectId': 'p1'})
+
+        assert doc_cache.get('episodes', 'ep-new')['title'] == 'Pilot'
+        assert episode['id'] == 'ep-new'
+
+    def test_update_applies_dotted_field_paths(self, mock_firestore):
+        """Test field-path updates are merged into nested maps for stats and the response."""
+        from app import update_episode_doc
+
+        episode_ref = mock_firestore.collection.return_value.document.return_value
+        episode_ref.get.return_value = _snapshot('ep-1', self._episode({'research': 'in_progress'}))
+        seen = {}
+
+        def stage(transaction, before, after):
+            seen['after'] = after
+            return lambda: None
+
+        with patch('app.firestore.transactional', lambda fn: fn), patch('app._stage_stats_change', stage):
+            result = update_episode_doc('ep-1', lambda current: {'workflow.currentPhase': 'script'})
+
+        assert result['workflow']['currentPhase'] == 'script'
+        assert 'workflow.currentPhase' not in result
+        assert seen['after']['workflow']['phases'] == {'research': {'status': 'in_progress'}}
+
+    def test_update_missing_episode_returns_404(self, mock_firestore):
+        """Test PUT on an unknown episode is a 404 rather than 200 null."""
+        from app import app, update_episode
+
+        episode_ref = mock_firestore.collection.return_value.document.return_value
+        episode_ref.get.return_value = _snapshot('ep-x', None)
+
+        with patch('app.firestore.transactional', lambda fn: fn):
+            with app.test_request_context('/api/episodes/ep-x', method='PUT', json={'title': 'New'}):
+                response, status = update_episode('ep-x')
+
+        assert status == 404
+
+
+class TestCloudStats:
+    """Tests for aggregation-based infrastructure stats."""
+
+    def test_count_collection_uses_aggregation(self, mock_firestore):
+        """Test counts come from count() rather than streaming documents."""
+        from app import count_collection
+
+        aggregate = MagicMock()
+        aggregate.value = 4200
+        mock_firestore.collection.return_value.count.return_value.get.return_value = [[aggregate]]
+
+        assert count_collection('doc_episodes') == 4200
+        mock_firestore.collection.return_value.stream.assert_not_called()
+
+    def test_gcs_usage_refreshes_in_background_once(self):
+        """Test a stale summary starts one refresh thread and returns cached values."""
+        import app
+
+        with patch.dict(app._gcs_usage, {'refreshedAt': None, 'refreshing': False,
+                                         'refreshedMonotonic': 0.0}), \
+                patch('app.threading.Thread') as mock_thread:
+            first = app.get_gcs_usage()
+            second = app.get_gcs_usage()
+
+        assert mock_thread.call_count == 1
+        assert first['refreshing'] is True
+        assert second['refreshing'] is True
+
+
+class TestConfigService:
+    """Tests for the cached universal/series config accessors."""
+
+    def _service(self):
+        from app import ConfigService
+        return ConfigService(ttl=60, use_listeners=False)
+
+    def test_reads_each_doc_once_within_ttl(self, mock_firestore):
+        """Test repeated accessor calls share one Firestore read."""
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('global', {'rules': 'Be accurate.'})
+        service = self._service()
+
+        assert service.universal_rules() == 'Be accurate.'
+        assert service.universal_rules() == 'Be accurate.'
+        assert doc_ref.get.call_count == 1
+
+    def test_defaults_when_docs_missing(self, mock_firestore):
+        """Test typed accessors fall back to the built-in defaults."""
+        from app import DEFAULT_UNIVERSAL_RULES
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('x', None)
+        service = self._service()
+
+        assert service.universal_rules() == DEFAULT_UNIVERSAL_RULES
+        assert service.script_format('nasa-files') == {
+            'scriptFormat': '2-column',
+            'scriptColumns': ['visuals', 'script'],
+            'factCheckMode': 'at_generation',
+        }
+        assert service.commentary_format('nasa-files') == 'CAPS'
+        assert service.style_dna_directives('nasa-files') == {}
+
+    def test_invalidate_forces_reread(self, mock_firestore):
+        """Test config writes are visible immediately after invalidation."""
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('abandoned', {'beat_sheet': 'v1'})
+        service = self._service()
+        service.beat_sheet('abandoned')
+
+        doc_ref.get.return_value = _snapshot('abandoned', {'beat_sheet': 'v2'})
+        service.invalidate('series_config', 'abandoned')
+
+        assert service.beat_sheet('abandoned') == 'v2'
+
+    def test_snapshot_listener_updates_entry(self, mock_firestore):
+        """Test on_snapshot callbacks refresh the cached copy in place."""
+        from app import ConfigService
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('s1', {'workflow': {'scriptFormat': '2-column'}})
+        service = ConfigService(ttl=0, use_listeners=True)
+        service.script_format('s1')
+
+        callback = doc_ref.on_snapshot.call_args[0][0]
+        doc_ref.on_snapshot.return_value.is_active = True
+        callback([_snapshot('s1', {'workflow': {'scriptFormat': '3-column'}})], [], None)
+
+        assert service.script_format('s1')['scriptFormat'] == '3-column'
+        assert doc_ref.get.call_count == 1
+
+
+class TestBulkWrite:
+    """Tests for chunked, retried bulk writes."""
+
+    def _allocate_ids(self, mock_db):
+        counter = iter(range(100000))
+        mock_db.collection.return_value.document.side_effect = (
+            lambda doc_id=None: MagicMock(id=doc_id or f'doc-{next(counter)}'))
+
+    def test_commits_in_chunks_and_returns_ids(self, mock_firestore):
+        """Test writes are split into batches of at most 500 ops."""
+        from app import bulk_create_docs
+
+        self._allocate_ids(mock_firestore)
+        batches = []
+        mock_firestore.batch.side_effect = lambda: batches.append(MagicMock()) or batches[-1]
+
+        docs = bulk_create_docs('assets', [{'title': f'a{i}', 'project_id': 'p1'} for i in range(1201)])
+
+        assert len(docs) == 1201
+        assert len({d['id'] for d in docs}) == 1201
+        assert docs[0]['projectId'] == 'p1'
+        assert [b.set.call_count for b in batches] == [500, 500, 201]
+        assert all(b.commit.call_count == 1 for b in batches)
+
+    @patch('app.time.sleep')
+    def test_retries_transient_failures(self, mock_sleep, mock_firestore):
+        """Test a chunk is rebuilt and recommitted after a transient error."""
+        from app import BulkWrite
+        from google.api_core import exceptions as gcp_exceptions
+
+        self._allocate_ids(mock_firestore)
+        mock_firestore.batch.return_value.commit.side_effect = [
+            gcp_exceptions.ServiceUnavailable('busy'), None]
+
+        bulk = BulkWrite()
+        bulk.create('shots', {'description': 'Launch pad'})
+        ids = bulk.commit()
+
+        assert ids == ['doc-0']
+        assert mock_firestore.batch.return_value.commit.call_count == 2
+        mock_sleep.assert_called_once()
+
+    @patch('app.time.sleep')
+    def test_increment_chunk_not_retried_on_ambiguous_error(self, mock_sleep, mock_firestore):
+        """Test a timed-out chunk holding increments isn't re-applied, since it may have landed."""
+        from app import BulkWrite, BulkWriteError, firestore
+        from google.api_core import exceptions as gcp_exceptions
+
+        mock_firestore.batch.return_value.commit.side_effect = gcp_exceptions.DeadlineExceeded('timeout')
+
+        bulk = BulkWrite()
+        bulk.set('project_stats', 'p1', {'totalEpisodes': firestore.Increment(2)}, merge=True)
+        with pytest.raises(BulkWriteError):
+            bulk.commit()
+
+        assert mock_firestore.batch.return_value.commit.call_count == 1
+        mock_sleep.assert_not_called()
+
+    def test_rolls_back_created_docs_when_a_chunk_fails(self, mock_firestore):
+        """Test documents from committed chunks are deleted when a later chunk fails."""
+        from app import BulkWrite, BulkWriteError
+
+        self._allocate_ids(mock_firestore)
+        batches = []
+
+        def new_batch():
+            batch = MagicMock()
+            if len(batches) == 1:
+                batch.commit.side_effect = ValueError('invalid document')
+            batches.append(batch)
+            return batch
+        mock_firestore.batch.side_effect = new_batch
+
+        bulk = BulkWrite()
+        for i in range(600):
+            bulk.create('story_cards', {'hook': str(i)})
+        with pytest.raises(BulkWriteError):
+            bulk.commit()
+
+        rollback = batches[2]
+        assert rollback.delete.call_count == 500
+        rollback.commit.assert_called_once()
+
+    def test_bulk_increments_sum_episodes(self):
+        """Test stats increments for a bulk create add up across episodes."""
+        from app import project_stats_bulk_increments
+
+        episodes = [
+            {'projectId': 'p1', 'seriesId': 's1',
+             'workflow': {'phases': {'research': {'status': 'pending'}}}}
+            for _ in range(3)
+        ]
+        inc = project_stats_bulk_increments(episodes)
+
+        assert inc['totalEpisodes'].value == 3
+        assert inc['phaseStats']['research']['pending'].value == 3
+        assert inc['series']['s1']['totalEpisodes'].value == 3
+
+
+class TestUpdateDoc:
+    """Tests for update_doc returning merged state without a re-read."""
+
+    def test_merge_update_applies_dotted_paths_and_deletes(self):
+        """Test field paths are applied into nested maps and DELETE_FIELD removes keys."""
+        from app import merge_update, firestore
+
+        doc = {'brief': {'summary': 'old', 'storyBeats': ['a']}, 'notes': 'x'}
+        merged = merge_update(doc, {'brief.storyBeats': ['a', 'b'], 'notes': firestore.DELETE_FIELD})
+
+        assert merged == {'brief': {'summary': 'old', 'storyBeats': ['a', 'b']}}
+        assert doc['brief']['storyBeats'] == ['a']
+
+    def test_merge_update_gives_up_on_transforms(self):
+        """Test server-side transforms force a fresh read."""
+        from app import merge_update, firestore
+
+        assert merge_update({'count': 1}, {'count': firestore.Increment(1)}) is None
+
+    def test_uses_cached_prior_instead_of_rereading(self, mock_firestore):
+        """Test the update costs no read when the document is cached."""
+        from app import update_doc, doc_cache
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_cache.put('scripts', 's1', {'id': 's1', 'title': 'Draft', 'content': 'old'})
+
+        result = update_doc('scripts', 's1', {'content': 'new'})
+
+        assert result['title'] == 'Draft'
+        assert result['content'] == 'new'
+        doc_ref.update.assert_called_once()
+        doc_ref.get.assert_not_called()
+        assert doc_cache.get('scripts', 's1')['content'] == 'new'
+
+    def test_cached_merge_keeps_original_expiry(self, mock_firestore):
+        """Test repeated updates of a cached doc don't keep extending its TTL."""
+        from app import update_doc, doc_cache
+
+        with patch('app.time.monotonic', return_value=1000.0):
+            doc_cache.put('agent_tasks', 'job-1', {'id': 'job-1', 'status': 'in_progress'})
+            _, expires_at = doc_cache.get_with_expiry('agent_tasks', 'job-1')
+
+        with patch('app.time.monotonic', return_value=1000.0 + doc_cache.ttl / 2):
+            update_doc('agent_tasks', 'job-1', {'heartbeatAt': 'now'}, return_doc=False)
+            assert doc_cache.get_with_expiry('agent_tasks', 'job-1')[1] == expires_at
+
+        with patch('app.time.monotonic', return_value=expires_at + 1):
+            assert doc_cache.get('agent_tasks', 'job-1') is None
+
+    def test_concurrent_read_during_write_is_not_cached(self, mock_firestore):
+        """Test a get_doc racing the write can't leave the pre-write doc cached."""
+        from app import update_doc, get_doc, doc_cache, firestore
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('s1', {'views': 1})
+        doc_ref.update.side_effect = lambda data: get_doc('scripts', 's1')
+
+        update_doc('scripts', 's1', {'views': firestore.Increment(1)}, return_doc=False)
+
+        assert doc_cache.get('scripts', 's1') is None
+
+    def test_rereads_when_prior_unknown(self, mock_firestore):
+        """Test an uncached document is read back after the write."""
+        from app import update_doc
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+        doc_ref.get.return_value = _snapshot('s1', {'title': 'Draft', 'content': 'new'})
+
+        result = update_doc('scripts', 's1', {'content': 'new'})
+
+        assert result['content'] == 'new'
+        doc_ref.get.assert_called_once()
+
+    def test_return_doc_false_skips_read(self, mock_firestore):
+        """Test internal callers that ignore the result pay only for the write."""
+        from app import update_agent_task
+
+        doc_ref = mock_firestore.collection.return_value.document.return_value
+
+        assert update_agent_task('t1', 'in_progress', return_doc=False) is None
+        doc_ref.update.assert_called_once()
+        doc_ref.get.assert_not_called()
+
+
+class TestProjectCascadeDelete:
+    """Tests for the background project cascade delete."""
+
+    def _job(self, project_id):
+        from app import _project_delete_jobs
+        _project_delete_jobs[project_id] = {
+            'status': 'running', 'collections': {}, 'documentsDeleted': 0,
+            'blobsDeleted': 0, 'blobErrors': 0,
+        }
+        return _project_delete_jobs[project_id]
+
+    def _blob(self, name):
+        blob = MagicMock()
+        blob.name = name
+        return blob
+
+    def _owned(self, mock_db, docs_by_collection):
+        """Route where(...).select([]).stream() to per-collection doc ids."""
+        from app import COLLECTIONS
+        names = {v: k for k, v in COLLECTIONS.items()}
+
+        def collection(full_name):
+            coll = MagicMock()
+            ids = docs_by_collection.get(names[full_name], [])
+            coll.where.return_value.select.return_value.stream.side_effect = (
+                lambda: iter([_snapshot(i, {}) for i in ids]))
+            return coll
+        mock_db.collection.side_effect = collection
+
+    def test_deletes_documents_and_blobs(self, mock_firestore, mock_storage):
+        """Test every owned collection and storage prefix is cleared, project last."""
+        from app import _run_project_delete
+
+        self._owned(mock_firestore, {'episodes': ['e1'], 'story_cards': ['c1', 'c2'],
+                                     'golden_scripts': ['g1']})
+        bucket = mock_storage.bucket.return_value
+        bucket.list_blobs.side_effect = lambda prefix, fields: (
+            [self._blob(prefix + 'x')] if prefix in ('assets/p1/', 'research/e1/') else [])
+        batches = []
+        mock_firestore.batch.side_effect = lambda: batches.append(MagicMock()) or batches[-1]
+        job = self._job('p1')
+
+        _run_project_delete('p1')
+
+        assert job['status'] == 'complete'
+        assert job['blobsDeleted'] == 2
+        bucket.blob.assert_any_call('research/e1/x')
+        assert job['collections']['story_cards'] == 2
+        assert job['collections']['golden_scripts'] == 1
+        assert job['collections']['episodes'] == 1
+        assert batches[-1].delete.call_count == 2  # stats doc + project doc
+
+    def test_storage_failure_keeps_project(self, mock_firestore, mock_storage):
+        """Test a failed blob delete stops the job before any document is removed."""
+        from app import _run_project_delete
+
+        self._owned(mock_firestore, {})
+        bucket = mock_storage.bucket.return_value
+        bucket.list_blobs.side_effect = lambda prefix, fields: (
+            [self._blob(prefix + 'x')] if prefix == 'assets/p2/' else [])
+        bucket.blob.return_value.delete.side_effect = RuntimeError('denied')
+        job = self._job('p2')
+
+        _run_project_delete('p2')
+
+        assert job['status'] == 'failed'
+        assert job['blobErrors'] == 1
+        mock_firestore.batch.assert_not_called()
+
+
+class TestExtractedTextCache:
+    """Tests for the persisted research-document text cache."""
+
+    def _source(self, generation):
+        source = MagicMock()
+        source.generation = generation
+        return source
+
+    def _sidecar(self, generation, payload):
+        import gzip
+        import json
+        sidecar = MagicMock()
+        sidecar.metadata = {'sourceGeneration': str(generation)}
+        sidecar.download_as_bytes.return_value = gzip.compress(json.dumps(payload).encode('utf-8'))
+        return sidecar
+
+    def setup_method(self):
+        from app import _extracted_text_cache
+        _extracted_text_cache.clear()
+
+    def test_sidecar_hit_skips_source_download(self, mock_storage):
+        """Test a sidecar from the current generation is used without fetching the document."""
+        from app import read_document_content
+
+        bucket = mock_storage.bucket.return_value
+        payload = {'text': 'cached text', 'pageCount': 3, 'sha256': 'abc', 'generation': '7'}
+        bucket.get_blob.side_effect = lambda path: (
+            self._source(7) if path == 'assets/p1/doc.pdf' else self._sidecar(7, payload))
+
+        assert read_document_content('assets/p1/doc.pdf', 'application/pdf') == 'cached text'
+        bucket.blob.assert_not_called()
+
+    def test_generation_change_reextracts(self, mock_storage):
+        """Test a sidecar from an older generation is ignored and rewritten."""
+        import gzip
+        import json
+        from app import read_document_content
+
+        bucket = mock_storage.bucket.return_value
+        stale = {'text': 'old text', 'pageCount': 1, 'sha256': 'abc', 'generation': '7'}
+        bucket.get_blob.side_effect = lambda path: (
+            self._source(8) if path == 'assets/p1/notes.txt' else self._sidecar(7, stale))
+        source, sidecar = MagicMock(), MagicMock()
+        source.download_as_bytes.return_value = b'new text'
+        bucket.blob.side_effect = lambda path, generation=None: (
+            source if path == 'assets/p1/notes.txt' else sidecar)
+
+        assert read_document_content('assets/p1/notes.txt', 'text/plain') == 'new text'
+        assert sidecar.metadata['sourceGeneration'] == '8'
+        stored = json.loads(gzip.decompress(sidecar.upload_from_string.call_args.args[0]))
+        assert stored['text'] == 'new text'
+        assert stored['pageCount'] == 1
+
+        # Second read is served from memory for the same generation
+        read_document_content('assets/p1/notes.txt', 'text/plain')
+        assert source.download_as_bytes.call_count == 1
+
+    def test_unsupported_type_not_downloaded(self, mock_storage):
+        """Test documents with no text extractor are skipped without a GCS round-trip."""
+        from app import read_document_content
+
+        assert read_document_content('assets/p1/photo.jpg', 'image/jpeg') is None
+        mock_storage.bucket.return_value.get_blob.assert_not_called()
+
+    @patch('app.get_doc')
+    @patch('app.get_all_docs')
+    def test_projects_being_deleted_are_hidden(self, mock_all, mock_get):
+        """Test a project stays out of the list and can't be opened while its delete runs."""
+        from app import app, get_projects, get_project
+
+        deleting = {'id': 'p1', 'deletion': {'status': 'running'}}
+        failed = {'id': 'p2', 'deletion': {'status': 'failed', 'error': 'denied'}}
+        mock_all.return_value = [deleting, failed, {'id': 'p3'}]
+        mock_get.return_value = deleting
+
+        with app.test_request_context('/api/projects'):
+            assert [p['id'] for p in get_projects().get_json()] == ['p2', 'p3']
+            assert get_project('p1')[1] == 410